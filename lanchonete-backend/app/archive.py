@@ -0,0 +1,113 @@
+# lanchonete_backend/app/archive.py
+
+# Arquivamento de pedidos: move pedidos finalizados (entregues ou cancelados) mais antigos
+# que ARCHIVE_AFTER_DAYS para archived_orders/archived_order_items, em lotes pequenos,
+# cada um em sua própria transação (o lock de escrita do SQLite fica preso pouco tempo).
+# crud.get_order e crud.get_orders consultam o arquivo quando o pedido não está na tabela quente.
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+
+from app import models
+from app.database import AsyncSessionLocal, shard_keys, use_shard
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = 90 # Idade mínima (por order_date) para arquivar um pedido finalizado
+ARCHIVE_BATCH_SIZE = 500 # Pedidos movidos por transação
+ARCHIVE_INTERVAL_SECONDS = 60 * 60 # Intervalo entre execuções do job periódico
+# Pausa entre lotes: quem espera o lock de escrita (busy_timeout) tenta de novo em intervalos de
+# até 100 ms; sem a pausa, o próximo lote pega o lock antes e as gravações de pedidos esperam o
+# arquivamento inteiro
+ARCHIVE_BATCH_PAUSE_SECONDS = 0.05
+FINISHED_STATUSES = ("delivered", "cancelled")
+
+_ORDER_COLUMNS = (
+    "id", "customer_id", "establishment_id", "order_date", "total_amount",
+    "status", "delivery_address", "is_pickup", "payment_method", "prepared_at",
+)
+_ITEM_COLUMNS = ("id", "order_id", "product_id", "quantity", "price_at_time_of_order")
+
+_task: Optional[asyncio.Task] = None
+
+async def archive_batch(db, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Arquiva um lote de pedidos finalizados anteriores a `cutoff`. Retorna quantos foram movidos."""
+    finished = (models.Order.status.in_(FINISHED_STATUSES), models.Order.order_date < cutoff)
+    result = await db.execute(
+        select(models.Order.id)
+        .where(*finished)
+        .order_by(models.Order.id)
+        .limit(batch_size)
+    )
+    order_ids = result.scalars().all()
+    if not order_ids:
+        return 0
+
+    # A escolha acima roda fora da transação de escrita: um pedido do lote pode ter sido reaberto
+    # (ou alterado) antes do INSERT. Cada instrução repete as condições; a partir do primeiro
+    # INSERT, a transação tem o lock de escrita e as quatro veem os mesmos pedidos.
+    eligible = select(models.Order.id).where(models.Order.id.in_(order_ids), *finished)
+    await db.execute(
+        insert(models.ArchivedOrder)
+        .prefix_with("OR IGNORE") # Outro worker pode ter arquivado o mesmo lote
+        .from_select(
+            _ORDER_COLUMNS,
+            select(*(getattr(models.Order, name) for name in _ORDER_COLUMNS)).where(models.Order.id.in_(order_ids), *finished)
+        )
+    )
+    await db.execute(
+        insert(models.ArchivedOrderItem)
+        .prefix_with("OR IGNORE")
+        .from_select(
+            _ITEM_COLUMNS,
+            select(*(getattr(models.OrderItem, name) for name in _ITEM_COLUMNS)).where(models.OrderItem.order_id.in_(eligible))
+        )
+    )
+    await db.execute(delete(models.OrderItem).where(models.OrderItem.order_id.in_(eligible)))
+    result = await db.execute(delete(models.Order).where(models.Order.id.in_(order_ids), *finished))
+    await db.commit()
+    return result.rowcount
+
+async def archive_orders(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Arquiva todos os pedidos elegíveis, lote a lote. Retorna o total movido."""
+    cutoff = datetime.now() - timedelta(days=older_than_days) # order_date é gravado em horário local
+    total = 0
+    for shard in shard_keys(): # Com sharding, cada shard arquiva os próprios pedidos
+        while True:
+            async with AsyncSessionLocal() as db:
+                use_shard(db, shard)
+                moved = await archive_batch(db, cutoff, batch_size)
+            total += moved
+            if moved == 0:
+                break
+            await asyncio.sleep(ARCHIVE_BATCH_PAUSE_SECONDS)
+    return total
+
+async def _run_periodically() -> None:
+    while True:
+        try:
+            moved = await archive_orders()
+            if moved:
+                logger.info("%d pedidos movidos para o arquivo", moved)
+        except Exception:
+            logger.exception("Falha ao arquivar pedidos")
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+def start() -> None:
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run_periodically())
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
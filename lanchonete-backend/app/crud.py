@@ -1,32 +1,148 @@
 # lanchonete_backend/app/crud.py
 
-from fastapi import HTTPException
+import asyncio
+import heapq
+import itertools
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List, Optional
+from sqlalchemy import case, delete, event, func, lambda_stmt, or_, update
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Dict, Iterable, List, Optional, Tuple
 from datetime import datetime # Importa datetime para pedidos
 
-from app import models, schemas
-from app.security import get_password_hash
+from app import models, schemas, invalidation, geo, stats, jobs, reads, deadlines
+from app.archive import FINISHED_STATUSES
+from app.database import AsyncSessionLocal, SHARD_KEY, shard_for_establishment, shard_for_order, shard_id_floor, shard_keys, use_shard
+from app.kitchen import kitchen_queue, ACTIVE_STATUSES
+from app.security import get_password_hash_async
+
+# Escritas com autorização na própria instrução: UPDATE/DELETE ... WHERE id = :id AND <dono>
+# RETURNING, sem carregar o registro antes. Quando nenhuma linha é afetada, a função retorna
+# None e o router consulta só a existência para decidir entre 404 e 403.
+# A versão (ETag dos GETs condicionais) é incrementada na mesma instrução; updated_at, pelo
+# onupdate da coluna.
+def _owned(column, owner_value: Optional[int]):
+    return [column == owner_value] if owner_value is not None else []
+
+# As consultas mais frequentes (buscas por chave) usam lambda_stmt:
+# o SQLAlchemy guarda a instrução pelo código da lambda e só troca os valores dos parâmetros,
+# sem remontar o select() nem recalcular a chave de cache a cada chamada. Variáveis usadas
+# dentro da lambda viram parâmetros (valores simples) ou parte da chave (modelos, colunas).
+
+# Consulta apenas a versão de um registro, para responder 304 sem carregar o objeto completo
+async def _get_version(db: AsyncSession, model, obj_id: int):
+    result = await db.execute(lambda_stmt(lambda: select(model.version, model.updated_at).where(model.id == obj_id)))
+    return result.first()
+
+# ====================================================================
+# DataLoader: buscas por ID agrupadas dentro da requisição
+# ====================================================================
+
+# get_product/get_establishment/get_category passam por um DataLoader guardado na sessão
+# (que vive uma requisição, via get_db). Buscas feitas juntas, por exemplo com asyncio.gather,
+# viram uma única consulta "WHERE id IN (...)" por modelo, e um ID já buscado na requisição
+# não é consultado de novo. O cache é descartado no commit e no rollback.
+
+MAX_BATCH_IDS = 100 # Máximo de IDs por requisição nos endpoints ?ids=
+_LOADER_KEY = "dataloader"
+
+class DataLoader:
+    def __init__(self, db: AsyncSession):
+        self._db = db
+        self._lock = asyncio.Lock() # Uma consulta por vez: a sessão não aceita uso concorrente
+        self._futures: Dict[Tuple[type, int], asyncio.Future] = {}
+        self._pending: Dict[type, List[int]] = {}
+
+    async def load(self, model, obj_id: int):
+        """Retorna o registro com esse ID (ou None), agrupando com as buscas concorrentes."""
+        key = (model, obj_id)
+        future = self._futures.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._futures[key] = future
+            self._pending.setdefault(model, []).append(obj_id)
+        if not future.done():
+            await asyncio.sleep(0) # Deixa as demais buscas do mesmo gather entrarem no lote
+            async with self._lock:
+                await self._dispatch()
+        return future.result()
+
+    async def load_many(self, model, ids: Iterable[int]) -> list:
+        return list(await asyncio.gather(*(self.load(model, obj_id) for obj_id in ids)))
+
+    async def _dispatch(self) -> None:
+        while self._pending:
+            model, ids = self._pending.popitem()
+            futures = [self._futures[(model, obj_id)] for obj_id in ids]
+            try:
+                result = await self._db.execute(lambda_stmt(lambda: select(model).where(model.id.in_(ids))))
+                found = {obj.id: obj for obj in result.scalars().all()}
+            except BaseException as exc:
+                # O lote falhou: os IDs saem do cache para que uma nova busca consulte de novo
+                for obj_id, future in zip(ids, futures):
+                    self._futures.pop((model, obj_id), None)
+                    if not future.done():
+                        future.set_exception(exc)
+                raise
+            for obj_id, future in zip(ids, futures):
+                if not future.done():
+                    future.set_result(found.get(obj_id))
+
+def get_loader(db: AsyncSession) -> DataLoader:
+    loader = db.info.get(_LOADER_KEY)
+    if loader is None:
+        loader = db.info[_LOADER_KEY] = DataLoader(db)
+    return loader
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _discard_loader(session: Session) -> None:
+    session.info.pop(_LOADER_KEY, None)
+
+def parse_ids(raw: str) -> List[int]:
+    """Converte "1,2,3" em [1, 2, 3] (sem repetições, na ordem pedida) para os endpoints ?ids=."""
+    try:
+        ids = list(dict.fromkeys(int(part) for part in raw.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids deve ser uma lista de números separados por vírgula")
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Informe no máximo {MAX_BATCH_IDS} ids")
+    return ids
+
+async def _get_many(db: AsyncSession, model, ids: Iterable[int]) -> list:
+    """Registros encontrados, na ordem dos IDs pedidos (IDs inexistentes são omitidos)."""
+    return [obj for obj in await get_loader(db).load_many(model, ids) if obj is not None]
 
 # ====================================================================
 # Operações CRUD para Usuários
 # ====================================================================
 
 async def get_user(db: AsyncSession, user_id: int):
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    result = await db.execute(lambda_stmt(lambda: select(models.User).where(models.User.id == user_id)))
     return result.scalars().first()
 
 async def get_user_by_email(db: AsyncSession, email: str):
-    result = await db.execute(select(models.User).where(models.User.email == email))
+    result = await db.execute(lambda_stmt(lambda: select(models.User).where(models.User.email == email)))
     return result.scalars().first()
 
+async def get_user_with_establishment_id(db: AsyncSession, email: str):
+    """(usuário, ID do estabelecimento do qual é dono ou None), em uma consulta; None se o e-mail não existe."""
+    result = await db.execute(lambda_stmt(
+        lambda: select(models.User, models.Establishment.id)
+        .outerjoin(models.Establishment, models.Establishment.owner_id == models.User.id)
+        .where(models.User.email == email)
+    ))
+    return result.first()
+
 async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
     result = await db.execute(select(models.User).offset(skip).limit(limit))
     return result.scalars().all()
 
 async def create_user(db: AsyncSession, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
@@ -34,6 +150,8 @@ async def create_user(db: AsyncSession, user: schemas.UserCreate):
         is_owner=user.is_owner
     )
     db.add(db_user)
+    await db.flush() # flush para que db_user.id seja populado
+    await invalidation.publish(db, f"users:{db_user.id}")
     await db.commit()
     await db.refresh(db_user)
     return db_user
@@ -43,26 +161,80 @@ async def create_user(db: AsyncSession, user: schemas.UserCreate):
 # ====================================================================
 
 async def get_establishment(db: AsyncSession, establishment_id: int):
-    result = await db.execute(select(models.Establishment).where(models.Establishment.id == establishment_id))
-    return result.scalars().first()
+    return await get_loader(db).load(models.Establishment, establishment_id)
+
+async def get_establishments_by_ids(db: AsyncSession, establishment_ids: Iterable[int]):
+    return await _get_many(db, models.Establishment, establishment_ids)
+
+async def get_establishment_version(db: AsyncSession, establishment_id: int):
+    return await _get_version(db, models.Establishment, establishment_id)
 
 async def get_establishment_by_owner_id(db: AsyncSession, owner_id: int):
-    result = await db.execute(select(models.Establishment).where(models.Establishment.owner_id == owner_id))
+    result = await db.execute(lambda_stmt(lambda: select(models.Establishment).where(models.Establishment.owner_id == owner_id)))
     return result.scalars().first()
 
+async def get_establishments(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(models.Establishment).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_nearby_establishments(db: AsyncSession, latitude: float, longitude: float, radius_km: float, limit: int = 20):
+    return await geo.find_nearby(db, latitude, longitude, radius_km, limit)
+
 async def create_establishment(db: AsyncSession, establishment: schemas.EstablishmentCreate, owner_id: int): # <--- ATENÇÃO AQUI: owner_id deve estar presente
     db_establishment = models.Establishment(
         name=establishment.name,
         address=establishment.address,
         phone=establishment.phone,
         description=establishment.description,
+        latitude=establishment.latitude,
+        longitude=establishment.longitude,
         owner_id=owner_id
     )
     db.add(db_establishment)
+    await db.flush()
+    await geo.index_establishment(db, db_establishment.id, db_establishment.latitude, db_establishment.longitude)
+    await invalidation.publish(db, f"establishments:{db_establishment.id}", f"principals:{owner_id}")
     await db.commit()
     await db.refresh(db_establishment)
     return db_establishment
 
+async def update_establishment(db: AsyncSession, establishment_id: int, establishment_update: schemas.EstablishmentCreate, owner_id: Optional[int] = None):
+    result = await db.execute(
+        update(models.Establishment)
+        .where(models.Establishment.id == establishment_id, *_owned(models.Establishment.owner_id, owner_id))
+        .values(**establishment_update.model_dump(exclude_unset=True), version=models.Establishment.version + 1)
+        .returning(models.Establishment)
+    )
+    db_establishment = result.scalars().first()
+    if db_establishment:
+        await geo.index_establishment(db, establishment_id, db_establishment.latitude, db_establishment.longitude)
+        await invalidation.publish(db, f"establishments:{establishment_id}", f"storefront:{establishment_id}")
+        await db.commit()
+    return db_establishment
+
+async def delete_establishment(db: AsyncSession, establishment_id: int, owner_id: Optional[int] = None):
+    try:
+        result = await db.execute(
+            delete(models.Establishment)
+            .where(models.Establishment.id == establishment_id, *_owned(models.Establishment.owner_id, owner_id))
+            .returning(models.Establishment.owner_id)
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O estabelecimento ainda possui produtos ou pedidos e não pode ser deletado."
+        )
+    row = result.first()
+    if row is None:
+        return None
+    await geo.unindex_establishment(db, establishment_id)
+    await invalidation.publish(
+        db, f"establishments:{establishment_id}", f"storefront:{establishment_id}", f"principals:{row.owner_id}"
+    )
+    await db.commit()
+    return {"message": "Estabelecimento deletado com sucesso!"}
+
 # ====================================================================
 # Operações CRUD para Categorias
 # ====================================================================
@@ -70,45 +242,90 @@ async def create_establishment(db: AsyncSession, establishment: schemas.Establis
 async def create_category(db: AsyncSession, category: schemas.CategoryCreate):
     db_category = models.Category(name=category.name)
     db.add(db_category)
+    await db.flush()
+    await invalidation.publish(db, f"categories:{db_category.id}")
     await db.commit()
     await db.refresh(db_category)
     return db_category
 
 async def get_category(db: AsyncSession, category_id: int):
-    result = await db.execute(select(models.Category).where(models.Category.id == category_id))
-    return result.scalars().first()
+    return await get_loader(db).load(models.Category, category_id)
+
+async def get_categories_by_ids(db: AsyncSession, category_ids: Iterable[int]):
+    return await _get_many(db, models.Category, category_ids)
+
+# Leitura para GET /categories/{id}: campos da resposta e da validação (version, updated_at) em uma consulta
+async def get_category_row(db: AsyncSession, category_id: int):
+    result = await db.execute(lambda_stmt(
+        lambda: select(models.Category.id, models.Category.name, models.Category.version, models.Category.updated_at)
+        .where(models.Category.id == category_id)
+    ))
+    return result.first()
 
 async def get_categories(db: AsyncSession, skip: int = 0, limit: int = 100):
     result = await db.execute(select(models.Category).offset(skip).limit(limit))
     return result.scalars().all()
 
 async def update_category(db: AsyncSession, category_id: int, category_update: schemas.CategoryCreate):
-    db_category = await get_category(db, category_id)
+    result = await db.execute(
+        update(models.Category)
+        .where(models.Category.id == category_id)
+        .values(name=category_update.name, version=models.Category.version + 1)
+        .returning(models.Category)
+    )
+    db_category = result.scalars().first()
     if db_category:
-        db_category.name = category_update.name
+        await invalidation.publish(db, f"categories:{category_id}", "storefront") # Categorias aparecem em todas as vitrines
         await db.commit()
-        await db.refresh(db_category)
     return db_category
 
 async def delete_category(db: AsyncSession, category_id: int):
-    db_category = await get_category(db, category_id)
-    if db_category:
-        await db.delete(db_category)
-        await db.commit()
-        return {"message": "Categoria deletada com sucesso!"}
-    return None
+    # Os produtos da categoria ficam sem categoria (em uma instrução, com nova versão para os ETags)
+    result = await db.execute(
+        update(models.Product)
+        .where(models.Product.category_id == category_id)
+        .values(category_id=None, version=models.Product.version + 1)
+        .returning(models.Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    product_channels = [f"products:{product_id}" for product_id in result.scalars().all()]
+    result = await db.execute(
+        delete(models.Category).where(models.Category.id == category_id).returning(models.Category.id)
+    )
+    if result.first() is None:
+        await db.rollback()
+        return None
+    await invalidation.publish(db, f"categories:{category_id}", "storefront", *product_channels)
+    await db.commit()
+    return {"message": "Categoria deletada com sucesso!"}
 
 # ====================================================================
 # Operações CRUD para Produtos
 # ====================================================================
 
 async def get_product(db: AsyncSession, product_id: int):
-    result = await db.execute(select(models.Product).where(models.Product.id == product_id))
-    return result.scalars().first()
+    return await get_loader(db).load(models.Product, product_id)
+
+async def get_products_by_ids(db: AsyncSession, product_ids: Iterable[int]):
+    return await _get_many(db, models.Product, product_ids)
 
+async def get_product_version(db: AsyncSession, product_id: int):
+    return await _get_version(db, models.Product, product_id)
+
+# Listagem somente leitura: linhas do Core com as colunas da resposta, sem objetos do ORM (ver app/reads.py)
 async def get_products(db: AsyncSession, skip: int = 0, limit: int = 100):
-    result = await db.execute(select(models.Product).offset(skip).limit(limit))
-    return result.scalars().all()
+    result = await db.execute(lambda_stmt(lambda: select(*reads.PRODUCT_COLUMNS).offset(skip).limit(limit)))
+    return result.all()
+
+# Total do catálogo (GET /products/page): contado uma vez e guardado até a próxima escrita de produto
+_product_count = invalidation.LocalCache("products")
+
+async def count_products(db: AsyncSession) -> int:
+    total = _product_count.get("total")
+    if total is None:
+        total = (await db.execute(select(func.count()).select_from(models.Product))).scalar_one()
+        _product_count.set("total", total)
+    return total
 
 async def create_product(db: AsyncSession, product: schemas.ProductCreate):
     db_product = models.Product(
@@ -116,41 +333,87 @@ async def create_product(db: AsyncSession, product: schemas.ProductCreate):
         description=product.description,
         price=product.price,
         image_url=product.image_url,
-        is_available=product.is_available,
+        is_available=product.is_available and product.stock != 0, # Sem estoque, começa indisponível
         establishment_id=product.establishment_id,
-        category_id=product.category_id
+        category_id=product.category_id,
+        stock=product.stock
     )
     db.add(db_product)
+    await db.flush()
+    await invalidation.publish(db, f"products:{db_product.id}", f"storefront:{db_product.establishment_id}")
     await db.commit()
     await db.refresh(db_product)
     return db_product
 
-async def update_product(db: AsyncSession, product_id: int, product_update: schemas.ProductUpdate):
-    db_product = await get_product(db, product_id)
+# Com establishment_id, só altera o produto se ele pertencer a esse estabelecimento
+async def _update_product_values(db: AsyncSession, product_id: int, values: dict, establishment_id: Optional[int]):
+    result = await db.execute(
+        update(models.Product)
+        .where(models.Product.id == product_id, *_owned(models.Product.establishment_id, establishment_id))
+        .values(**values, version=models.Product.version + 1)
+        .returning(models.Product)
+    )
+    db_product = result.scalars().first()
     if db_product:
-        update_data = product_update.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_product, key, value)
+        await invalidation.publish(db, f"products:{product_id}", f"storefront:{db_product.establishment_id}")
         await db.commit()
-        await db.refresh(db_product)
     return db_product
 
-async def delete_product(db: AsyncSession, product_id: int):
-    db_product = await get_product(db, product_id)
-    if db_product:
-        await db.delete(db_product)
-        await db.commit()
-        return {"message": "Produto deletado com sucesso!"}
-    return None
+async def update_product(db: AsyncSession, product_id: int, product_update: schemas.ProductUpdate, establishment_id: Optional[int] = None):
+    values = product_update.model_dump(exclude_unset=True)
+    if values.get("stock") is not None and "is_available" not in values:
+        values["is_available"] = values["stock"] > 0 # Reposição (ou zeragem) do estoque define a disponibilidade
+    return await _update_product_values(db, product_id, values, establishment_id)
+
+async def set_product_image(db: AsyncSession, product_id: int, image_url: str, image_variants: dict, establishment_id: Optional[int] = None):
+    values = {"image_url": image_url, "image_variants": image_variants}
+    return await _update_product_values(db, product_id, values, establishment_id)
+
+async def delete_product(db: AsyncSession, product_id: int, establishment_id: Optional[int] = None):
+    try:
+        result = await db.execute(
+            delete(models.Product)
+            .where(models.Product.id == product_id, *_owned(models.Product.establishment_id, establishment_id))
+            .returning(models.Product.establishment_id)
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O produto já aparece em pedidos e não pode ser deletado. Marque-o como indisponível."
+        )
+    row = result.first()
+    if row is None:
+        return None
+    await invalidation.publish(db, f"products:{product_id}", f"storefront:{row.establishment_id}")
+    await db.commit()
+    return {"message": "Produto deletado com sucesso!"}
 
 # ====================================================================
 # Operações CRUD para Pedidos
 # ====================================================================
 
+# Commit de pedido e a atualização da fila da cozinha (memória do processo) como um trecho só:
+# se o prazo da requisição vencer ou o cliente desconectar no meio, o cancelamento espera os dois
+# (deadlines.shielded), e a fila nunca fica sem um pedido já gravado.
+async def _commit_then(db: AsyncSession, bookkeeping) -> None:
+    async def commit_and_apply():
+        try:
+            await db.commit()
+        except BaseException:
+            # Um COMMIT que falha no SQLite (database is locked) deixa a transação aberta, e o
+            # SQLAlchemy devolveria a conexão ao pool assim, com as escritas e a trava: descarta-a
+            await db.invalidate()
+            raise
+        bookkeeping()
+    await deadlines.shielded(commit_and_apply())
+
 async def create_order(db: AsyncSession, order: schemas.OrderCreate, customer_id: int): # <--- ADICIONE customer_id aqui
     total_amount = 0
     order_items_models = []
 
+    # Uma consulta para todos os produtos (ou nenhuma, se o router já os buscou nesta requisição)
+    await get_loader(db).load_many(models.Product, [item.product_id for item in order.items])
     for item_data in order.items:
         product = await get_product(db, item_data.product_id)
         if not product:
@@ -167,7 +430,10 @@ async def create_order(db: AsyncSession, order: schemas.OrderCreate, customer_id
         )
         order_items_models.append(order_item)
 
+    shard = shard_for_establishment(order.establishment_id)
+    use_shard(db, shard)
     db_order = models.Order(
+        id=_next_order_id(shard),
         establishment_id=order.establishment_id,
         customer_id=customer_id, # <--- Use o customer_id passado como argumento
         status=order.status,
@@ -185,20 +451,169 @@ async def create_order(db: AsyncSession, order: schemas.OrderCreate, customer_id
         order_item_model.order_id = db_order.id # Associa o item ao pedido
         db.add(order_item_model)
 
-    await db.commit()
-    await db.refresh(db_order)
-
-    # Carregar as relações para a resposta
-    # Isso é importante para que o OrderResponse inclua os itens
-    await db.refresh(db_order, attribute_names=["items"])
-    for item in db_order.items:
-        await db.refresh(item, attribute_names=["product"]) # Se OrderItem.product estiver no schemas.OrderItemResponse
-
+    await stats.record_order_change(db, None, stats.snapshot(db_order))
+    await invalidation.publish(db, f"orders:{db_order.establishment_id}")
+    # Efeitos colaterais (notificações etc.) rodam em segundo plano; o job é gravado junto com o pedido
+    jobs.enqueue(db, "order_created", {"order_id": db_order.id, "establishment_id": db_order.establishment_id})
+    quantities = await _stock_quantities(db, order.items) if order.status != "cancelled" else {}
+
+    def apply():
+        # Carregar as relações para a resposta
+        # Isso é importante para que o OrderResponse inclua os itens. Os itens acabaram de ser
+        # gravados e os produtos já estão na sessão (DataLoader), então nada precisa ser relido.
+        set_committed_value(db_order, "items", order_items_models)
+        kitchen_queue.apply(db_order)
+    # Por último: o lock de escrita dos produtos fica preso só até o commit
+    await _commit_with_stock(db, shard, _reserve_stock, quantities, apply)
     return db_order
 
-async def get_order(db: AsyncSession, order_id: int):
+# --- Estoque ---
+
+# Produtos com estoque (stock não nulo) têm as unidades reservadas na criação do pedido por uma
+# única instrução UPDATE condicional para o carrinho todo: cada linha só muda se ainda tiver
+# unidades suficientes, e o SQLite serializa as escritas, então dois pedidos simultâneos nunca
+# levam a mesma unidade. Ao zerar, o produto fica indisponível; cancelar o pedido (ou removê-lo
+# antes de finalizado) devolve as unidades e o torna disponível de novo.
+# Só a mudança de disponibilidade gera nova versão (ETag) e invalidação dos caches: a baixa de
+# cada pedido não invalida a vitrine, e o stock das respostas em cache pode estar defasado.
+#
+# Sem sharding, a mudança de estoque entra na transação do pedido. Com sharding, o estoque (banco
+# global) e o pedido (shard) ficam em arquivos diferentes, e um commit dos dois não seria atômico:
+# a reserva é confirmada numa transação própria antes do commit do pedido (e devolvida se ele
+# falhar); a devolução, depois que o pedido foi gravado. Uma falha entre os dois commits deixa no
+# máximo unidades presas, nunca um pedido sem a reserva.
+
+def _cart_quantities(items) -> Dict[int, int]:
+    quantities: Dict[int, int] = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
+
+async def _stock_quantities(db: AsyncSession, items) -> Dict[int, int]:
+    """Quantidades do carrinho por produto, só dos produtos com estoque (já carregados na sessão)."""
+    quantities = _cart_quantities(items)
+    products = await get_loader(db).load_many(models.Product, list(quantities))
+    return {product.id: quantities[product.id] for product in products if product is not None and product.stock is not None}
+
+# O estoque faz parte da resposta do produto, da vitrine e do feed de sincronização: toda mudança
+# publica os canais (não só quando a disponibilidade vira), uma vez por produto na transação.
+async def _publish_stock(db: AsyncSession, rows) -> None:
+    channels = {} # Sem repetir a vitrine de produtos do mesmo estabelecimento
+    for row in rows:
+        channels.update(dict.fromkeys([f"products:{row.id}", f"storefront:{row.establishment_id}"]))
+    # Com sharding, publica no banco global, como as demais escritas de produto: a sequência
+    # de lá é a do feed de alterações do catálogo (ver app/sync.py)
+    shard = db.sync_session.info.get(SHARD_KEY)
+    use_shard(db, None)
+    await invalidation.publish(db, *channels)
+    use_shard(db, shard)
+
+async def _reserve_stock(db: AsyncSession, quantities: Dict[int, int]) -> None:
+    """Baixa as unidades de todos os produtos, ou de nenhum (409) se faltar estoque de algum."""
+    if not quantities:
+        return
+    needed = case(quantities, value=models.Product.id)
+    emptied = models.Product.stock == needed
+    result = await db.execute(
+        update(models.Product)
+        .where(models.Product.id.in_(list(quantities)), models.Product.stock >= needed)
+        .values(
+            stock=models.Product.stock - needed,
+            is_available=case((emptied, False), else_=models.Product.is_available),
+            version=models.Product.version + 1 # O estoque faz parte da resposta: muda o ETag do produto
+        )
+        .returning(models.Product.id, models.Product.stock, models.Product.establishment_id)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    if len(rows) < len(quantities):
+        await db.rollback() # Desfaz a baixa dos produtos que tinham estoque
+        missing = sorted(set(quantities) - {row.id for row in rows})
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Estoque insuficiente para o(s) produto(s): {', '.join(map(str, missing))}"
+        )
+    await _publish_stock(db, rows)
+
+async def _change_stock_apart(change, quantities: Dict[int, int]) -> None:
+    """Aplica _reserve_stock ou _restore_stock numa transação própria, no banco global."""
+    if not quantities:
+        return
+    async with AsyncSessionLocal() as stock_db:
+        await change(stock_db, quantities)
+        await stock_db.commit()
+
+async def _commit_with_stock(db: AsyncSession, shard: Optional[int], change, quantities: Dict[int, int], bookkeeping) -> None:
+    """Commit de uma escrita de pedido junto com a mudança de estoque que ela causa (change: _reserve_stock, _restore_stock ou None)."""
+    if shard is None:
+        if change is not None:
+            await change(db, quantities)
+        await _commit_then(db, bookkeeping)
+        return
+    if change is _reserve_stock:
+        try:
+            await _change_stock_apart(_reserve_stock, quantities)
+        except BaseException:
+            await db.rollback() # Sem estoque (409): o pedido também não é gravado
+            raise
+    committed = False
+
+    def apply():
+        nonlocal committed
+        committed = True
+        bookkeeping()
+    try:
+        await _commit_then(db, apply)
+    except BaseException:
+        if change is _reserve_stock and not committed:
+            await deadlines.compensating(_change_stock_apart(_restore_stock, quantities))
+        raise
+    if change is _restore_stock:
+        await deadlines.compensating(_change_stock_apart(_restore_stock, quantities))
+
+async def _restore_stock(db: AsyncSession, quantities: Dict[int, int]) -> None:
+    """Devolve ao estoque as unidades de um pedido cancelado (produtos sem estoque não mudam)."""
+    if not quantities:
+        return
+    returned = case(quantities, value=models.Product.id)
+    refilled = models.Product.stock == 0
     result = await db.execute(
-        select(models.Order)
+        update(models.Product)
+        .where(models.Product.id.in_(list(quantities)), models.Product.stock.is_not(None))
+        .values(
+            stock=models.Product.stock + returned,
+            is_available=case((refilled, True), else_=models.Product.is_available),
+            version=models.Product.version + 1
+        )
+        .returning(models.Product.id, models.Product.stock, models.Product.establishment_id)
+        .execution_options(synchronize_session=False)
+    )
+    await _publish_stock(db, result.all())
+
+# Com sharding, o ID vem da faixa do shard (ver app/database.py), calculado no próprio INSERT
+# (já com o lock de escrita do shard). Conta também o arquivo, para não reutilizar IDs arquivados.
+def _next_order_id(shard: Optional[int]):
+    if shard is None:
+        return None # Sem sharding: o SQLite atribui o ID
+    floor = shard_id_floor(shard)
+    return select(func.max(
+        select(func.coalesce(func.max(models.Order.id), floor)).scalar_subquery(),
+        select(func.coalesce(func.max(models.ArchivedOrder.id), floor)).scalar_subquery()
+    ) + 1).scalar_subquery()
+
+def _use_order_shard(db: AsyncSession, order_id: int) -> bool:
+    """Direciona a sessão ao shard do pedido; False se o ID não é de nenhum shard atual (pedido inexistente)."""
+    try:
+        use_shard(db, shard_for_order(order_id))
+    except LookupError:
+        return False
+    return True
+
+async def get_order(db: AsyncSession, order_id: int, include_archived: bool = True):
+    if not _use_order_shard(db, order_id):
+        return None
+    result = await db.execute(lambda_stmt(
+        lambda: select(models.Order)
         .where(models.Order.id == order_id)
         .options(
             # Carrega relações para exibição completa do pedido
@@ -206,42 +621,299 @@ async def get_order(db: AsyncSession, order_id: int):
             selectinload(models.Order.establishment),
             selectinload(models.Order.items).selectinload(models.OrderItem.product)
         )
-    )
-    return result.scalars().first()
+    ))
+    db_order = result.scalars().first()
+    if db_order is None and include_archived:
+        # Pedidos finalizados antigos ficam no arquivo (somente leitura)
+        result = await db.execute(lambda_stmt(
+            lambda: select(models.ArchivedOrder)
+            .where(models.ArchivedOrder.id == order_id)
+            .options(selectinload(models.ArchivedOrder.items))
+        ))
+        db_order = result.scalars().first()
+    return db_order
 
-async def get_orders(db: AsyncSession, skip: int = 0, limit: int = 100):
-    result = await db.execute(
-        select(models.Order)
+# Ordenações aceitas pela busca de pedidos ("-" = decrescente); o ID desempata
+ORDER_SORTS = ("-order_date", "order_date", "-total_amount", "total_amount")
+
+def _order_by(model, sort: str):
+    column = getattr(model, sort.lstrip("-"))
+    if sort.startswith("-"):
+        return column.desc(), model.id.desc()
+    return column.asc(), model.id.asc()
+
+# Filtros da busca de pedidos. Um select comum, não lambda_stmt: as combinações de filtros são
+# muitas, e cada uma já fica no cache de instruções compiladas do engine
+def _with_order_filters(
+    stmt,
+    model,
+    establishment_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
+    statuses: Optional[List[str]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    is_pickup: Optional[bool] = None,
+    payment_methods: Optional[List[str]] = None
+):
+    if establishment_id is not None:
+        stmt = stmt.where(model.establishment_id == establishment_id)
+    if customer_id is not None:
+        stmt = stmt.where(model.customer_id == customer_id)
+    if statuses:
+        stmt = stmt.where(model.status.in_(statuses))
+    if date_from is not None:
+        stmt = stmt.where(model.order_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(model.order_date < date_to)
+    if is_pickup is not None:
+        stmt = stmt.where(model.is_pickup == is_pickup)
+    if payment_methods:
+        stmt = stmt.where(model.payment_method.in_(payment_methods))
+    return stmt
+
+_ORDER_ITEM_MODELS = {models.Order: models.OrderItem, models.ArchivedOrder: models.ArchivedOrderItem}
+
+async def _order_page(db: AsyncSession, model, skip: int, limit: int, sort: str, filters: dict):
+    # A página é escolhida só pelos IDs, numa subconsulta que os índices de cobertura de Order
+    # resolvem sem ler as linhas; as linhas completas são lidas só para os pedidos da página.
+    # Leitura pelo Core (reads.OrderRow): só as colunas da resposta, sem objetos do ORM
+    page_ids = (
+        _with_order_filters(select(model.id), model, **filters)
+        .order_by(*_order_by(model, sort))
         .offset(skip).limit(limit)
-        .options(
-            # Carrega relações para exibição completa dos pedidos
-            selectinload(models.Order.customer),
-            selectinload(models.Order.establishment),
-            selectinload(models.Order.items).selectinload(models.OrderItem.product)
+    )
+    result = await db.execute(
+        select(*(getattr(model, name) for name in reads.ORDER_COLUMNS))
+        .where(model.id.in_(page_ids.scalar_subquery()))
+        .order_by(*_order_by(model, sort))
+    )
+    orders = result.all()
+    items = []
+    if orders:
+        item_model = _ORDER_ITEM_MODELS[model]
+        result = await db.execute(
+            select(*(getattr(item_model, name) for name in reads.ORDER_ITEM_COLUMNS))
+            .where(item_model.order_id.in_([order.id for order in orders]))
+            .order_by(item_model.id)
         )
+        items = result.all()
+    return reads.order_rows(orders, items)
+
+async def _order_count(db: AsyncSession, model, filters: dict, cap: Optional[int] = None) -> int:
+    if cap is None:
+        stmt = _with_order_filters(select(func.count()).select_from(model), model, **filters)
+    else: # Conta no máximo `cap` linhas (lê só as primeiras entradas do índice)
+        stmt = select(func.count()).select_from(_with_order_filters(select(model.id), model, **filters).limit(cap).subquery())
+    return (await db.execute(stmt)).scalar_one()
+
+def _order_tables(statuses: Optional[List[str]]) -> list:
+    """Tabelas em que os pedidos com esses status podem estar (o arquivo só tem pedidos finalizados)."""
+    tables = [models.Order]
+    if not statuses or set(statuses) & set(FINISHED_STATUSES):
+        tables.append(models.ArchivedOrder)
+    return tables
+
+def _order_shards(establishment_id: Optional[int]) -> list:
+    """Shards com os pedidos buscados: o do estabelecimento ou, para o cliente, todos."""
+    return [shard_for_establishment(establishment_id)] if establishment_id is not None else shard_keys()
+
+# Busca pedidos com filtros opcionais (status, período [date_from, date_to), retirada, forma de
+# pagamento) e ordenação. O arquivo (só pedidos finalizados antigos) entra quando os status pedidos
+# incluem algum finalizado: ordenando por data, ele continua a tabela quente (ou a precede, em ordem
+# crescente); ordenando por valor, as páginas das duas tabelas são intercaladas. Com sharding, os
+# pedidos de um cliente estão em todos os shards: as páginas de todos são intercaladas.
+async def get_orders(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    establishment_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
+    statuses: Optional[List[str]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    is_pickup: Optional[bool] = None,
+    payment_methods: Optional[List[str]] = None,
+    sort: str = "-order_date"
+):
+    filters = {
+        "establishment_id": establishment_id, "customer_id": customer_id, "statuses": statuses,
+        "date_from": date_from, "date_to": date_to, "is_pickup": is_pickup, "payment_methods": payment_methods,
+    }
+    tables = _order_tables(statuses)
+    shards = _order_shards(establishment_id)
+
+    if len(shards) > 1 or (len(tables) > 1 and sort.endswith("total_amount")):
+        # Cada tabela (de cada shard) devolve as skip + limit primeiras; a página sai da intercalação
+        pages = []
+        for shard in shards:
+            use_shard(db, shard)
+            for model in tables:
+                pages.append(await _order_page(db, model, 0, skip + limit, sort, filters))
+        column = sort.lstrip("-")
+        merged = heapq.merge(*pages, key=lambda order: (getattr(order, column), order.id), reverse=sort.startswith("-"))
+        return list(itertools.islice(merged, skip, skip + limit))
+
+    use_shard(db, shards[0])
+    if sort == "order_date":
+        tables.reverse() # Em ordem crescente, os pedidos arquivados (mais antigos) vêm primeiro
+    orders = []
+    for model in tables:
+        page = await _order_page(db, model, skip, limit - len(orders), sort, filters)
+        orders.extend(page)
+        if len(orders) == limit:
+            break
+        # A página chegou ao fim desta tabela: o deslocamento na próxima desconta as linhas desta
+        skip = 0 if page else max(0, skip - await _order_count(db, model, filters))
+    return orders
+
+# Totais das listagens paginadas (GET /orders/page) sem COUNT(*) a cada página: sem filtros além
+# do dono, o total vem dos contadores mantidos a cada escrita (app/stats.py); com filtros, de uma
+# contagem guardada até a próxima escrita de pedido (canal "orders:<establishment_id>") ou por no
+# máximo COUNT_CACHE_TTL_SECONDS. Com approximate, a contagem para em APPROXIMATE_COUNT_CAP
+# pedidos (o app mostra "10000+"), para filtros que casam com muitas linhas.
+COUNT_CACHE_TTL_SECONDS = 30
+COUNT_CACHE_MAX_ENTRIES = 10_000
+APPROXIMATE_COUNT_CAP = 10_000
+_order_counts = invalidation.LocalCache("orders", max_entries=COUNT_CACHE_MAX_ENTRIES, ttl=COUNT_CACHE_TTL_SECONDS) # chave -> (total, aproximado)
+
+async def count_orders(
+    db: AsyncSession,
+    establishment_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
+    statuses: Optional[List[str]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    is_pickup: Optional[bool] = None,
+    payment_methods: Optional[List[str]] = None,
+    approximate: bool = False
+) -> Tuple[int, bool]:
+    """(total, aproximado) dos pedidos que get_orders listaria com os mesmos filtros."""
+    if not statuses and date_from is None and date_to is None and is_pickup is None and not payment_methods:
+        return await stats.get_order_total(db, establishment_id=establishment_id, customer_id=customer_id), False
+
+    key = (
+        establishment_id, customer_id, tuple(sorted(statuses or ())), date_from, date_to,
+        is_pickup, tuple(sorted(payment_methods or ())), approximate
+    )
+    cached = _order_counts.get(key)
+    if cached is not None:
+        return cached
+
+    filters = {
+        "establishment_id": establishment_id, "customer_id": customer_id, "statuses": statuses,
+        "date_from": date_from, "date_to": date_to, "is_pickup": is_pickup, "payment_methods": payment_methods,
+    }
+    cap = APPROXIMATE_COUNT_CAP if approximate else None
+    total = 0
+    for shard in _order_shards(establishment_id):
+        use_shard(db, shard)
+        for model in _order_tables(statuses):
+            total += await _order_count(db, model, filters, cap=None if cap is None else cap - total)
+            if cap is not None and total >= cap:
+                break
+        if cap is not None and total >= cap:
+            break
+    capped = cap is not None and total >= cap
+    _order_counts.set(key, (total, capped))
+    return total, capped
+
+async def order_exists(db: AsyncSession, order_id: int) -> bool:
+    """Existência na tabela quente (pedidos arquivados são somente leitura), pela chave primária."""
+    if not _use_order_shard(db, order_id):
+        return False
+    result = await db.execute(lambda_stmt(lambda: select(models.Order.id).where(models.Order.id == order_id)))
+    return result.first() is not None
+
+_ORDER_SNAPSHOT_COLUMNS = (
+    models.Order.establishment_id, models.Order.status, models.Order.order_date, models.Order.total_amount,
+    models.Order.customer_id
+)
+ORDER_UPDATE_ATTEMPTS = 3 # Leituras do status antes de desistir (409) quando o pedido muda entre a leitura e o UPDATE
+
+# Com establishment_id, só altera o pedido se ele for desse estabelecimento
+async def update_order(db: AsyncSession, order_id: int, order_update: schemas.OrderUpdate, establishment_id: Optional[int] = None):
+    if not _use_order_shard(db, order_id):
+        return None
+    shard = db.sync_session.info[SHARD_KEY]
+    conditions = [models.Order.id == order_id, *_owned(models.Order.establishment_id, establishment_id)]
+    update_data = order_update.model_dump(exclude_unset=True)
+    before = None
+    for _ in range(ORDER_UPDATE_ATTEMPTS):
+        values = dict(update_data)
+        expected = []
+        if "status" in update_data:
+            # O RETURNING só devolve os valores novos: o status anterior (contadores, estoque, fila e
+            # prepared_at) vem de uma leitura pela chave primária, feita só quando o status muda
+            row = (await db.execute(select(*_ORDER_SNAPSHOT_COLUMNS).where(*conditions))).first()
+            if row is None:
+                return None
+            before = stats.OrderSnapshot(*row)
+            # Saída da fila de cozinha (exceto cancelamento): registra o fim do preparo para as estimativas
+            new_status = update_data["status"]
+            if before.status in ACTIVE_STATUSES and new_status not in ACTIVE_STATUSES and new_status != "cancelled":
+                values["prepared_at"] = datetime.now()
+            # Compare-and-set: o UPDATE só vale se o status ainda for o lido. Se outra requisição o
+            # mudou no meio (dois cancelamentos ao mesmo tempo), nada é gravado e a leitura se repete.
+            expected = [models.Order.status == before.status]
+        result = await db.execute(
+            update(models.Order)
+            .where(*conditions, *expected)
+            # Corpo vazio: nada muda, mas a instrução ainda confirma a posse e devolve o pedido
+            .values(**(values or {"status": models.Order.status}))
+            .returning(models.Order)
+        )
+        db_order = result.scalars().first()
+        if db_order is not None or before is None:
+            break
+    else:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O pedido foi alterado por outra requisição. Tente novamente."
+        )
+    if db_order is None:
+        return None
+    # Itens para a resposta e para a fila (refresh(items) releria também a linha do pedido)
+    items = await db.execute(select(models.OrderItem).where(models.OrderItem.order_id == order_id))
+    set_committed_value(db_order, "items", items.scalars().all())
+    change, quantities = None, {}
+    if before is not None:
+        # Cancelamento devolve o estoque; reabrir um pedido cancelado reserva de novo (409 se faltar)
+        if before.status != "cancelled" and db_order.status == "cancelled":
+            change, quantities = _restore_stock, _cart_quantities(db_order.items)
+        elif before.status == "cancelled" and db_order.status != "cancelled":
+            change, quantities = _reserve_stock, await _stock_quantities(db, db_order.items)
+        await stats.record_order_change(db, before, stats.snapshot(db_order))
+    await invalidation.publish(db, f"orders:{db_order.establishment_id}")
+    await _commit_with_stock(
+        db, shard, change, quantities,
+        lambda: kitchen_queue.apply(db_order, previous_status=before.status if before else None)
     )
-    return result.scalars().all()
-
-async def update_order(db: AsyncSession, order_id: int, order_update: schemas.OrderUpdate):
-    db_order = await get_order(db, order_id)
-    if db_order:
-        update_data = order_update.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_order, key, value)
-        await db.commit()
-        await db.refresh(db_order)
     return db_order
 
-async def delete_order(db: AsyncSession, order_id: int):
-    db_order = await get_order(db, order_id)
-    if db_order:
-        # Deleta os itens do pedido primeiro
-        await db.execute(delete(models.OrderItem).where(models.OrderItem.order_id == order_id))
-        await db.delete(db_order)
-        await db.commit()
-        return {"message": "Pedido deletado com sucesso!"}
-    return None
-
-# Importações necessárias para as novas funções de pedido (coloque no topo do arquivo crud.py)
-from sqlalchemy.orm import selectinload
-from sqlalchemy import delete
\ No newline at end of file
+# Com establishment_id e/ou customer_id, só remove o pedido se ele for desse estabelecimento ou desse cliente.
+# Os itens são removidos pelo banco (ON DELETE CASCADE).
+async def delete_order(db: AsyncSession, order_id: int, establishment_id: Optional[int] = None, customer_id: Optional[int] = None):
+    if not _use_order_shard(db, order_id):
+        return None
+    shard = db.sync_session.info[SHARD_KEY]
+    owners = _owned(models.Order.establishment_id, establishment_id) + _owned(models.Order.customer_id, customer_id)
+    # Itens lidos antes: o ON DELETE CASCADE os remove junto com o pedido
+    items = (await db.execute(
+        select(models.OrderItem.product_id, models.OrderItem.quantity).where(models.OrderItem.order_id == order_id)
+    )).all()
+    result = await db.execute(
+        delete(models.Order)
+        .where(models.Order.id == order_id, *([or_(*owners)] if owners else []))
+        .returning(*_ORDER_SNAPSHOT_COLUMNS)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    before = stats.OrderSnapshot(*row)
+    await stats.record_order_change(db, before, None)
+    await invalidation.publish(db, f"orders:{before.establishment_id}")
+    # Pedido ainda em aberto: as unidades voltam ao estoque
+    change = _restore_stock if before.status not in FINISHED_STATUSES else None
+    await _commit_with_stock(db, shard, change, _cart_quantities(items), lambda: kitchen_queue.remove(before.establishment_id, order_id))
+    return {"message": "Pedido deletado com sucesso!"}
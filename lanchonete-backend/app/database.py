@@ -1,7 +1,15 @@
 # lanchonete_backend/app/database.py
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+import glob
+import os
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import MetaData, event, inspect
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.schema import CreateColumn, CreateTable
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.util import find_tables
 
 # URL de conexão com o banco de dados.
 # Para SQLite, 'sqlite+aiosqlite:///./sql_app.db' cria um arquivo 'sql_app.db' na raiz do projeto.
@@ -13,20 +21,267 @@ SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./sql_app.db"
 # Cria o "engine" do SQLAlchemy, que é a interface para o banco de dados.
 # connect_args={"check_same_thread": False} é necessário apenas para SQLite
 # para permitir que múltiplas threads acessem o banco de dados (o que FastAPI faz).
+# query_cache_size: cache de instruções compiladas (padrão 500). As lambdas do CRUD e as
+# combinações de filtros das listagens ocupam entradas próprias; com folga, nenhuma consulta
+# frequente é descartada e recompilada.
 engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, query_cache_size=1200
 )
 
+# --- Sharding opcional por estabelecimento ---
+
+# Com LANCHONETE_SHARDS=N (N > 0), os dados gravados a cada pedido ficam em N arquivos
+# shards/orders_{k}.db, com k = establishment_id % N: pedidos de estabelecimentos em shards
+# diferentes não disputam o mesmo lock de escrita do SQLite. O sql_app.db continua com
+# usuários, estabelecimentos, categorias e produtos (lidos, não gravados, ao criar um pedido).
+# Sem a variável (padrão), tudo fica no sql_app.db, como antes.
+#
+# As funções do CRUD indicam o shard com use_shard(db, ...) antes de tocar nas tabelas de
+# pedidos; a RoutingSession escolhe o banco de cada instrução pela tabela. Os IDs de pedido do
+# shard k ficam em [(k + 1) * SHARD_ID_SPAN, (k + 2) * SHARD_ID_SPAN), então o ID diz onde o
+# pedido está; abaixo de SHARD_ID_SPAN ficam os IDs do banco sem sharding.
+# Ligar o sharding (ou mudar N) não move os pedidos já gravados: check_order_placement recusa
+# iniciar a aplicação enquanto houver pedidos fora do lugar em que o sharding atual os procura.
+SHARD_COUNT = 0
+SHARD_DATABASE_URL = "sqlite+aiosqlite:///./shards/orders_{}.db"
+SHARD_ID_SPAN = 10 ** 12
+# Tabelas que existem só nos shards
+SHARDED_TABLES = frozenset({
+    "orders", "order_items", "archived_orders", "archived_order_items", "establishment_stats", "customer_stats",
+})
+# Tabelas presentes em todos os bancos: a fila de jobs e as versões de cache são gravadas no
+# banco da transação que as origina (o pedido), sem passar pelo lock do banco global
+LOCAL_TABLES = frozenset({"jobs", "cache_versions"})
+SHARD_KEY = "shard" # Chave em Session.info com o shard das próximas instruções
+
+shard_engines: List[AsyncEngine] = []
+_engine_hooks: List[Callable[[AsyncEngine], None]] = []
+
+def add_engine_hook(hook: Callable[[AsyncEngine], None]) -> None:
+    """Aplica `hook` a cada engine (o global e os shards), inclusive aos criados depois por configure_shards."""
+    _engine_hooks.append(hook)
+    for _, each_engine in all_engines():
+        hook(each_engine)
+
+def configure_shards(count: int) -> None:
+    """Define o número de shards (0 = sem sharding) e cria os engines deles.
+
+    Chamada na importação com LANCHONETE_SHARDS. Os engines anteriores são descartados sem
+    dispose(): quem troca o número de shards com a aplicação rodando (os testes) fecha os antigos.
+    """
+    global SHARD_COUNT
+    SHARD_COUNT = count
+    if count:
+        os.makedirs("shards", exist_ok=True)
+    shard_engines[:] = [
+        create_async_engine(SHARD_DATABASE_URL.format(shard), connect_args={"check_same_thread": False}, query_cache_size=1200)
+        for shard in range(count)
+    ]
+    for shard_engine in shard_engines:
+        for hook in _engine_hooks:
+            hook(shard_engine)
+
+def all_engines() -> List[Tuple[Optional[int], AsyncEngine]]:
+    """(shard, engine) de cada banco: o global (shard None) e, com sharding, os shards."""
+    return [(None, engine)] + list(enumerate(shard_engines))
+
+def shard_keys() -> List[Optional[int]]:
+    """Shards em que estão os pedidos ([None] sem sharding: o banco global)."""
+    return list(range(SHARD_COUNT)) if SHARD_COUNT else [None]
+
+def shard_for_establishment(establishment_id: int) -> Optional[int]:
+    return establishment_id % SHARD_COUNT if SHARD_COUNT else None
+
+def shard_id_floor(shard: int) -> int:
+    """Maior ID abaixo da faixa de IDs de pedido do shard."""
+    return (shard + 1) * SHARD_ID_SPAN
+
+def shard_for_order(order_id: int) -> Optional[int]:
+    """Shard do pedido pelo ID (None sem sharding).
+
+    Com sharding, LookupError para IDs fora das faixas dos shards atuais: pedidos do banco sem
+    sharding ou de um shard que não existe mais. Não existem para a aplicação (404).
+    """
+    if not SHARD_COUNT:
+        return None
+    shard = order_id // SHARD_ID_SPAN - 1
+    if not 0 <= shard < SHARD_COUNT:
+        raise LookupError(f"Pedido {order_id} fora das faixas de IDs dos {SHARD_COUNT} shards")
+    return shard
+
+def use_shard(db: AsyncSession, shard: Optional[int]) -> None:
+    """Direciona ao shard as próximas instruções da sessão nas tabelas de pedidos (sem sharding, nada muda)."""
+    db.sync_session.info[SHARD_KEY] = shard
+
+def _tables(mapper, clause) -> List[str]:
+    if mapper is not None:
+        return [mapper.local_table.name]
+    if clause is not None:
+        return [table.name for table in find_tables(clause, include_crud=True)]
+    return []
+
+class RoutingSession(Session):
+    """Sessão que manda as instruções nas tabelas de pedidos ao shard definido por use_shard."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not SHARD_COUNT:
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+        shard = self.info.get(SHARD_KEY)
+        for table in _tables(mapper, clause):
+            if table in SHARDED_TABLES:
+                if shard is None:
+                    raise RuntimeError(f"Tabela {table} acessada sem shard definido (use_shard)")
+                return shard_engines[shard].sync_engine
+            if table in LOCAL_TABLES and shard is not None:
+                return shard_engines[shard].sync_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+# O SQLite só aplica chaves estrangeiras (e ON DELETE CASCADE / SET NULL) com este PRAGMA,
+# que vale por conexão: é ligado em cada conexão nova do pool.
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+add_engine_hook(lambda each_engine: event.listen(each_engine.sync_engine, "connect", _enable_foreign_keys))
+configure_shards(int(os.environ.get("LANCHONETE_SHARDS", "0")))
+
 # Cria uma "sessionmaker" para produzir objetos de sessão.
 # expire_on_commit=False evita que os objetos carregados sejam expirados após o commit,
 # permitindo acessá-los mesmo depois de fechar a sessão.
 AsyncSessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine, class_=AsyncSession
+    autocommit=False, autoflush=False, bind=engine, class_=AsyncSession, expire_on_commit=False,
+    sync_session_class=RoutingSession
 )
 
 # Base para os modelos de banco de dados (nossas tabelas).
 Base = declarative_base()
 
+# create_all só cria tabelas que ainda não existem; colunas novas adicionadas aos modelos
+# depois que o banco foi criado precisam ser incluídas com ALTER TABLE.
+# Colunas novas devem ser anuláveis ou ter server_default, pois o SQLite exige isso.
+def add_missing_columns(connection):
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}")
+
+# Da mesma forma, create_all não cria índices novos em tabelas que já existem. Cria os índices
+# declarados que faltam e remove os "ix_" que não estão mais nos modelos (substituídos por outro nome)
+def sync_indexes(connection):
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        declared_indexes = {index.name for index in table.indexes}
+        for name in existing_indexes - declared_indexes:
+            if name.startswith("ix_"):
+                connection.exec_driver_sql(f"DROP INDEX {name}")
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(connection)
+
+# Num shard, cria só as tabelas de pedidos e as locais, sem as chaves estrangeiras para tabelas
+# que ficam no banco global (usuários, estabelecimentos, produtos)
+def create_shard_tables(connection):
+    inspector = inspect(connection)
+    names = SHARDED_TABLES | LOCAL_TABLES
+    for table in Base.metadata.sorted_tables:
+        if table.name not in names or inspector.has_table(table.name):
+            continue
+        local_foreign_keys = [fk.constraint for fk in table.foreign_keys if fk.column.table.name in names]
+        connection.execute(CreateTable(table, include_foreign_key_constraints=local_foreign_keys))
+        for index in table.indexes:
+            index.create(connection)
+
+# Pedidos gravados sem sharding ou com outro número de shards não são encontrados pelo sharding
+# atual (o ID e o estabelecimento apontam para outro banco). Em vez de responder 404 para eles,
+# a aplicação não inicia até que sejam movidos (ou o número de shards anterior seja restaurado).
+ORDER_TABLES = ("orders", "archived_orders")
+
+async def _has_rows(db_engine: AsyncEngine, table: str, where: str = "1") -> bool:
+    async with db_engine.connect() as conn:
+        return bool((await conn.exec_driver_sql(f"SELECT EXISTS(SELECT 1 FROM {table} WHERE {where})")).scalar())
+
+def _leftover_shards() -> List[str]:
+    """Arquivos de shards além do número atual que ainda têm pedidos."""
+    leftover = []
+    for path in sorted(glob.glob(os.path.join("shards", "orders_*.db"))):
+        index = os.path.basename(path)[len("orders_"):-len(".db")]
+        if not index.isdigit() or int(index) < SHARD_COUNT:
+            continue
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            if any(connection.execute(f"SELECT EXISTS(SELECT 1 FROM {table})").fetchone()[0] for table in ORDER_TABLES):
+                leftover.append(path)
+        except sqlite3.OperationalError: # Arquivo sem as tabelas de pedidos
+            pass
+        finally:
+            connection.close()
+    return leftover
+
+async def check_order_placement() -> None:
+    """RuntimeError se houver pedidos onde o sharding atual (LANCHONETE_SHARDS) não os procura."""
+    misplaced = []
+    if SHARD_COUNT:
+        misplaced += [f"{table} em sql_app.db" for table in ORDER_TABLES if await _has_rows(engine, table)]
+    for shard, shard_engine in enumerate(shard_engines):
+        floor = shard_id_floor(shard)
+        wrong = f"establishment_id % {SHARD_COUNT} != {shard} OR id <= {floor} OR id >= {floor + SHARD_ID_SPAN}"
+        misplaced += [f"{table} do shard {shard}" for table in ORDER_TABLES if await _has_rows(shard_engine, table, wrong)]
+    misplaced += _leftover_shards()
+    if misplaced:
+        raise RuntimeError(
+            f"Há pedidos fora do lugar para LANCHONETE_SHARDS={SHARD_COUNT}: {', '.join(misplaced)}. "
+            "Mova-os para o banco certo ou volte ao número de shards com que foram gravados."
+        )
+
+# O SQLite não altera chaves estrangeiras de uma tabela existente. Tabelas criadas antes de um
+# ON DELETE ser declarado no modelo são recriadas com a definição atual, copiando os dados
+# (procedimento recomendado pela documentação do SQLite, com as chaves estrangeiras desligadas).
+def _foreign_keys_outdated(connection, table) -> bool:
+    existing = {
+        (row[3], row[2], row[6].upper())
+        for row in connection.exec_driver_sql(f"PRAGMA foreign_key_list({table.name})")
+    }
+    declared = {
+        (fk.parent.name, fk.column.table.name, (fk.ondelete or "NO ACTION").upper())
+        for fk in table.foreign_keys
+    }
+    return existing != declared
+
+def rebuild_outdated_foreign_keys(connection):
+    inspector = inspect(connection)
+    outdated = [
+        table for table in Base.metadata.sorted_tables
+        if inspector.has_table(table.name) and _foreign_keys_outdated(connection, table)
+    ]
+    if not outdated:
+        return
+    # Cópia dos modelos para criar as tabelas temporárias sem alterar Base.metadata
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    connection.exec_driver_sql("PRAGMA foreign_keys=OFF") # Não tem efeito dentro de uma transação
+    for table in outdated:
+        temp_name = f"{table.name}__rebuild"
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        columns = ", ".join(column.name for column in table.columns if column.name in existing_columns)
+        connection.execute(CreateTable(table.to_metadata(metadata, name=temp_name)))
+        connection.exec_driver_sql(f"INSERT INTO {temp_name} ({columns}) SELECT {columns} FROM {table.name}")
+        connection.exec_driver_sql(f"DROP TABLE {table.name}")
+        connection.exec_driver_sql(f"ALTER TABLE {temp_name} RENAME TO {table.name}")
+        for index in table.indexes:
+            index.create(connection)
+    connection.commit()
+    connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+
 # Função assíncrona para obter uma sessão de banco de dados.
 # Usaremos essa função como uma dependência no FastAPI.
 async def get_db():
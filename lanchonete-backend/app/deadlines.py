@@ -0,0 +1,348 @@
+# lanchonete_backend/app/deadlines.py
+
+# Prazo (deadline) por requisição, rejeição antecipada sob sobrecarga e cancelamento de
+# requisições abandonadas.
+#
+# - DeadlineMiddleware dá a cada requisição um Deadline (DEFAULT_DEADLINE_SECONDS, ou o prazo da
+#   rota, declarado nos routers com `dependencies=[Depends(deadlines.within(segundos))]`).
+#   Esgotado o prazo, a requisição é cancelada e responde 503; se o cliente desconectar antes,
+#   ela é cancelada sem resposta.
+# - O prazo chega ao SQLite pelas conexões do pool: ao pegar uma conexão, a requisição registra
+#   nela o seu Deadline, e um progress handler interrompe a instrução em execução quando o prazo
+#   acaba (ou a requisição é cancelada). O erro vira 503. A espera pelo lock de escrita
+#   (busy_timeout) é fixa; se o prazo vence durante ela, quem corta é o cancelamento da requisição.
+# - O commit de um pedido e a fila da cozinha em memória são atualizados juntos (shielded): um
+#   cancelamento no meio espera os dois terminarem.
+# - Antes de começar, a requisição é rejeitada com 503 (e Retry-After) quando há requisições
+#   demais em andamento ou quando a espera estimada (latência recente) já passa do prazo dela.
+#   BoundedExecutor faz o mesmo para trabalho de CPU em threads (bcrypt).
+#
+# Tarefas em segundo plano não têm Deadline: nunca são interrompidas pelo progress handler.
+
+import asyncio
+import contextvars
+import functools
+import logging
+import math
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE_SECONDS = 10.0
+MAX_IN_FLIGHT = 100 # Requisições simultâneas; acima disso, 503 imediato
+LATENCY_EWMA_WEIGHT = 0.1 # Peso de cada requisição concluída na latência recente
+LATENCY_DECAY_SECONDS = 2.0 # A estimativa decai quando nada termina (para voltar a aceitar depois de rejeitar)
+BUSY_TIMEOUT_MS = 5000 # Espera pelo lock de escrita, fixa por conexão
+PROGRESS_HANDLER_OPS = 5000 # Instruções da VM do SQLite entre verificações do prazo
+RETRY_AFTER_SECONDS = 1
+
+OVERLOADED_DETAIL = "Servidor sobrecarregado, tente novamente em instantes"
+EXPIRED_DETAIL = "Tempo limite da requisição esgotado"
+
+class Deadline:
+    def __init__(self, start: float, seconds: float):
+        self.start = start
+        self.at = start + seconds
+        self.cancelled = False
+        self.changed: Optional[asyncio.Future] = None # Acorda o middleware quando a rota troca o prazo
+
+    def remaining(self) -> float:
+        return 0.0 if self.cancelled else self.at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.cancelled or time.monotonic() >= self.at
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def set_seconds(self, seconds: float) -> None:
+        self.at = self.start + seconds
+        if self.changed is not None and not self.changed.done():
+            self.changed.set_result(None)
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+def current() -> Optional[Deadline]:
+    """Deadline da requisição em andamento (None fora de requisições)."""
+    return _current.get()
+
+def overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=OVERLOADED_DETAIL,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+def expired() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=EXPIRED_DETAIL,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+# --- Estimativa de espera ---
+
+class _Load:
+    def __init__(self):
+        self.in_flight = 0
+        self.latency = 0.0 # Média móvel exponencial das latências concluídas, em segundos
+        self.updated = time.monotonic()
+        self.shed = 0 # Requisições rejeitadas desde o startup
+
+    def record(self, latency: float) -> None:
+        now = time.monotonic()
+        self.latency = self._decayed(now) * (1 - LATENCY_EWMA_WEIGHT) + latency * LATENCY_EWMA_WEIGHT
+        self.updated = now
+
+    def _decayed(self, now: float) -> float:
+        return self.latency * math.exp(-(now - self.updated) / LATENCY_DECAY_SECONDS)
+
+    def estimated_wait(self) -> float:
+        if self.in_flight == 0:
+            return 0.0 # Ninguém na frente
+        return self._decayed(time.monotonic())
+
+_load = _Load()
+
+def within(seconds: float):
+    """Dependência de rota: troca o prazo padrão por `seconds` e rejeita já se a espera estimada passa dele."""
+    async def apply_deadline():
+        deadline = _current.get()
+        if deadline is None:
+            return
+        deadline.set_seconds(seconds)
+        if _load.estimated_wait() > seconds:
+            _load.shed += 1
+            raise overloaded()
+    return apply_deadline
+
+# --- Middleware ---
+
+class DeadlineMiddleware:
+    """Middleware ASGI: conta as requisições em andamento, aplica o prazo e cancela as abandonadas."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if _load.in_flight >= MAX_IN_FLIGHT or _load.estimated_wait() > DEFAULT_DEADLINE_SECONDS:
+            _load.shed += 1
+            await _send_503(send, OVERLOADED_DETAIL)
+            return
+
+        start = time.monotonic()
+        deadline = Deadline(start, DEFAULT_DEADLINE_SECONDS)
+        response_started = False
+        messages: asyncio.Queue = asyncio.Queue()
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        async def read_client():
+            # Repassa o corpo à aplicação e, depois dele, fica esperando a desconexão do cliente
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        token = _current.set(deadline) # Antes de criar as tarefas: elas copiam o contexto atual
+        try:
+            app_task = asyncio.create_task(self.app(scope, messages.get, tracked_send))
+            client_task = asyncio.create_task(read_client())
+        finally:
+            _current.reset(token)
+        _load.in_flight += 1
+        loop = asyncio.get_running_loop()
+        try:
+            while not app_task.done():
+                deadline.changed = loop.create_future()
+                await asyncio.wait(
+                    {app_task, client_task, deadline.changed},
+                    timeout=max(deadline.remaining(), 0),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if app_task.done():
+                    break
+                if client_task.done():
+                    # Cliente desconectou: ninguém espera mais por esta resposta
+                    deadline.cancel()
+                    await _cancel(app_task)
+                    return
+                if deadline.expired(): # (ou a rota só trocou o prazo: volta a esperar pelo novo)
+                    deadline.cancel()
+                    await _cancel(app_task)
+                    logger.warning("Prazo esgotado: %s %s", scope["method"], scope["path"])
+                    if not response_started:
+                        await _send_503(send, EXPIRED_DETAIL)
+                    return
+            app_task.result() # Propaga erros da aplicação
+        finally:
+            _load.in_flight -= 1
+            _load.record(time.monotonic() - start)
+            client_task.cancel()
+            if not app_task.done(): # O próprio middleware foi cancelado (ex.: shutdown)
+                app_task.cancel()
+
+async def _cancel(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    except Exception:
+        logger.exception("Erro ao cancelar a requisição")
+
+async def _send_503(send, detail: str) -> None:
+    response = JSONResponse(
+        {"detail": detail},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+    await response({"type": "http"}, None, send)
+
+# --- Trechos que não podem ser interrompidos ---
+
+async def shielded(awaitable):
+    """Executa `awaitable` até o fim mesmo que a requisição seja cancelada (prazo ou desconexão).
+
+    Para o commit e o que precisa acompanhá-lo na memória do processo (fila da cozinha): cancelada
+    entre os dois, a requisição deixaria o banco gravado e a memória sem a mudança. O cancelamento
+    é repassado depois que o trecho termina.
+    """
+    task = asyncio.ensure_future(awaitable)
+    cancelled = False
+    while True:
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.done():
+                raise
+            cancelled = True # Ainda em andamento: espera de novo
+            continue
+        if cancelled:
+            raise asyncio.CancelledError()
+        return result
+
+async def compensating(awaitable):
+    """Como shielded, e sem o prazo da requisição: para desfazer o que já foi gravado quando o
+    restante da escrita falhou, inclusive porque o prazo acabou (o progress handler a interromperia)."""
+    token = _current.set(None) # A tarefa criada por shielded copia o contexto, já sem o Deadline
+    try:
+        return await shielded(awaitable)
+    finally:
+        _current.reset(token)
+
+# --- Banco de dados ---
+
+class _ConnectionDeadline:
+    """Prazo da requisição que está usando a conexão, consultado pelo progress handler do SQLite."""
+    deadline: Optional[Deadline] = None
+
+    def interrupt(self) -> bool: # Chamado na thread do aiosqlite; True interrompe a instrução
+        deadline = self.deadline
+        return deadline is not None and deadline.expired()
+
+class _DeadlineConnection(sqlite3.Connection):
+    """Conexão sqlite3 (factory do sqlite3.connect) com o progress handler do prazo já instalado."""
+
+    def __init__(self, holder: _ConnectionDeadline, *args, **kwargs):
+        super().__init__(*args, **kwargs) # Na thread do aiosqlite, dona da conexão
+        self.set_progress_handler(holder.interrupt, PROGRESS_HANDLER_OPS)
+
+def install_database_hooks(engine) -> None:
+    sync_engine = engine.sync_engine
+
+    # A conexão já nasce configurada, pelos argumentos do sqlite3.connect: nenhum evento do pool
+    # espera pelo banco. Um await num evento pode ser cancelado junto com a requisição, e a
+    # conexão que falha no meio da configuração não volta mais para o pool.
+    @event.listens_for(sync_engine, "do_connect")
+    def _configure_connection(dialect, connection_record, cargs, cparams):
+        holder = _ConnectionDeadline()
+        connection_record.info["deadline"] = holder
+        cparams["timeout"] = BUSY_TIMEOUT_MS / 1000 # busy_timeout
+        cparams["factory"] = functools.partial(_DeadlineConnection, holder)
+
+    @event.listens_for(sync_engine, "checkout")
+    def _apply_deadline(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["deadline"].deadline = _current.get()
+
+    @event.listens_for(sync_engine, "checkin")
+    def _clear_deadline(dbapi_connection, connection_record):
+        holder = connection_record.info.get("deadline")
+        if holder is not None:
+            holder.deadline = None
+
+async def database_error_handler(request: Request, exc: OperationalError):
+    """Instrução interrompida pelo prazo ou lock de escrita não obtido a tempo: 503 em vez de 500."""
+    message = str(exc.orig)
+    if message == "interrupted":
+        detail = EXPIRED_DETAIL
+    elif message == "database is locked":
+        detail = OVERLOADED_DETAIL
+    else:
+        raise exc
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+# --- Trabalho de CPU em threads ---
+
+class BoundedExecutor:
+    """Pool de threads que rejeita (503) quando a fila já faria a requisição perder o prazo."""
+
+    def __init__(self, max_workers: int, name: str):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._pending = 0 # Tarefas na fila ou executando
+        self._duration = 0.0 # Média móvel da duração de cada tarefa, em segundos
+
+    def estimated_wait(self) -> float:
+        queued = max(0, self._pending - self.max_workers + 1)
+        return queued * self._duration / self.max_workers
+
+    def _timed(self, fn, args):
+        started = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.monotonic() - started
+            self._duration = elapsed if not self._duration else self._duration * 0.9 + elapsed * 0.1
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+    async def run(self, fn, *args):
+        deadline = _current.get()
+        if deadline is not None and self.estimated_wait() > deadline.remaining():
+            _load.shed += 1
+            raise overloaded()
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        submitted = self._executor.submit(self._timed, fn, args)
+        # Libera a vaga quando a tarefa termina de fato (ou é descartada da fila), não quando desistimos dela
+        submitted.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        future = asyncio.wrap_future(submitted)
+        if deadline is None:
+            return await future
+        try:
+            # Ao estourar (ou se a requisição for cancelada), a tarefa ainda na fila é descartada
+            return await asyncio.wait_for(future, max(deadline.remaining(), 0))
+        except asyncio.TimeoutError:
+            raise expired()
@@ -0,0 +1,118 @@
+# lanchonete_backend/app/geo.py
+
+# Busca de estabelecimentos próximos usando um índice espacial R*Tree do SQLite.
+#
+# A tabela virtual `establishments_rtree` guarda uma caixa (um ponto) por estabelecimento.
+# A busca consulta a caixa que envolve o círculo pedido — o R*Tree devolve só os candidatos
+# da região, sem varrer a tabela — e calcula a distância real (haversine) apenas para eles.
+
+import math
+from typing import List, Tuple
+
+from sqlalchemy import DDL, column, delete, event, select, table
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.database import Base
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.195 # Distância de 1 grau de latitude, em km
+INITIAL_SEARCH_FRACTION = 1 / 8 # Raio inicial da busca incremental, como fração do raio pedido
+
+establishments_rtree = table(
+    "establishments_rtree",
+    column("id"),
+    column("min_lat"),
+    column("max_lat"),
+    column("min_lon"),
+    column("max_lon"),
+)
+
+# O create_all não conhece tabelas virtuais; o índice é criado logo depois dele
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS establishments_rtree "
+        "USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+    ),
+)
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distância em km entre dois pontos (graus decimais) sobre a superfície da Terra."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Caixa (min_lat, max_lat, min_lon, max_lon) que contém o círculo de raio radius_km."""
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    d_lon = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+    return (
+        max(lat - d_lat, -90.0), min(lat + d_lat, 90.0),
+        max(lon - d_lon, -180.0), min(lon + d_lon, 180.0),
+    )
+
+# --- Manutenção do índice (chamada pelas funções de escrita do CRUD) ---
+
+async def index_establishment(db: AsyncSession, establishment_id: int, latitude, longitude) -> None:
+    if latitude is None or longitude is None:
+        await unindex_establishment(db, establishment_id)
+        return
+    await db.execute(
+        insert(establishments_rtree)
+        .prefix_with("OR REPLACE")
+        .values(id=establishment_id, min_lat=latitude, max_lat=latitude, min_lon=longitude, max_lon=longitude)
+    )
+
+async def unindex_establishment(db: AsyncSession, establishment_id: int) -> None:
+    await db.execute(delete(establishments_rtree).where(establishments_rtree.c.id == establishment_id))
+
+def rebuild_index(connection) -> None:
+    """Reconstrói o índice a partir da tabela de estabelecimentos (usado no startup)."""
+    connection.exec_driver_sql("DELETE FROM establishments_rtree")
+    connection.exec_driver_sql(
+        "INSERT INTO establishments_rtree (id, min_lat, max_lat, min_lon, max_lon) "
+        "SELECT id, latitude, latitude, longitude, longitude FROM establishments "
+        "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    )
+
+# --- Consulta ---
+
+async def _candidates_in_box(db: AsyncSession, lat: float, lon: float, radius_km: float):
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    result = await db.execute(
+        select(models.Establishment)
+        .join(establishments_rtree, establishments_rtree.c.id == models.Establishment.id)
+        .where(
+            establishments_rtree.c.max_lat >= min_lat,
+            establishments_rtree.c.min_lat <= max_lat,
+            establishments_rtree.c.max_lon >= min_lon,
+            establishments_rtree.c.min_lon <= max_lon,
+        )
+    )
+    return result.scalars().all()
+
+async def find_nearby(db: AsyncSession, lat: float, lon: float, radius_km: float, limit: int) -> List[Tuple[models.Establishment, float]]:
+    """Retorna até `limit` estabelecimentos a no máximo `radius_km`, do mais próximo ao mais distante.
+
+    A busca começa com um raio menor e dobra até achar `limit` resultados dentro do círculo
+    (que são, então, os mais próximos) ou chegar ao raio pedido. Assim, em regiões densas,
+    a consulta dos k mais próximos não precisa ler todos os candidatos do raio completo.
+    """
+    search_radius = radius_km * INITIAL_SEARCH_FRACTION
+    while True:
+        search_radius = min(search_radius, radius_km)
+        found = []
+        for establishment in await _candidates_in_box(db, lat, lon, search_radius):
+            distance = haversine_km(lat, lon, establishment.latitude, establishment.longitude)
+            if distance <= search_radius:
+                found.append((establishment, distance))
+        if len(found) >= limit or search_radius >= radius_km:
+            found.sort(key=lambda pair: pair[1])
+            return found[:limit]
+        search_radius *= 2
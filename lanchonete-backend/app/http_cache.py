@@ -0,0 +1,48 @@
+# lanchonete_backend/app/http_cache.py
+
+# GET condicional (ETag / Last-Modified) para as rotas de leitura de um único recurso.
+# O ETag vem da coluna `version` (incrementada pelas funções de atualização do CRUD),
+# então a rota só precisa consultar a versão para responder 304 Not Modified.
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response, status
+
+def make_etag(kind: str, obj_id: int, version: int, updated_at: Optional[datetime]) -> str:
+    # updated_at entra no ETag porque o SQLite pode reutilizar o id de uma linha apagada
+    stamp = int(_as_utc(updated_at).timestamp()) if updated_at else 0
+    return f'W/"{kind}-{obj_id}-{version}-{stamp}"'
+
+def _as_utc(value: datetime) -> datetime:
+    # As datas são gravadas sem fuso (func.now() do SQLite já está em UTC)
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def cache_headers(etag: str, updated_at: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"} # no-cache: o cliente sempre revalida
+    if updated_at:
+        headers["Last-Modified"] = format_datetime(_as_utc(updated_at), usegmt=True)
+    return headers
+
+def is_not_modified(request: Request, etag: str, updated_at: Optional[datetime]) -> bool:
+    """Avalia If-None-Match (prioritário) e If-Modified-Since, conforme a RFC 9110."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Comparação fraca: ignora o prefixo W/
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and updated_at:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(updated_at).replace(microsecond=0) <= _as_utc(since)
+    return False
+
+def not_modified_response(etag: str, updated_at: Optional[datetime]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag, updated_at))
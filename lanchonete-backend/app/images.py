@@ -0,0 +1,136 @@
+# lanchonete_backend/app/images.py
+
+# Armazenamento local das imagens de produtos.
+#
+# Os originais são gravados pelo hash SHA-256 do conteúdo (media/originals/ab/abcdef...),
+# então o mesmo arquivo enviado duas vezes ocupa espaço uma única vez e as URLs nunca
+# mudam de conteúdo — por isso podem ser servidas com cache "immutable".
+# As miniaturas WebP são geradas em um pool de processos, nunca no event loop.
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MEDIA_ROOT = "./media"
+ORIGINALS_DIR = os.path.join(MEDIA_ROOT, "originals")
+THUMBNAILS_DIR = os.path.join(MEDIA_ROOT, "thumbnails")
+
+THUMBNAIL_SIZES = (96, 320, 640) # Lado maior da miniatura, em pixels
+LIST_THUMBNAIL_SIZE = 320 # Tamanho usado em Product.image_url (telas de lista)
+THUMBNAIL_QUALITY = 80
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024 # 10 MB
+THUMBNAIL_WORKERS = 2
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_pool: Optional[ProcessPoolExecutor] = None
+# Gerações em andamento neste processo, para não gerar o mesmo hash duas vezes ao mesmo tempo
+_in_progress: Dict[str, asyncio.Future] = {}
+
+# --- Caminhos e URLs ---
+
+def is_valid_digest(digest: str) -> bool:
+    return len(digest) == 64 and all(c in "0123456789abcdef" for c in digest)
+
+def original_path(digest: str) -> str:
+    return os.path.join(ORIGINALS_DIR, digest[:2], digest)
+
+def thumbnail_path(digest: str, size: int) -> str:
+    return os.path.join(THUMBNAILS_DIR, digest[:2], f"{digest}_{size}.webp")
+
+def thumbnail_url(digest: str, size: int) -> str:
+    return f"/products/images/{digest}/{size}.webp"
+
+def variant_urls(digest: str) -> Dict[str, str]:
+    return {str(size): thumbnail_url(digest, size) for size in THUMBNAIL_SIZES}
+
+# --- Gravação dos originais ---
+
+def is_supported_image(data: bytes) -> bool:
+    """Confere a assinatura do arquivo (JPEG, PNG ou WebP) sem decodificar a imagem."""
+    return (
+        data.startswith(b"\xff\xd8\xff")
+        or data.startswith(b"\x89PNG\r\n\x1a\n")
+        or (data[:4] == b"RIFF" and data[8:12] == b"WEBP")
+    )
+
+def _write_atomically(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def store_original(data: bytes) -> str:
+    """Grava o original (se ainda não existir) e retorna seu hash. Bloqueante: use em threadpool."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = original_path(digest)
+    if not os.path.exists(path):
+        _write_atomically(path, data)
+    return digest
+
+# --- Geração de miniaturas (executa nos processos do pool) ---
+
+def _render_thumbnails(digest: str) -> None:
+    from PIL import Image, ImageOps # Importado só nos processos do pool
+
+    with Image.open(original_path(digest)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for size in sorted(THUMBNAIL_SIZES, reverse=True):
+            path = thumbnail_path(digest, size)
+            if os.path.exists(path):
+                continue
+            image.thumbnail((size, size)) # Reduz a partir da miniatura anterior, que é maior
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            os.close(fd)
+            try:
+                image.save(tmp_path, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+    return _pool
+
+def thumbnails_ready(digest: str) -> bool:
+    return all(os.path.exists(thumbnail_path(digest, size)) for size in THUMBNAIL_SIZES)
+
+async def generate_thumbnails(digest: str) -> bool:
+    """Gera as miniaturas que faltam no pool de processos. Retorna False se a imagem for inválida."""
+    if thumbnails_ready(digest):
+        return True
+    future = _in_progress.get(digest)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        future = asyncio.ensure_future(loop.run_in_executor(_get_pool(), _render_thumbnails, digest))
+        _in_progress[digest] = future
+        future.add_done_callback(lambda _: _in_progress.pop(digest, None))
+    try:
+        await asyncio.shield(future)
+    except Exception:
+        logger.exception("Falha ao gerar miniaturas da imagem %s", digest)
+        return False
+    return True
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,192 @@
+# lanchonete_backend/app/invalidation.py
+
+# Invalidação de caches em memória entre processos (vários workers do uvicorn/gunicorn).
+#
+# Cada escrita relevante chama `publish(db, "products:12")` dentro da mesma transação.
+# Isso grava na tabela `cache_versions` o canal com uma sequência global crescente.
+# Cada processo guarda a última sequência que já viu e, no máximo a cada POLL_INTERVAL
+# segundos, consulta apenas as linhas com sequência maior (uma busca no índice de `seq`).
+# Assim, nenhum broker externo é necessário e o atraso máximo é POLL_INTERVAL.
+# Com sharding (ver app/database.py), as escritas de pedidos publicam no shard em que estão:
+# cada banco tem a sua sequência, e o poll consulta todos.
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SHARD_KEY, all_engines
+
+logger = logging.getLogger(__name__)
+
+# Intervalo máximo (em segundos) entre duas consultas à tabela de versões.
+# É também o atraso máximo para um worker perceber a invalidação feita por outro.
+POLL_INTERVAL = 1.0
+
+# Chave usada em `Session.info` para guardar os canais (e suas sequências) publicados na transação atual
+_PENDING_KEY = "invalidated_channels"
+
+_subscribers: List[Tuple[str, Callable[[str], None], bool]] = []
+_last_seq: Dict[Optional[int], int] = {} # Por banco (shard; None = banco global)
+_last_poll = 0.0
+# (shard, canal, seq) publicados por este processo e ainda não vistos pelo poll, para não despachá-los de novo
+_published: Set[Tuple[Optional[int], str, int]] = set()
+
+# --- Assinatura e despacho local ---
+
+def subscribe(prefix: str, callback: Callable[[str], None], local: bool = True) -> None:
+    """Registra um callback chamado com o nome do canal sempre que ele for invalidado.
+
+    `prefix` casa com o próprio canal e com seus subcanais: "products" recebe "products:12".
+    Com local=False, o callback só recebe as invalidações feitas por outros processos
+    (útil para estruturas que o próprio CRUD já atualiza no processo atual).
+    """
+    _subscribers.append((prefix, callback, local))
+
+def _matches(prefix: str, channel: str) -> bool:
+    return channel == prefix or channel.startswith(prefix + ":")
+
+def _dispatch(channels: Iterable[str], remote: bool) -> None:
+    for channel in channels:
+        for prefix, callback, local in _subscribers:
+            if (remote or local) and _matches(prefix, channel):
+                try:
+                    callback(channel)
+                except Exception:
+                    logger.exception("Falha ao invalidar cache do canal %s", channel)
+
+# --- Publicação (chamada pelas funções de escrita do CRUD) ---
+
+async def publish(db: AsyncSession, *channels: str) -> None:
+    """Marca os canais como invalidados na transação corrente da sessão.
+
+    Os outros processos percebem após o commit (via `poll`); o processo atual é
+    notificado imediatamente após o commit.
+    """
+    if not channels:
+        return
+    next_seq = select(func.coalesce(func.max(models.CacheVersion.seq), 0) + 1).scalar_subquery()
+    stmt = insert(models.CacheVersion).values([{"channel": channel, "seq": next_seq} for channel in channels])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.CacheVersion.channel],
+        set_={"seq": stmt.excluded.seq}
+    ).returning(models.CacheVersion.channel, models.CacheVersion.seq)
+    result = await db.execute(stmt)
+    shard = db.sync_session.info.get(SHARD_KEY)
+    db.sync_session.info.setdefault(_PENDING_KEY, {}).update(
+        {(shard, channel): seq for channel, seq in result.tuples().all()}
+    )
+
+@event.listens_for(Session, "after_commit")
+def _notify_after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        _published.update((shard, channel, seq) for (shard, channel), seq in pending.items())
+        _dispatch((channel for _, channel in pending), remote=False)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+# --- Consulta periódica (chamada a cada requisição, barata quando nada mudou) ---
+
+async def init() -> None:
+    """Posiciona o processo na sequência atual, sem disparar invalidações antigas."""
+    global _last_poll
+    for shard, db_engine in all_engines():
+        async with db_engine.connect() as conn:
+            result = await conn.execute(select(func.coalesce(func.max(models.CacheVersion.seq), 0)))
+            _last_seq[shard] = result.scalar_one()
+    _last_poll = time.monotonic()
+
+async def poll(force: bool = False) -> None:
+    """Despacha as invalidações feitas por outros processos desde a última consulta."""
+    global _last_poll
+    now = time.monotonic()
+    if not force and now - _last_poll < POLL_INTERVAL:
+        return
+    _last_poll = now # Marcado antes do await para que requisições concorrentes não consultem de novo
+    for shard, db_engine in all_engines():
+        last_seq = _last_seq.get(shard, 0)
+        async with db_engine.connect() as conn:
+            result = await conn.execute(
+                select(models.CacheVersion.channel, models.CacheVersion.seq)
+                .where(models.CacheVersion.seq > last_seq)
+                .order_by(models.CacheVersion.seq)
+            )
+            rows = result.all()
+        if rows:
+            last_seq = _last_seq[shard] = max(last_seq, rows[-1].seq)
+            _dispatch((row.channel for row in rows if (shard, row.channel, row.seq) not in _published), remote=True)
+            _published.difference_update({item for item in _published if item[0] == shard and item[2] <= last_seq})
+
+class PollMiddleware:
+    """Middleware ASGI: consulta as invalidações (poll) antes de atender cada requisição HTTP.
+
+    ASGI puro, como o DeadlineMiddleware: o @app.middleware("http") roda a rota num task group do
+    anyio, que depois de um cancelamento (prazo esgotado ou cliente desconectado) cancela de novo
+    a cada await, inclusive os da limpeza do SQLAlchemy, e a conexão não volta para o pool.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await poll()
+        await self.app(scope, receive, send)
+
+# --- Cache local simples que se limpa ao receber invalidações ---
+
+class LocalCache:
+    """Dicionário em memória do processo, esvaziado quando algum canal assinado é invalidado.
+
+    Com max_entries, passar do limite descarta a entrada usada há mais tempo (LRU); com ttl, cada
+    entrada vale por no máximo ttl segundos, mesmo sem invalidação.
+    """
+
+    def __init__(self, *prefixes: str, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self._data: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict() # chave -> (expira em, valor)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        for prefix in prefixes:
+            subscribe(prefix, self.invalidate)
+
+    def get(self, key: Hashable, default: Optional[object] = None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: object) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else math.inf
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        if self.max_entries is not None and len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[object] = None):
+        entry = self._data.pop(key, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[1]
+
+    def keys(self):
+        return self._data.keys()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def invalidate(self, channel: Optional[str] = None) -> None:
+        self._data.clear()
@@ -0,0 +1,315 @@
+# lanchonete_backend/app/jobs.py
+
+# Fila durável de tarefas em segundo plano, guardada na tabela `jobs` do próprio SQLite.
+#
+# `enqueue(db, "order_created", {...})` só adiciona a linha à sessão: o job é gravado na mesma
+# transação da escrita que o originou (se o pedido não for gravado, o job também não é).
+# Um worker asyncio em cada processo reivindica os jobs prontos com um único UPDATE ... RETURNING
+# (o SQLite serializa as escritas, então dois workers nunca pegam o mesmo job) e os executa,
+# respeitando o limite de concorrência de cada tipo.
+#
+# A entrega é "pelo menos uma vez": um job cujo worker caiu no meio da execução volta para a
+# fila depois de LEASE_SECONDS, então os handlers devem ser idempotentes. Falhas são repetidas
+# com espera exponencial até max_attempts; depois disso o job fica com status "failed".
+#
+# Com sharding (ver app/database.py), o job fica no banco da transação que o enfileirou (o shard
+# do pedido) e o worker busca jobs em todos os bancos.
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set
+
+from sqlalchemy import and_, delete, event, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import AsyncSessionLocal, SHARD_KEY, all_engines, use_shard
+from app.profiling import percentile_ms
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = 1.0 # Atraso máximo para perceber jobs enfileirados por outros processos
+LEASE_SECONDS = 5 * 60 # Job "running" há mais tempo que isso é considerado abandonado
+RETRY_BASE_SECONDS = 2.0 # Espera antes da 2ª tentativa; dobra a cada nova falha
+RETRY_MAX_SECONDS = 10 * 60
+DRAIN_TIMEOUT_SECONDS = 10.0 # Tempo para os jobs em execução terminarem no shutdown
+KEEP_FINISHED_FOR = timedelta(days=1) # Jobs concluídos são apagados depois disso
+RECENT_SAMPLES = 200 # Amostras de latência guardadas por tipo, para as métricas
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Chave usada em `Session.info` para acordar o worker local após o commit
+_ENQUEUED_KEY = "enqueued_jobs"
+
+@dataclass
+class JobHandler:
+    func: Callable[[dict], Awaitable[None]]
+    concurrency: int # Máximo de jobs deste tipo executando ao mesmo tempo neste processo
+    max_attempts: int
+    timeout: float # Segundos; ao estourar, conta como falha
+
+@dataclass
+class JobStats:
+    running: int = 0
+    completed: int = 0
+    retried: int = 0
+    failed: int = 0
+    wait_times: Deque[float] = field(default_factory=lambda: deque(maxlen=RECENT_SAMPLES)) # Enfileirado -> início
+    run_times: Deque[float] = field(default_factory=lambda: deque(maxlen=RECENT_SAMPLES)) # Duração da execução
+
+_handlers: Dict[str, JobHandler] = {}
+_stats: Dict[str, JobStats] = {}
+_tasks: Set[asyncio.Task] = set()
+_wakeup: Optional[asyncio.Event] = None
+_dispatcher: Optional[asyncio.Task] = None
+_stopping = False
+
+# --- Registro e enfileiramento ---
+
+def handler(job_type: str, concurrency: int = 4, max_attempts: int = 5, timeout: float = 60.0):
+    """Decorador que registra a função assíncrona `func(payload)` que executa os jobs do tipo."""
+    def register(func: Callable[[dict], Awaitable[None]]):
+        _handlers[job_type] = JobHandler(func, concurrency, max_attempts, timeout)
+        _stats.setdefault(job_type, JobStats())
+        return func
+    return register
+
+def enqueue(db: AsyncSession, job_type: str, payload: dict, delay_seconds: float = 0) -> models.Job:
+    """Adiciona o job à transação corrente; ele só passa a existir com o commit da sessão."""
+    now = datetime.now()
+    registered = _handlers.get(job_type)
+    job = models.Job(
+        job_type=job_type,
+        payload=payload,
+        status="pending",
+        attempts=0,
+        max_attempts=registered.max_attempts if registered else 5,
+        run_at=now + timedelta(seconds=delay_seconds),
+        created_at=now,
+    )
+    db.add(job)
+    db.sync_session.info[_ENQUEUED_KEY] = True
+    return job
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session: Session) -> None:
+    if session.info.pop(_ENQUEUED_KEY, False) and _wakeup is not None:
+        _wakeup.set()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_ENQUEUED_KEY, None)
+
+# --- Execução ---
+
+def _retry_delay(attempts: int) -> float:
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2) # Espalha as novas tentativas de jobs que falharam juntos
+
+async def _claim(db: AsyncSession, job_type: str, limit: int):
+    now = datetime.now()
+    ready = (
+        select(models.Job.id)
+        .where(
+            models.Job.job_type == job_type,
+            or_(
+                and_(models.Job.status == "pending", models.Job.run_at <= now),
+                and_(models.Job.status == "running", models.Job.locked_at < now - timedelta(seconds=LEASE_SECONDS)),
+            )
+        )
+        .order_by(models.Job.run_at)
+        .limit(limit)
+    )
+    result = await db.execute(
+        update(models.Job)
+        .where(models.Job.id.in_(ready.scalar_subquery()))
+        .values(status="running", locked_at=now, locked_by=WORKER_ID, attempts=models.Job.attempts + 1)
+        .returning(models.Job.id, models.Job.payload, models.Job.attempts, models.Job.max_attempts, models.Job.created_at)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await db.commit()
+    return rows
+
+def _session(shard: Optional[int]) -> AsyncSession:
+    """Sessão no banco (shard; None = global) em que os jobs estão."""
+    return AsyncSessionLocal(info={SHARD_KEY: shard})
+
+async def _finish(shard: Optional[int], job_id: int, **values) -> None:
+    async with _session(shard) as db:
+        await db.execute(
+            update(models.Job)
+            # locked_by: se o lease expirou e outro worker assumiu o job, o resultado é dele
+            .where(models.Job.id == job_id, models.Job.locked_by == WORKER_ID)
+            .values(locked_at=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+async def _execute(job_type: str, job, shard: Optional[int]) -> None:
+    registered = _handlers[job_type]
+    stats = _stats[job_type]
+    stats.wait_times.append((datetime.now() - job.created_at).total_seconds())
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(registered.func(job.payload or {}), registered.timeout)
+    except asyncio.CancelledError:
+        raise # Shutdown: o job é devolvido à fila por stop()
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"[:1000]
+        if job.attempts < job.max_attempts:
+            stats.retried += 1
+            delay = _retry_delay(job.attempts)
+            logger.warning("Job %s (%s) falhou na tentativa %d; nova tentativa em %.0fs: %s", job.id, job_type, job.attempts, delay, error)
+            await _finish(shard, job.id, status="pending", run_at=datetime.now() + timedelta(seconds=delay), last_error=error)
+        else:
+            stats.failed += 1
+            logger.error("Job %s (%s) falhou após %d tentativas: %s", job.id, job_type, job.attempts, error)
+            await _finish(shard, job.id, status="failed", finished_at=datetime.now(), last_error=error)
+    else:
+        stats.completed += 1
+        await _finish(shard, job.id, status="done", finished_at=datetime.now())
+    finally:
+        stats.run_times.append(time.monotonic() - started)
+
+def _start_job(job_type: str, job, shard: Optional[int]) -> None:
+    stats = _stats[job_type]
+    stats.running += 1
+    task = asyncio.create_task(_execute(job_type, job, shard))
+    _tasks.add(task)
+
+    def done(finished: asyncio.Task) -> None:
+        _tasks.discard(finished)
+        stats.running -= 1
+        if not finished.cancelled() and finished.exception() is not None:
+            logger.error("Falha ao registrar o resultado de um job %s", job_type, exc_info=finished.exception())
+        if _wakeup is not None:
+            _wakeup.set() # Abriu uma vaga: procura o próximo job
+    task.add_done_callback(done)
+
+async def _cleanup(db: AsyncSession) -> None:
+    await db.execute(
+        delete(models.Job)
+        .where(models.Job.status == "done", models.Job.finished_at < datetime.now() - KEEP_FINISHED_FOR)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+async def _run() -> None:
+    last_cleanup = 0.0
+    while not _stopping:
+        _wakeup.clear()
+        try:
+            cleanup = time.monotonic() - last_cleanup > 60 * 60
+            for shard, _ in all_engines():
+                async with _session(shard) as db:
+                    for job_type, registered in _handlers.items():
+                        free = registered.concurrency - _stats[job_type].running
+                        if free > 0:
+                            for job in await _claim(db, job_type, free):
+                                _start_job(job_type, job, shard)
+                    if cleanup:
+                        await _cleanup(db)
+            if cleanup:
+                last_cleanup = time.monotonic()
+        except Exception:
+            logger.exception("Falha ao buscar jobs na fila")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+def start() -> None:
+    global _dispatcher, _wakeup, _stopping
+    if _dispatcher is None:
+        _stopping = False
+        _wakeup = asyncio.Event()
+        _dispatcher = asyncio.create_task(_run())
+
+async def stop(timeout: float = DRAIN_TIMEOUT_SECONDS) -> None:
+    """Para de buscar jobs e espera os que estão em execução; os que não terminarem a tempo voltam à fila."""
+    global _dispatcher, _stopping
+    if _dispatcher is None:
+        return
+    _stopping = True
+    _wakeup.set()
+    await _dispatcher
+    _dispatcher = None
+    if _tasks:
+        _, pending = await asyncio.wait(set(_tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+            # Devolve à fila sem contar a tentativa interrompida
+            for shard, _ in all_engines():
+                async with _session(shard) as db:
+                    await db.execute(
+                        update(models.Job)
+                        .where(models.Job.status == "running", models.Job.locked_by == WORKER_ID)
+                        .values(status="pending", locked_at=None, locked_by=None, attempts=models.Job.attempts - 1)
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            logger.warning("%d jobs interrompidos no shutdown voltaram para a fila", len(pending))
+
+# --- Métricas ---
+
+async def metrics(db: AsyncSession) -> dict:
+    """Profundidade da fila (todos os processos, pelo banco) e latências deste processo."""
+    now = datetime.now()
+    depth: Dict[str, Dict[str, int]] = {}
+    oldest_ready: Dict[str, datetime] = {}
+    for shard, _ in all_engines(): # Com sharding, soma as filas de todos os bancos
+        use_shard(db, shard)
+        result = await db.execute(
+            select(
+                models.Job.job_type,
+                models.Job.status,
+                func.count(),
+                func.min(models.Job.run_at),
+            )
+            .where(models.Job.status != "done")
+            .group_by(models.Job.job_type, models.Job.status)
+        )
+        for job_type, job_status, count, min_run_at in result.all():
+            counts = depth.setdefault(job_type, {})
+            counts[job_status] = counts.get(job_status, 0) + count
+            if job_status == "pending" and min_run_at is not None and min_run_at <= now:
+                oldest_ready[job_type] = min(min_run_at, oldest_ready.get(job_type, min_run_at))
+
+    types = []
+    for job_type in sorted(_handlers.keys() | depth.keys()):
+        counts = depth.get(job_type, {})
+        stats = _stats.get(job_type, JobStats())
+        types.append({
+            "job_type": job_type,
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_ready_seconds": round((now - oldest_ready[job_type]).total_seconds(), 1) if job_type in oldest_ready else None,
+            "running_here": stats.running,
+            "completed_here": stats.completed,
+            "retried_here": stats.retried,
+            "failed_here": stats.failed,
+            "wait_p50_ms": percentile_ms(stats.wait_times, 0.50),
+            "wait_p95_ms": percentile_ms(stats.wait_times, 0.95),
+            "run_p50_ms": percentile_ms(stats.run_times, 0.50),
+            "run_p95_ms": percentile_ms(stats.run_times, 0.95),
+        })
+    return {"worker_id": WORKER_ID, "types": types}
+
+# --- Tarefas ---
+
+@handler("order_created", concurrency=4)
+async def notify_new_order(payload: dict) -> None:
+    """Avisa o estabelecimento sobre um novo pedido (por enquanto, no log; aqui entra o push/e-mail)."""
+    logger.info("Novo pedido #%s para o estabelecimento %s", payload.get("order_id"), payload.get("establishment_id"))
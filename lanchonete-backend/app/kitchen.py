@@ -0,0 +1,197 @@
+# lanchonete_backend/app/kitchen.py
+
+# Fila de cozinha em memória: os pedidos ativos (pending/preparing) de cada estabelecimento,
+# ordenados por order_date e indexados por status.
+#
+# A fila é montada a partir do banco no startup e atualizada pelas funções de pedido do CRUD
+# (create_order, update_order, delete_order), então GET /orders/queue custa O(pedidos ativos),
+# independente do tamanho do histórico. Escritas feitas por outros workers chegam pelo canal
+# de invalidação "orders:<establishment_id>" e fazem a fila daquele estabelecimento ser
+# recarregada (só os pedidos ativos, pelo índice de establishment_id/status) na próxima leitura.
+#
+# A previsão de pronto considera a fila: a cozinha prepara um pedido por vez, em ordem de
+# chegada, então cada pedido começa quando chega ou quando o anterior fica pronto (o que for
+# mais tarde) e leva o tempo mediano dos preparos recentes.
+
+import bisect
+import statistics
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app import invalidation, models
+from app.database import shard_for_establishment, shard_keys, use_shard
+
+ACTIVE_STATUSES = ("pending", "preparing")
+DEFAULT_PREPARATION_TIME = timedelta(minutes=15) # Usado enquanto não há histórico de preparo
+RECENT_PREPARATIONS = 50 # Quantos preparos recentes entram na estimativa
+
+@dataclass
+class QueuedOrder:
+    id: int
+    establishment_id: int
+    customer_id: int
+    status: str
+    order_date: datetime
+    total_amount: float
+    is_pickup: bool
+    delivery_address: Optional[str]
+    items: List[Tuple[int, int]] # (product_id, quantity)
+
+    @classmethod
+    def from_model(cls, order: models.Order) -> "QueuedOrder":
+        return cls(
+            id=order.id,
+            establishment_id=order.establishment_id,
+            customer_id=order.customer_id,
+            status=order.status,
+            order_date=order.order_date,
+            total_amount=order.total_amount,
+            is_pickup=order.is_pickup,
+            delivery_address=order.delivery_address,
+            items=[(item.product_id, item.quantity) for item in order.items],
+        )
+
+@dataclass
+class EstablishmentQueue:
+    orders: Dict[int, QueuedOrder] = field(default_factory=dict)
+    sorted_keys: List[Tuple[datetime, int]] = field(default_factory=list) # (order_date, id), em ordem
+    by_status: Dict[str, Set[int]] = field(default_factory=dict)
+    preparation_times: Deque[float] = field(default_factory=lambda: deque(maxlen=RECENT_PREPARATIONS)) # Em segundos
+
+    def upsert(self, order: QueuedOrder) -> None:
+        self.remove(order.id)
+        self.orders[order.id] = order
+        bisect.insort(self.sorted_keys, (order.order_date, order.id))
+        self.by_status.setdefault(order.status, set()).add(order.id)
+
+    def remove(self, order_id: int) -> Optional[QueuedOrder]:
+        order = self.orders.pop(order_id, None)
+        if order is not None:
+            key = (order.order_date, order.id)
+            del self.sorted_keys[bisect.bisect_left(self.sorted_keys, key)]
+            self.by_status[order.status].discard(order_id)
+        return order
+
+    def entries(self, statuses: Optional[List[str]] = None) -> List[QueuedOrder]:
+        if statuses:
+            wanted = set().union(*(self.by_status.get(s, set()) for s in statuses))
+            return [self.orders[order_id] for _, order_id in self.sorted_keys if order_id in wanted]
+        return [self.orders[order_id] for _, order_id in self.sorted_keys]
+
+    def estimated_preparation_time(self) -> timedelta:
+        if not self.preparation_times:
+            return DEFAULT_PREPARATION_TIME
+        return timedelta(seconds=statistics.median(self.preparation_times))
+
+class KitchenQueue:
+    def __init__(self):
+        self._queues: Dict[int, EstablishmentQueue] = {}
+        self._stale: Set[int] = set() # Estabelecimentos alterados por outros workers
+        self._loaded = False # Após a carga completa, estabelecimento ausente significa fila vazia
+
+    def _queue(self, establishment_id: int) -> EstablishmentQueue:
+        return self._queues.setdefault(establishment_id, EstablishmentQueue())
+
+    # --- Atualizações (chamadas pelo CRUD após o commit) ---
+
+    def apply(self, order: models.Order, previous_status: Optional[str] = None) -> None:
+        """Atualiza a fila com o estado atual do pedido (que deve ter `items` carregado)."""
+        queue = self._queue(order.establishment_id)
+        if order.status in ACTIVE_STATUSES:
+            queue.upsert(QueuedOrder.from_model(order))
+        else:
+            queue.remove(order.id)
+            if previous_status in ACTIVE_STATUSES and order.prepared_at is not None:
+                queue.preparation_times.append((order.prepared_at - order.order_date).total_seconds())
+
+    def remove(self, establishment_id: int, order_id: int) -> None:
+        self._queue(establishment_id).remove(order_id)
+
+    def _mark_stale(self, channel: str) -> None:
+        _, _, establishment_id = channel.partition(":")
+        if establishment_id.isdigit():
+            self._stale.add(int(establishment_id))
+        else:
+            self._stale.update(self._queues) # Canal sem estabelecimento: recarrega todos
+
+    # --- Carga a partir do banco ---
+
+    async def load(self, db: AsyncSession, establishment_id: Optional[int] = None) -> None:
+        """Recarrega do banco os pedidos ativos e os preparos recentes (de um ou de todos os estabelecimentos)."""
+        active_query = (
+            select(models.Order)
+            .where(models.Order.status.in_(ACTIVE_STATUSES))
+            .options(selectinload(models.Order.items))
+        )
+        if establishment_id is not None:
+            active_query = active_query.where(models.Order.establishment_id == establishment_id)
+        # Com sharding, a carga completa lê os pedidos de cada shard
+        shards = [shard_for_establishment(establishment_id)] if establishment_id is not None else shard_keys()
+        active_orders = []
+        for shard in shards:
+            use_shard(db, shard)
+            active_orders.extend((await db.execute(active_query)).scalars().all())
+
+        if establishment_id is None:
+            self._queues = {}
+            self._stale.clear()
+            self._loaded = True
+            prepared_for = None
+        else:
+            self._queues[establishment_id] = EstablishmentQueue()
+            self._stale.discard(establishment_id)
+            prepared_for = [establishment_id]
+        for order in active_orders:
+            self._queue(order.establishment_id).upsert(QueuedOrder.from_model(order))
+
+        # Preparos recentes (os últimos RECENT_PREPARATIONS de cada estabelecimento), para a estimativa
+        recent = (
+            select(
+                models.Order.establishment_id,
+                models.Order.order_date,
+                models.Order.prepared_at,
+                func.row_number().over(
+                    partition_by=models.Order.establishment_id,
+                    order_by=models.Order.prepared_at.desc()
+                ).label("position")
+            )
+            .where(models.Order.prepared_at.is_not(None))
+        )
+        if prepared_for is not None:
+            recent = recent.where(models.Order.establishment_id.in_(prepared_for))
+        recent = recent.subquery()
+        prepared_query = (
+            select(recent.c.establishment_id, recent.c.order_date, recent.c.prepared_at)
+            .where(recent.c.position <= RECENT_PREPARATIONS)
+            .order_by(recent.c.prepared_at)
+        )
+        for shard in shards:
+            use_shard(db, shard)
+            for row in (await db.execute(prepared_query)).all():
+                self._queue(row.establishment_id).preparation_times.append((row.prepared_at - row.order_date).total_seconds())
+
+    # --- Leitura ---
+
+    async def snapshot(self, db: AsyncSession, establishment_id: int, statuses: Optional[List[str]] = None):
+        """Retorna (tempo estimado de preparo, [(pedido, previsão de pronto)]) em ordem de chegada."""
+        if establishment_id in self._stale or (not self._loaded and establishment_id not in self._queues):
+            await self.load(db, establishment_id)
+        queue = self._queue(establishment_id)
+        preparation_time = queue.estimated_preparation_time()
+        now = datetime.now() # order_date é gravado em horário local (ver crud.create_order)
+        # A previsão percorre a fila inteira: com filtro de status, os pedidos de fora continuam à frente
+        ready_at: Dict[int, datetime] = {}
+        previous_ready = datetime.min
+        for order in queue.entries():
+            # Pedido atrasado ainda ocupa a cozinha: fica pronto "agora", e o próximo começa depois
+            previous_ready = ready_at[order.id] = max(max(previous_ready, order.order_date) + preparation_time, now)
+        return preparation_time, [(order, ready_at[order.id]) for order in queue.entries(statuses)]
+
+kitchen_queue = KitchenQueue()
+invalidation.subscribe("orders", kitchen_queue._mark_stale, local=False)
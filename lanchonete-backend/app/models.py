@@ -1,6 +1,6 @@
 # lanchonete_backend/app/models.py
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base # Importa a Base do seu arquivo database.py
@@ -32,7 +32,11 @@ class Establishment(Base):
     address = Column(String, nullable=False)
     phone = Column(String, nullable=False)
     description = Column(String, nullable=True)
+    latitude = Column(Float, nullable=True) # Localização, em graus decimais (indexada em establishments_rtree)
+    longitude = Column(Float, nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # Incrementada a cada atualização (ETag)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now()) # Última alteração, em UTC (Last-Modified)
 
     owner = relationship("User", backref="establishment", primaryjoin="Establishment.owner_id == User.id")
     products = relationship("Product", back_populates="establishment")
@@ -47,6 +51,8 @@ class Category(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # Incrementada a cada atualização (ETag)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now()) # Última alteração, em UTC (Last-Modified)
 
     products = relationship("Product", back_populates="category")
 
@@ -62,7 +68,11 @@ class Product(Base):
     description = Column(String, nullable=True)
     price = Column(Float, nullable=False)
     image_url = Column(String, nullable=True) # URL da imagem do produto (e.g., S3/GCS)
+    image_variants = Column(JSON, nullable=True) # Miniaturas enviadas pelo upload: {"96": url, "320": url, ...}
     is_available = Column(Boolean, default=True) # Se o produto está disponível ou esgotado
+    stock = Column(Integer, nullable=True) # Unidades em estoque, baixadas a cada pedido; NULL = sem controle de estoque
+    version = Column(Integer, nullable=False, default=1, server_default="1") # Incrementada a cada atualização (ETag)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now()) # Última alteração, em UTC (Last-Modified)
 
     establishment_id = Column(Integer, ForeignKey("establishments.id"), nullable=False)
     establishment = relationship("Establishment", back_populates="products")
@@ -89,11 +99,30 @@ class Order(Base):
     delivery_address = Column(String, nullable=True) # Preenchido se for delivery
     is_pickup = Column(Boolean, default=False) # True se for retirada no local
     payment_method = Column(String, nullable=False) # Ex: credit_card, cash, pix
+    prepared_at = Column(DateTime, nullable=True) # Quando saiu de pending/preparing (exceto cancelamento)
 
     # Relacionamentos
     customer = relationship("User", back_populates="orders")
     establishment = relationship("Establishment", back_populates="orders")
-    items = relationship("OrderItem", back_populates="order") # Itens deste pedido
+    items = relationship("OrderItem", back_populates="order", passive_deletes=True) # Itens deste pedido (removidos pelo banco junto com o pedido)
+
+    __table_args__ = (
+        # Fila de cozinha e busca do proprietário filtrando por status. As colunas depois de
+        # order_date cobrem os demais filtros e ordenações: a página de IDs sai só do índice
+        Index(
+            "ix_orders_establishment_status_date_cover",
+            "establishment_id", "status", "order_date", "is_pickup", "payment_method", "total_amount"
+        ),
+        # Estimativa de preparo: preparos mais recentes de um estabelecimento
+        Index("ix_orders_establishment_prepared_at", "establishment_id", "prepared_at"),
+        # Listagens e buscas sem filtro de status (mais recentes primeiro) do proprietário, também cobrindo os filtros
+        Index(
+            "ix_orders_establishment_date_cover",
+            "establishment_id", "order_date", "status", "is_pickup", "payment_method", "total_amount"
+        ),
+        # Listagem do cliente
+        Index("ix_orders_customer_date", "customer_id", "order_date"),
+    )
 
 # ====================================================================
 # Modelo de Item do Pedido (Tabela de Junção para Pedido-Produto)
@@ -103,11 +132,114 @@ class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    # Indexada: carga dos itens de uma página de pedidos e ON DELETE CASCADE/arquivamento sem varrer a tabela
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     price_at_time_of_order = Column(Float, nullable=False) # Preço do produto no momento do pedido
 
     # Relacionamentos
     order = relationship("Order", back_populates="items")
-    product = relationship("Product", back_populates="order_items")
\ No newline at end of file
+    product = relationship("Product", back_populates="order_items")
+
+# ====================================================================
+# Modelo de Versões de Cache (invalidação entre processos)
+# ====================================================================
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    channel = Column(String, primary_key=True) # Ex: products:12, categories:3, users
+    seq = Column(Integer, nullable=False, index=True) # Sequência global da última escrita no canal
+
+# ====================================================================
+# Modelos de Arquivo de Pedidos (pedidos finalizados antigos)
+# ====================================================================
+
+# Mesmas colunas de Order/OrderItem. Pedidos entregues ou cancelados há mais de
+# archive.ARCHIVE_AFTER_DAYS dias são movidos para cá, mantendo os IDs originais,
+# para que as tabelas quentes (e seus índices) cresçam só com os pedidos recentes.
+# Sem chaves estrangeiras: o histórico não deve impedir a remoção de produtos ou usuários.
+
+class ArchivedOrder(Base):
+    __tablename__ = "archived_orders"
+
+    id = Column(Integer, primary_key=True) # Mesmo ID do pedido original
+    customer_id = Column(Integer, nullable=False)
+    establishment_id = Column(Integer, nullable=False)
+    order_date = Column(DateTime)
+    total_amount = Column(Float, nullable=False)
+    status = Column(String)
+    delivery_address = Column(String, nullable=True)
+    is_pickup = Column(Boolean, default=False)
+    payment_method = Column(String, nullable=False)
+    prepared_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=func.now())
+
+    items = relationship(
+        "ArchivedOrderItem",
+        primaryjoin="ArchivedOrder.id == foreign(ArchivedOrderItem.order_id)",
+        order_by="ArchivedOrderItem.id",
+    )
+
+    __table_args__ = (
+        Index("ix_archived_orders_customer_date", "customer_id", "order_date"),
+        Index("ix_archived_orders_establishment_date", "establishment_id", "order_date"),
+    )
+
+class ArchivedOrderItem(Base):
+    __tablename__ = "archived_order_items"
+
+    id = Column(Integer, primary_key=True) # Mesmo ID do item original
+    order_id = Column(Integer, nullable=False, index=True)
+    product_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    price_at_time_of_order = Column(Float, nullable=False)
+
+# ====================================================================
+# Modelos de Contadores (painel do proprietário e totais das listagens)
+# ====================================================================
+
+# Mantidos incrementalmente por crud.create_order/update_order/delete_order (ver app/stats.py)
+# e recalculados periodicamente a partir da tabela de pedidos.
+
+class EstablishmentStats(Base):
+    __tablename__ = "establishment_stats"
+
+    establishment_id = Column(Integer, primary_key=True) # Mesmo ID do estabelecimento (dado derivado, sem chave estrangeira)
+    open_orders = Column(Integer, nullable=False, default=0) # Pedidos ainda não entregues nem cancelados
+    stats_date = Column(Date, nullable=True) # Dia a que orders_today/revenue_today se referem
+    orders_today = Column(Integer, nullable=False, default=0) # Pedidos do dia, exceto cancelados
+    revenue_today = Column(Float, nullable=False, default=0.0) # Faturamento do dia, exceto cancelados
+    total_orders = Column(Integer, nullable=False, default=0, server_default="0") # Todos os pedidos, inclusive arquivados (total das listagens)
+
+class CustomerStats(Base):
+    __tablename__ = "customer_stats"
+
+    customer_id = Column(Integer, primary_key=True) # Mesmo ID do usuário (dado derivado, sem chave estrangeira)
+    total_orders = Column(Integer, nullable=False, default=0) # Todos os pedidos do cliente, inclusive arquivados
+
+# ====================================================================
+# Modelo de Tarefa em Segundo Plano (fila de jobs durável, ver app/jobs.py)
+# ====================================================================
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    job_type = Column(String, nullable=False) # Ex: order_created
+    payload = Column(JSON, nullable=True)
+    status = Column(String, nullable=False, default="pending") # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0) # Execuções já iniciadas
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False) # Quando pode ser executada (adiada a cada nova tentativa)
+    created_at = Column(DateTime, nullable=False)
+    locked_at = Column(DateTime, nullable=True) # Início da execução atual (para recuperar jobs de workers que caíram)
+    locked_by = Column(String, nullable=True) # Worker (host:pid) que está executando
+    finished_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+    __table_args__ = (
+        # Busca dos próximos jobs de um tipo prontos para execução
+        Index("ix_jobs_type_status_run_at", "job_type", "status", "run_at"),
+    )
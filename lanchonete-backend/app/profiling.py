@@ -0,0 +1,232 @@
+# lanchonete_backend/app/profiling.py
+
+# Diagnóstico de latência no processo em produção.
+#
+# - Monitor de atraso do event loop: uma tarefa acorda a cada LAG_PROBE_INTERVAL segundos e mede
+#   quanto acordou atrasada, isto é, por quanto tempo o loop ficou preso em outro código (bcrypt
+#   fora do pool, serialização de uma resposta grande, chamadas síncronas). Uma thread de vigia
+#   confere o último batimento dessa tarefa: com o loop parado há mais de LAG_THRESHOLD segundos,
+#   ela copia a pilha da thread do loop naquele instante, que é a do código que está bloqueando.
+#   Cada bloqueio é registrado (e logado) com a duração e essa pilha (GET /admin/event-loop).
+# - Profiler por amostragem (GET /admin/profile): durante alguns segundos, uma thread copia as
+#   pilhas das threads do processo (sys._current_frames) a cada intervalo e devolve as contagens
+#   no formato "collapsed" (uma pilha por linha, frames separados por ";", seguida do número de
+#   amostras), lido por flamegraph.pl, speedscope e inferno.
+#
+# Nenhum dos dois usa sys.setprofile/settrace: o código da aplicação roda sem instrumentação e o
+# custo é só o de ler as pilhas numa thread à parte. O monitor só é ligado no startup quando há
+# administradores (LANCHONETE_ADMIN_EMAILS, ver app/routers/admin.py), os únicos que o leem; o
+# profiler roda só quando chamado, um por vez.
+
+import asyncio
+import logging
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LAG_PROBE_INTERVAL = 0.05 # Segundos entre dois batimentos do monitor
+LAG_THRESHOLD = 0.1 # Atraso a partir do qual o loop é considerado bloqueado (e a pilha é registrada)
+RECENT_LAG_SAMPLES = 1200 # Atrasos guardados para as métricas (cerca de um minuto)
+RECENT_BLOCKS = 20 # Bloqueios guardados com a pilha
+MAX_STACK_DEPTH = 40 # Frames mais internos guardados por bloqueio
+
+PROFILE_MAX_SECONDS = 60
+PROFILE_MIN_INTERVAL_MS = 1
+
+@dataclass(frozen=True)
+class Block:
+    at: datetime # Quando o loop voltou a rodar
+    duration: float # Segundos sem rodar
+    stack: List[str] # Frames da thread do loop durante o bloqueio, do mais externo ao mais interno (vazia se não capturada)
+
+class _Monitor:
+    def __init__(self):
+        self.lags: Deque[float] = deque(maxlen=RECENT_LAG_SAMPLES)
+        self.blocks: Deque[Block] = deque(maxlen=RECENT_BLOCKS)
+        self.blocked_total = 0 # Bloqueios desde o startup
+        self.loop_thread: Optional[int] = None
+        self.heartbeat = time.monotonic() # Atualizado pela tarefa do loop, lido pela vigia
+        self.captured: Optional[tuple] = None # (batimento, pilha) copiada pela vigia no bloqueio em andamento
+        self.stopping = threading.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.watchdog: Optional[threading.Thread] = None
+
+    async def probe(self) -> None:
+        while True:
+            self.heartbeat = expected = time.monotonic() + LAG_PROBE_INTERVAL
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lag = max(time.monotonic() - expected, 0.0)
+            self.lags.append(lag)
+            if lag >= LAG_THRESHOLD:
+                captured = self.captured
+                stack = captured[1] if captured is not None and captured[0] == expected else []
+                self._record(lag, stack)
+
+    def _record(self, lag: float, stack: List[str]) -> None:
+        self.blocked_total += 1
+        self.blocks.append(Block(at=datetime.now(), duration=lag, stack=stack))
+        logger.warning(
+            "Event loop bloqueado por %.0f ms%s", lag * 1000,
+            (":\n  " + "\n  ".join(stack)) if stack else " (pilha não capturada)"
+        )
+
+    def watch(self) -> None:
+        # Thread de vigia: acorda algumas vezes por bloqueio mínimo e copia a pilha uma vez por bloqueio
+        while not self.stopping.wait(LAG_THRESHOLD / 2):
+            heartbeat = self.heartbeat
+            captured = self.captured
+            if time.monotonic() - heartbeat < LAG_THRESHOLD or (captured is not None and captured[0] == heartbeat):
+                continue
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is not None:
+                self.captured = (heartbeat, _stack(frame)[-MAX_STACK_DEPTH:])
+
+_monitor = _Monitor()
+
+def _frame_name(frame) -> str:
+    return _code_name(frame.f_code, frame.f_globals.get("__name__", "?"))
+
+def _code_name(code, module: str) -> str:
+    return f"{module}:{code.co_qualname}".replace(";", ":")
+
+def _stack(frame) -> List[str]:
+    """Frames do mais externo ao mais interno."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+def start() -> None:
+    if _monitor.task is None:
+        _monitor.loop_thread = threading.get_ident()
+        _monitor.stopping.clear()
+        _monitor.task = asyncio.create_task(_monitor.probe())
+        _monitor.watchdog = threading.Thread(target=_monitor.watch, name="event-loop-watchdog", daemon=True)
+        _monitor.watchdog.start()
+
+async def stop() -> None:
+    if _monitor.task is not None:
+        _monitor.stopping.set()
+        _monitor.task.cancel()
+        try:
+            await _monitor.task
+        except asyncio.CancelledError:
+            pass
+        _monitor.task = None
+        _monitor.watchdog.join() # Acorda em até LAG_THRESHOLD / 2
+        _monitor.watchdog = None
+
+def percentile_ms(samples, fraction: float) -> Optional[float]:
+    """Percentil (fraction: 0.5, 0.95...) de amostras em segundos, em milissegundos; None sem amostras."""
+    if not samples:
+        return None
+    if len(samples) == 1:
+        return round(samples[0] * 1000, 1)
+    return round(statistics.quantiles(samples, n=100, method="inclusive")[int(fraction * 100) - 1] * 1000, 1)
+
+def metrics() -> dict:
+    """Conteúdo de schemas.EventLoopMetricsResponse."""
+    lags = list(_monitor.lags)
+    return {
+        "monitoring": _monitor.task is not None,
+        "probe_interval_ms": LAG_PROBE_INTERVAL * 1000,
+        "threshold_ms": LAG_THRESHOLD * 1000,
+        "lag_p50_ms": percentile_ms(lags, 0.50),
+        "lag_p99_ms": percentile_ms(lags, 0.99),
+        "lag_max_ms": round(max(lags) * 1000, 1) if lags else None,
+        "blocked_total": _monitor.blocked_total,
+        "recent_blocks": [
+            {"at": block.at, "duration_ms": round(block.duration * 1000, 1), "stack": block.stack}
+            for block in reversed(_monitor.blocks)
+        ],
+    }
+
+# --- Profiler por amostragem ---
+
+_profiling = threading.Lock()
+
+def _sample(seconds: float, interval: float, loop_only: bool, cancelled: threading.Event) -> Counter:
+    """Contagem por pilha (nome da thread, objetos de código do frame mais interno ao mais externo).
+
+    Cada amostra só percorre os frames; os nomes são montados uma vez por pilha distinta, no final.
+    """
+    own = threading.get_ident()
+    counts: Counter = Counter()
+    names = {}
+    stop_at = time.monotonic() + seconds
+    while time.monotonic() < stop_at and not cancelled.is_set():
+        frames = sys._current_frames()
+        if any(ident not in names for ident in frames): # Thread nova: relê os nomes
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            names.update((ident, str(ident)) for ident in frames if ident not in names)
+        for ident, frame in frames.items():
+            if ident == own or (loop_only and ident != _monitor.loop_thread):
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            counts[(names[ident], tuple(codes))] += 1
+        del frames, frame
+        time.sleep(interval)
+    return counts
+
+def _collapsed(counts: Counter) -> str:
+    lines = []
+    for (thread, codes), count in counts.most_common():
+        frames = [thread.replace(";", ":")] + [_code_name(code, _module(code)) for code in reversed(codes)]
+        lines.append(f"{';'.join(frames)} {count}\n")
+    return "".join(lines)
+
+def _module(code) -> str:
+    # O frame já não existe no final: o módulo sai do caminho do arquivo (app/crud.py -> app.crud)
+    path = code.co_filename
+    for root in sorted((entry for entry in sys.path if entry), key=len, reverse=True):
+        if path.startswith(root.rstrip("/") + "/"):
+            return path[len(root.rstrip("/")) + 1:].removesuffix(".py").replace("/", ".").removesuffix(".__init__")
+    return path
+
+async def profile(seconds: float, interval_ms: float, loop_only: bool = False) -> Optional[str]:
+    """Amostra as pilhas por `seconds` segundos e devolve o texto no formato collapsed.
+
+    None se já há um profile em andamento (só um roda por vez).
+    """
+    if not _profiling.acquire(blocking=False):
+        return None
+    cancelled = threading.Event()
+    try:
+        # Thread própria (não o pool padrão, que pode estar ocupado com o trabalho que se quer medir)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def run():
+            try:
+                result = _sample(seconds, interval_ms / 1000, loop_only, cancelled)
+            except BaseException as exc:
+                loop.call_soon_threadsafe(_set_exception, future, exc)
+            else:
+                loop.call_soon_threadsafe(_set_result, future, result)
+
+        threading.Thread(target=run, name="sampling-profiler", daemon=True).start()
+        counts = await future
+    finally:
+        cancelled.set() # Requisição cancelada (ou prazo esgotado): a thread para na próxima amostra
+        _profiling.release()
+    return _collapsed(counts)
+
+def _set_result(future: asyncio.Future, result) -> None:
+    if not future.done():
+        future.set_result(result)
+
+def _set_exception(future: asyncio.Future, exc: BaseException) -> None:
+    if not future.done():
+        future.set_exception(exc)
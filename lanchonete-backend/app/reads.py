@@ -0,0 +1,71 @@
+# lanchonete_backend/app/reads.py
+
+# Modelos de leitura para as listagens somente leitura (GET /products/, GET /categories/{id},
+# GET /orders/, as versões paginadas /products/page e /orders/page e os produtos de GET /sync).
+# As consultas para essas rotas selecionam só as colunas da resposta com o SQLAlchemy Core: cada
+# linha chega como um `Row` (uma tupla com acesso por nome), sem objeto do ORM, identity map nem
+# rastreamento de alterações na sessão. Os pedidos, que juntam linhas de duas tabelas, viram OrderRow (NamedTuple).
+#
+# json_response valida as linhas contra o schema de resposta e gera o JSON de uma vez no
+# pydantic-core, no lugar da validação seguida de serialização em Python feita pelo FastAPI.
+
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy.engine import Row
+
+from app import models, schemas
+
+# Colunas lidas para cada schema de resposta (na ordem dos campos)
+PRODUCT_COLUMNS = tuple(
+    getattr(models.Product, name) for name in (
+        "id", "name", "description", "price", "image_url", "is_available",
+        "establishment_id", "category_id", "stock", "image_variants",
+    )
+)
+ORDER_COLUMNS = ( # Os mesmos nomes em Order e ArchivedOrder
+    "id", "customer_id", "establishment_id", "status", "delivery_address",
+    "is_pickup", "payment_method", "total_amount", "order_date",
+)
+ORDER_ITEM_COLUMNS = ("id", "order_id", "product_id", "quantity", "price_at_time_of_order")
+
+class OrderRow(NamedTuple):
+    id: int
+    customer_id: int
+    establishment_id: int
+    status: str
+    delivery_address: Optional[str]
+    is_pickup: bool
+    payment_method: str
+    total_amount: float
+    order_date: datetime
+    items: List[Row] # Linhas com ORDER_ITEM_COLUMNS
+
+def order_rows(orders: List[Row], items: List[Row]) -> List[OrderRow]:
+    """Junta os itens (de uma única consulta) aos pedidos da página, mantendo a ordem dos pedidos."""
+    by_order: Dict[int, List[Row]] = {order.id: [] for order in orders}
+    for item in items:
+        by_order[item.order_id].append(item)
+    return [OrderRow(*order, items=by_order[order.id]) for order in orders]
+
+# --- Resposta ---
+
+PRODUCT_LIST = TypeAdapter(List[schemas.ProductResponse])
+CATEGORY = TypeAdapter(schemas.CategoryResponse)
+ORDER_LIST = TypeAdapter(List[schemas.OrderResponse])
+PRODUCT_PAGE = TypeAdapter(schemas.ProductPageResponse)
+ORDER_PAGE = TypeAdapter(schemas.OrderPageResponse)
+SYNC = TypeAdapter(schemas.SyncResponse)
+
+def next_offset(skip: int, limit: int, returned: int, total: int, approximate: bool = False) -> Optional[int]:
+    """skip da próxima página, ou None quando esta é a última."""
+    if returned < limit or (not approximate and skip + returned >= total):
+        return None
+    return skip + returned
+
+def json_response(adapter: TypeAdapter, content, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Valida `content` (linhas ou objetos) pelo schema e responde o JSON gerado pelo pydantic-core."""
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+    return Response(body, media_type="application/json", headers=headers)
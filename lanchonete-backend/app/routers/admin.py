@@ -0,0 +1,58 @@
+# lanchonete_backend/app/routers/admin.py
+
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas, jobs, profiling, deadlines
+from app.database import get_db
+from app.routers.users import Principal, get_current_user # Para autenticação
+
+# Diagnóstico do processo (fila de jobs, event loop, profiler): expõe detalhes internos e o
+# profiler ocupa CPU, então só os e-mails de LANCHONETE_ADMIN_EMAILS (separados por vírgula) têm
+# acesso. Sem a variável (padrão), as rotas respondem 403 para todos. Qualquer um pode se cadastrar
+# como proprietário, por isso is_owner não basta; cadastre a conta antes de incluí-la na variável
+# (o cadastro recusa e-mails já existentes).
+ADMIN_EMAILS = frozenset(
+    email.strip().lower() for email in os.environ.get("LANCHONETE_ADMIN_EMAILS", "").split(",") if email.strip()
+)
+
+async def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso restrito aos administradores")
+    return current_user
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)]
+)
+
+# Profundidade da fila de jobs e latências (espera e execução) por tipo de job
+@router.get("/jobs/metrics", response_model=schemas.JobsMetricsResponse)
+async def read_jobs_metrics(db: AsyncSession = Depends(get_db)):
+    return await jobs.metrics(db)
+
+# Atraso do event loop e bloqueios recentes, com a pilha do código que bloqueava (ver app/profiling.py)
+@router.get("/event-loop", response_model=schemas.EventLoopMetricsResponse)
+async def read_event_loop_metrics():
+    return profiling.metrics()
+
+# Profile por amostragem do processo que atender a requisição, no formato collapsed:
+# curl -H "Authorization: Bearer ..." ".../admin/profile?seconds=10" | flamegraph.pl > perfil.svg
+@router.get(
+    "/profile",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(deadlines.within(profiling.PROFILE_MAX_SECONDS + 5))]
+)
+async def read_profile(
+    seconds: float = Query(10, gt=0, le=profiling.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(10, ge=profiling.PROFILE_MIN_INTERVAL_MS, le=1000, description="Intervalo entre amostras"),
+    loop_only: bool = Query(False, description="Só a thread do event loop (sem as threads do aiosqlite e do bcrypt)")
+):
+    collapsed = await profiling.profile(seconds, interval_ms, loop_only)
+    if collapsed is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Já há um profile em andamento neste processo")
+    return PlainTextResponse(collapsed)
@@ -1,11 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
-from app import schemas, crud
+from app import schemas, crud, http_cache, reads
 from app.database import get_db
-from app.routers.users import get_current_user # Para autenticação
-from app.models import User # Para tipagem do current_user
+from app.routers.users import Principal, get_current_user # Para autenticação
 
 router = APIRouter(
     prefix="/categories",
@@ -16,25 +15,42 @@ router = APIRouter(
 async def create_category(
     category: schemas.CategoryCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user) # Protegido: requer autenticação
+    current_user: Principal = Depends(get_current_user) # Protegido: requer autenticação
 ):
     # Opcional: Você pode adicionar lógica aqui para verificar se apenas proprietários podem criar categorias
     # Por exemplo: if not current_user.is_owner: raise HTTPException(...)
     return await crud.create_category(db=db, category=category)
 
+# Com ?ids=1,2,3, retorna só essas categorias (na ordem pedida) em uma única consulta
+@router.get("/", response_model=List[schemas.CategoryResponse])
+async def read_categories(
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = Query(None, description="IDs separados por vírgula. Ex: ?ids=1,2,3"),
+    db: AsyncSession = Depends(get_db)
+):
+    if ids is not None:
+        return await crud.get_categories_by_ids(db, crud.parse_ids(ids))
+    return await crud.get_categories(db, skip=skip, limit=limit)
+
+# Responde 304 quando o cliente já tem a versão atual
 @router.get("/{category_id}", response_model=schemas.CategoryResponse)
-async def read_category(category_id: int, db: AsyncSession = Depends(get_db)):
-    db_category = await crud.get_category(db, category_id=category_id)
-    if db_category is  None:
+async def read_category(category_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    # A categoria é pequena: a mesma consulta traz a versão e os campos da resposta
+    row = await crud.get_category_row(db, category_id=category_id)
+    if row is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Categoria não encontrada")
-    return db_category
+    etag = http_cache.make_etag("category", category_id, row.version, row.updated_at)
+    if http_cache.is_not_modified(request, etag, row.updated_at):
+        return http_cache.not_modified_response(etag, row.updated_at)
+    return reads.json_response(reads.CATEGORY, row, headers=http_cache.cache_headers(etag, row.updated_at))
 
 @router.put("/{category_id}", response_model=schemas.CategoryResponse)
 async def update_category(
     category_id: int,
     category: schemas.CategoryCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     #Autorização: Apenas propietários ou admins podem atualizar categorias
     if not current_user.is_owner:
@@ -49,7 +65,7 @@ async def update_category(
 async def delete_category(
     category_id: int, 
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     #Autorização: Apenas propietários podem deletar categorias
     if not current_user.is_owner:
@@ -1,13 +1,12 @@
 # lanchonete_backend/app/routers/establishments.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
-from app import schemas, crud
+from app import schemas, crud, http_cache, stats, storefront, deadlines
 from app.database import get_db
-from app.routers.users import get_current_user # Para autenticação
-from app.models import User # Para tipagem do current_user
+from app.routers.users import Principal, get_current_user # Para autenticação
 from app import models # Importa models para poder usar models.Establishment
 
 router = APIRouter(
@@ -15,11 +14,18 @@ router = APIRouter(
     tags=["Establishments"]
 )
 
+# As escritas verificam a posse na própria instrução UPDATE/DELETE. Quando nada foi alterado,
+# consulta só a versão para diferenciar "não existe" (404) de "é de outro proprietário" (403).
+async def _not_found_or_forbidden(db: AsyncSession, establishment_id: int, detail: str) -> HTTPException:
+    if await crud.get_establishment_version(db, establishment_id=establishment_id) is None:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estabelecimento não encontrado")
+    return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
 @router.post("/", response_model=schemas.EstablishmentResponse, status_code=status.HTTP_201_CREATED)
 async def create_establishment(
     establishment: schemas.EstablishmentCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if not current_user.is_owner:
         raise HTTPException(
@@ -27,8 +33,7 @@ async def create_establishment(
             detail="Somente proprietários podem criar estabelecimentos."
         )
     # Verifica se o usuário já possui um estabelecimento
-    existing_establishment = await crud.get_establishment_by_owner_id(db, current_user.id)
-    if existing_establishment:
+    if current_user.establishment_id is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Este proprietário já possui um estabelecimento."
@@ -39,14 +44,22 @@ async def create_establishment(
 
 @router.get("/", response_model=List[schemas.EstablishmentResponse])
 async def read_establishments(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user) # Protege a rota, mas permite visibilidade pública ou filtrada
+    skip: int = 0, limit: int = 100,
+    ids: Optional[str] = Query(None, description="IDs separados por vírgula. Ex: ?ids=1,2,3"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user) # Protege a rota, mas permite visibilidade pública ou filtrada
 ):
+    # Com ?ids=, retorna esses estabelecimentos (na ordem pedida) em uma única consulta,
+    # como GET /establishments/{id} faria para cada um
+    if ids is not None:
+        return await crud.get_establishments_by_ids(db, crud.parse_ids(ids))
     # Lógica para filtrar estabelecimentos:
     # Se o usuário for um proprietário, mostra apenas o seu próprio estabelecimento.
     # Se for um cliente comum, mostra todos os estabelecimentos.
     if current_user.is_owner:
-        establishment = await crud.get_establishment_by_owner_id(db, current_user.id)
+        establishment = None
+        if current_user.establishment_id is not None:
+            establishment = await crud.get_establishment(db, current_user.establishment_id)
         if establishment:
             return [establishment] # Retorna uma lista contendo apenas o estabelecimento do proprietário
         else:
@@ -55,44 +68,86 @@ async def read_establishments(
         establishments = await crud.get_establishments(db, skip=skip, limit=limit)
         return establishments
 
+# Busca de estabelecimentos próximos (pública), do mais próximo ao mais distante
+# Declarada antes de /{establishment_id} para que "nearby" não seja lido como um ID
+@router.get("/nearby", response_model=List[schemas.EstablishmentNearbyResponse])
+async def read_nearby_establishments(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(5.0, gt=0, le=50, description="Raio da busca, em km"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    nearby = await crud.get_nearby_establishments(db, latitude=lat, longitude=lon, radius_km=radius, limit=limit)
+    return [
+        schemas.EstablishmentNearbyResponse(
+            **schemas.EstablishmentResponse.model_validate(establishment).model_dump(),
+            distance_km=round(distance, 3)
+        )
+        for establishment, distance in nearby
+    ]
+
+# Responde 304 (consultando só a versão) quando o cliente já tem a versão atual
 @router.get("/{establishment_id}", response_model=schemas.EstablishmentResponse)
-async def read_establishment(establishment_id: int, db: AsyncSession = Depends(get_db)):
+async def read_establishment(establishment_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    current = await crud.get_establishment_version(db, establishment_id=establishment_id)
+    if current is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estabelecimento não encontrado")
+    etag = http_cache.make_etag("establishment", establishment_id, current.version, current.updated_at)
+    if http_cache.is_not_modified(request, etag, current.updated_at):
+        return http_cache.not_modified_response(etag, current.updated_at)
+
     db_establishment = await crud.get_establishment(db, establishment_id=establishment_id)
     if db_establishment is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estabelecimento não encontrado")
+    etag = http_cache.make_etag("establishment", establishment_id, db_establishment.version, db_establishment.updated_at)
+    response.headers.update(http_cache.cache_headers(etag, db_establishment.updated_at))
     return db_establishment
 
+# Contadores do painel (pedidos abertos, pedidos e faturamento do dia), lidos por chave primária
+@router.get("/{establishment_id}/stats", response_model=schemas.EstablishmentStatsResponse)
+async def read_establishment_stats(
+    establishment_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    # Autorização: Apenas o proprietário do estabelecimento pode ver seus números
+    if not current_user.is_owner or current_user.establishment_id != establishment_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Não autorizado a ver os números deste estabelecimento")
+    return await stats.get_stats(db, establishment_id)
+
+# Vitrine (pública): estabelecimento e produtos disponíveis por categoria, em uma chamada.
+# Servida da memória, já comprimida; é remontada em segundo plano quando algo nela muda.
+@router.get("/{establishment_id}/storefront", response_model=schemas.StorefrontResponse, dependencies=[Depends(deadlines.within(3))])
+async def read_storefront(establishment_id: int, request: Request):
+    cached = await storefront.get_storefront(establishment_id)
+    if cached is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estabelecimento não encontrado")
+    return cached.response(request)
+
 @router.put("/{establishment_id}", response_model=schemas.EstablishmentResponse)
 async def update_establishment(
     establishment_id: int,
     establishment_update: schemas.EstablishmentCreate, # Reutiliza o schema de criação para atualização
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    db_establishment = await crud.get_establishment(db, establishment_id=establishment_id)
-    if db_establishment is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estabelecimento não encontrado")
-
-    # Autorização: Apenas o proprietário do estabelecimento pode atualizá-lo
-    if db_establishment.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Não autorizado a atualizar este estabelecimento")
-
-    updated_establishment = await crud.update_establishment(db, establishment_id=establishment_id, establishment_update=establishment_update)
+    # Autorização: Apenas o proprietário do estabelecimento pode atualizá-lo (verificado no próprio UPDATE)
+    updated_establishment = await crud.update_establishment(
+        db, establishment_id=establishment_id, establishment_update=establishment_update, owner_id=current_user.id
+    )
+    if updated_establishment is None:
+        raise await _not_found_or_forbidden(db, establishment_id, "Não autorizado a atualizar este estabelecimento")
     return updated_establishment
 
 @router.delete("/{establishment_id}", status_code=status.HTTP_200_OK)
 async def delete_establishment(
     establishment_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    db_establishment = await crud.get_establishment(db, establishment_id=establishment_id)
-    if db_establishment is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estabelecimento não encontrado")
-
-    # Autorização: Apenas o proprietário do estabelecimento pode deletá-lo
-    if db_establishment.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Não autorizado a deletar este estabelecimento")
-    
-    result = await crud.delete_establishment(db, establishment_id=establishment_id)
+    # Autorização: Apenas o proprietário do estabelecimento pode deletá-lo (verificado no próprio DELETE)
+    result = await crud.delete_establishment(db, establishment_id=establishment_id, owner_id=current_user.id)
+    if result is None:
+        raise await _not_found_or_forbidden(db, establishment_id, "Não autorizado a deletar este estabelecimento")
     return result
\ No newline at end of file
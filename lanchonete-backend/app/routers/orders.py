@@ -1,28 +1,36 @@
-from sqlalchemy import select
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from sqlalchemy.orm import selectinload
+from typing import List, Optional
 
-from app import schemas, crud
+from app import schemas, crud, reads, deadlines
+from app.kitchen import kitchen_queue, ACTIVE_STATUSES
 from app.database import get_db
-from app.routers.users import get_current_user # Para autenticação
-from app.models import User # Para tipagem do current_user
+from app.routers.users import Principal, get_current_user # Para autenticação
 
 router = APIRouter(
     prefix="/orders",
     tags=["Orders"]
 )
 
+# As escritas verificam a posse na própria instrução UPDATE/DELETE. Quando nada foi alterado,
+# consulta só a existência do pedido para diferenciar 404 de 403 (pedidos arquivados são somente leitura).
+async def _not_found_or_forbidden(db: AsyncSession, order_id: int, detail: str) -> HTTPException:
+    if not await crud.order_exists(db, order_id=order_id):
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido não encontrado")
+    return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
 @router.post("/", response_model=schemas.OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order:schemas.OrderCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # Verifica se os produtos existem e são do estabelecimento correto
-    for item in order.items:
-        product = await crud.get_product(db, item.product_id)
+    # (as buscas concorrentes viram uma consulta só, reaproveitada depois por crud.create_order)
+    products = await asyncio.gather(*(crud.get_product(db, item.product_id) for item in order.items))
+    for item, product in zip(order.items, products):
         if not product:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -36,58 +44,125 @@ async def create_order(
     db_order = await crud.create_order(db=db, order=order, customer_id=current_user.id)
     return db_order
 
-@router.get("/", response_model=List[schemas.OrderResponse])
+# Filtros opcionais, aplicados no banco: ?status=pending&status=preparing&date_from=2025-01-01T00:00:00
+# &date_to=...&is_pickup=false&payment_method=pix&sort=-total_amount (date_to não incluso)
+def order_filters(
+    status_filter: Optional[List[str]] = Query(None, alias="status", description="Ex: ?status=pending&status=preparing"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    is_pickup: Optional[bool] = None,
+    payment_method: Optional[List[str]] = Query(None, description="Ex: ?payment_method=pix&payment_method=cash"),
+    sort: str = Query("-order_date", description=f"Um de: {', '.join(crud.ORDER_SORTS)}")
+) -> dict:
+    if sort not in crud.ORDER_SORTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Ordenação inválida. Use uma de: {', '.join(crud.ORDER_SORTS)}")
+    if date_from is not None and date_to is not None and date_from >= date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_from deve ser anterior a date_to")
+    return {
+        "statuses": status_filter, "date_from": date_from, "date_to": date_to,
+        "is_pickup": is_pickup, "payment_methods": payment_method, "sort": sort,
+    }
+
+#Lógica para filtrar pedidos:
+# - Se for propietário, mostrar apenas pedidos do seu estabelecimento.
+# - Se for cliente, mostrar apenas seus próprios pedidos.
+# - Se for um admin(futuro), mostrar todos os pedidos.
+
+# Por enquanto, vamos simplificar para que clientes vejam seus pedidos
+# e proprietários vejam os pedidos do seu estabelecimento
+def _order_owner(current_user: Principal) -> Optional[dict]:
+    """Dono dos pedidos listados (None: proprietário ainda sem estabelecimento, lista vazia)."""
+    if current_user.is_owner:
+        if current_user.establishment_id is None:
+            return None
+        return {"establishment_id": current_user.establishment_id}
+    return {"customer_id": current_user.id} # Usuário comum
+
+@router.get("/", response_model=List[schemas.OrderResponse], dependencies=[Depends(deadlines.within(5))])
 async def read_orders(
     skip: int = 0,
     limit: int = 100,
+    filters: dict = Depends(order_filters),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user) # Requer autenticação
+    current_user: Principal = Depends(get_current_user) # Requer autenticação
 ):
-    #Lógica para filtrar pedidos:
-    # - Se for propietário, mostrar apenas pedidos do seu estabelecimento.
-    # - Se for cliente, mostrar apenas seus próprios pedidos.
-    # - Se for um admin(futuro), mostrar todos os pedidos.
+    owner = _order_owner(current_user)
+    orders = []
+    if owner is not None:
+        orders = await crud.get_orders(db, skip=skip, limit=limit, **owner, **filters)
+    return reads.json_response(reads.ORDER_LIST, orders)
 
-    # Por enquanto, vamos simplificar para que clientes vejam seus pedidos
-    # e proprietários vejam os pedidos do seu estabelecimento
+# Mesma listagem em envelope, com o total para "página X de Y" no app. O total não custa um
+# COUNT(*) por página: vem dos contadores (sem filtros) ou de uma contagem guardada até a próxima
+# escrita de pedido (com filtros). ?approximate=true limita a contagem em filtros que casam muitos pedidos.
+# Declarada antes de /{order_id} para que "page" não seja lido como um ID
+@router.get("/page", response_model=schemas.OrderPageResponse, dependencies=[Depends(deadlines.within(5))])
+async def read_orders_page(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    approximate: bool = False,
+    filters: dict = Depends(order_filters),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    owner = _order_owner(current_user)
+    if owner is None:
+        return reads.json_response(reads.ORDER_PAGE, {"items": [], "total": 0})
+    orders = await crud.get_orders(db, skip=skip, limit=limit, **owner, **filters)
+    count_filters = {name: value for name, value in filters.items() if name != "sort"}
+    total, total_is_approximate = await crud.count_orders(db, **owner, **count_filters, approximate=approximate)
+    total = max(total, skip + len(orders)) # A contagem guardada pode estar atrás da página (escrita em outro processo)
+    return reads.json_response(reads.ORDER_PAGE, {
+        "items": orders,
+        "total": total,
+        "total_is_approximate": total_is_approximate,
+        "next_offset": reads.next_offset(skip, limit, len(orders), total, total_is_approximate),
+    })
 
-    orders = []
-    if current_user.is_owner:
-        establishment = await crud.get_establishment_by_owner_id(db, current_user.id)
-        if establishment:
-            result = await db.execute(
-                select(models.Order)
-                .where(models.Order.establishment_id == establishment.id)
-                .offset(skip)
-                .limit(limit)
-                .options(
-                    selectinload(models.Order.customer),
-                    selectinload(models.Order.establishment),
-                    selectinload(models.Order.items).selectinload(models.OrderItem.product)
-                )
-            )
-            orders = result.scalars().all()
-    else: # Usuário comum
-        result = await db.execute(
-            select(models.Order)
-            .where(models.Order.customer_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-            .options(
-                selectinload(models.Order.customer),
-                selectinload(models.Order.establishment),
-                selectinload(models.Order.items).selectinload(models.OrderItem.product)
-            )
+# Fila de cozinha do estabelecimento do proprietário: pedidos ativos em ordem de chegada,
+# servidos da memória (custo proporcional aos pedidos ativos, não ao histórico)
+# Declarada antes de /{order_id} para que "queue" não seja lido como um ID
+@router.get("/queue", response_model=schemas.KitchenQueueResponse, dependencies=[Depends(deadlines.within(2))]) # Consultada em polling: resposta atrasada já não serve
+async def read_kitchen_queue(
+    status_filter: Optional[List[str]] = Query(None, alias="status", description="Ex: ?status=pending&status=preparing"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if not current_user.is_owner:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas proprietários podem ver a fila de pedidos")
+    if current_user.establishment_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estabelecimento não encontrado")
+    if status_filter and not set(status_filter) <= set(ACTIVE_STATUSES):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A fila só contém pedidos com status {', '.join(ACTIVE_STATUSES)}"
         )
-        orders = result.scalars().all()
 
-    return orders
+    preparation_time, entries = await kitchen_queue.snapshot(db, current_user.establishment_id, statuses=status_filter)
+    return schemas.KitchenQueueResponse(
+        establishment_id=current_user.establishment_id,
+        estimated_preparation_minutes=round(preparation_time.total_seconds() / 60, 1),
+        orders=[
+            schemas.KitchenQueueEntry(
+                id=order.id,
+                customer_id=order.customer_id,
+                status=order.status,
+                order_date=order.order_date,
+                total_amount=order.total_amount,
+                is_pickup=order.is_pickup,
+                delivery_address=order.delivery_address,
+                items=[schemas.OrderItemBase(product_id=product_id, quantity=quantity) for product_id, quantity in order.items],
+                estimated_ready_at=ready_at
+            )
+            for order, ready_at in entries
+        ]
+    )
 
 @router.get("/{order_id}", response_model=schemas.OrderResponse)
 async def read_order(
     order_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     db_order = await crud.get_order(db, order_id=order_id)
     if db_order is None:
@@ -95,8 +170,7 @@ async def read_order(
     
     # Autorização: Cliente só vê seus próprios pedidos, propietário vê pedidos do seu estabelecimento
     if current_user.is_owner:
-        establishment = await crud.get_establishment_by_owner_id(db, current_user.id)
-        if not establishment or db_order.establishment_id != establishment.id:
+        if current_user.establishment_id is None or db_order.establishment_id != current_user.establishment_id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Não autorizado a ver este pedido")
     elif db_order.customer_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Não autorizado a ver este pedido")
@@ -108,42 +182,30 @@ async def update_order(
     order_id: int,
     order_update: schemas.OrderUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    db_order = await crud.get_order(db, order_id=order_id)
-    if db_order is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido não encontrado")
-    
-    # Autorização: Apenas o proprietário do estabelecimento pode atualizar o pedido
-    establishment = await crud.get_establishment_by_owner_id(db, current_user.id)
-    if not current_user.is_owner or not establishment or db_order.establishment_id != establishment.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="Não autorizado a atualizar este pedido")
-    
-    updated_order = await crud.update_order(db, order_id=order_id, order_update=order_update)
-    return update_order
+    # Autorização: Apenas o proprietário do estabelecimento pode atualizar o pedido (verificado no próprio UPDATE)
+    updated_order = None
+    if current_user.is_owner and current_user.establishment_id is not None:
+        updated_order = await crud.update_order(
+            db, order_id=order_id, order_update=order_update, establishment_id=current_user.establishment_id
+        )
+    if updated_order is None:
+        raise await _not_found_or_forbidden(db, order_id, "Não autorizado a atualizar este pedido")
+    return updated_order
 
 @router.delete("/{order_id}", status_code=status.HTTP_200_OK)
 async def delete_order(
     order_id: int, 
     db: AsyncSession = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    db_order = await crud.get_order(db, order_id=order_id)
-    if db_order is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido não encontrado")
-    
     # Autorização: Apenas o proprietário do estabelecimento ou o cliente que fez o pedido pode deletar
     # (Ou apenas o proprietário/admin, dependendo da regra de negócio)
     # Aqui, vamos permitir que o proprietário do estabelecimento ou o cliente deletem o pedido.
-
-    is_owner_of_establishment = False
-    if current_user.is_owner:
-        establishment = await crud.get_establishment_by_owner_id(db, current_user.id)
-        if establishment and db_order.establishment_id == establishment.id:
-            is_owner_of_establishment = True
-
-    if not is_owner_of_establishment and db_order.customer_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Não autorizado a deletar este pedido")
-    
-    result = await crud.delete_order(db, order_id=order_id)
+    # A condição vai no próprio DELETE: "do meu estabelecimento OU feito por mim".
+    establishment_id = current_user.establishment_id if current_user.is_owner else None
+    result = await crud.delete_order(db, order_id=order_id, establishment_id=establishment_id, customer_id=current_user.id)
+    if result is None:
+        raise await _not_found_or_forbidden(db, order_id, "Não autorizado a deletar este pedido")
     return result
\ No newline at end of file
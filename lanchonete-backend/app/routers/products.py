@@ -1,13 +1,15 @@
 # lanchonete_backend/app/routers/products.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
-from app import schemas, crud # Importa seus schemas e as funções CRUD
+from app import schemas, crud, http_cache, images, reads, deadlines # Importa seus schemas e as funções CRUD
 from app.database import get_db # Importa a função para obter a sessão do DB
-from app.routers.users import get_current_user # <-- ADICIONADO: Para autenticação
-from app.models import User # <-- ADICIONADO: Para tipagem do current_user
+from app.routers.users import Principal, get_current_user # <-- ADICIONADO: Para autenticação
 
 # Cria um APIRouter. O 'prefix' define o caminho base para todas as rotas neste router.
 # 'tags' ajuda a organizar a documentação da API.
@@ -20,12 +22,19 @@ router = APIRouter(
 # Endpoints para Produtos
 # ====================================================================
 
+# As escritas verificam a posse na própria instrução UPDATE/DELETE. Quando nada foi alterado,
+# consulta só a versão do produto para diferenciar "não existe" (404) de "é de outro estabelecimento" (403).
+async def _not_found_or_forbidden(db: AsyncSession, product_id: int, detail: str) -> HTTPException:
+    if await crud.get_product_version(db, product_id=product_id) is None:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
+    return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
 # Endpoint para criar um novo produto
 @router.post("/", response_model=schemas.ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
     product: schemas.ProductCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user) # <-- ADICIONADO: Protege a rota
+    current_user: Principal = Depends(get_current_user) # <-- ADICIONADO: Protege a rota
 ):
     if not current_user.is_owner:
         raise HTTPException(
@@ -34,8 +43,7 @@ async def create_product(
         )
 
     # Verificação de autorização: o estabelecimento do produto deve pertencer ao usuário logado
-    establishment = await crud.get_establishment_by_owner_id(db, current_user.id)
-    if not establishment or establishment.id != product.establishment_id:
+    if current_user.establishment_id is None or current_user.establishment_id != product.establishment_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Você só pode adicionar produtos ao seu próprio estabelecimento."
@@ -45,20 +53,56 @@ async def create_product(
     return db_product
 
 # Endpoint para listar todos os produtos
+# Com ?ids=1,2,3, retorna só esses produtos (na ordem pedida) em uma única consulta:
+# o app usa isso para montar os detalhes de um pedido sem buscar item a item
 @router.get("/", response_model=List[schemas.ProductResponse])
-async def read_products(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+async def read_products(
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = Query(None, description="IDs separados por vírgula. Ex: ?ids=1,2,3"),
+    db: AsyncSession = Depends(get_db)
+):
+    if ids is not None:
+        return await crud.get_products_by_ids(db, crud.parse_ids(ids))
     # Esta rota pode ser pública ou protegida se você quiser filtrar por usuário/estabelecimento.
     # Por enquanto, vou deixá-la acessível a todos sem exigir autenticação.
-    # Se quiser proteger: adicione 'current_user: User = Depends(get_current_user)' e a lógica de filtro.
+    # Se quiser proteger: adicione 'current_user: Principal = Depends(get_current_user)' e a lógica de filtro.
+    products = await crud.get_products(db, skip=skip, limit=limit)
+    return reads.json_response(reads.PRODUCT_LIST, products)
+
+# Listagem em envelope, com o total do catálogo para "página X de Y" no app
+# (contado uma vez e guardado até a próxima escrita de produto)
+# Declarada antes de /{product_id} para que "page" não seja lido como um ID
+@router.get("/page", response_model=schemas.ProductPageResponse)
+async def read_products_page(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
     products = await crud.get_products(db, skip=skip, limit=limit)
-    return products
+    total = max(await crud.count_products(db), skip + len(products))
+    return reads.json_response(reads.PRODUCT_PAGE, {
+        "items": products,
+        "total": total,
+        "next_offset": reads.next_offset(skip, limit, len(products), total),
+    })
 
 # Endpoint para obter um produto pelo ID
+# Responde 304 (consultando só a versão) quando o cliente já tem a versão atual
 @router.get("/{product_id}", response_model=schemas.ProductResponse)
-async def read_product(product_id: int, db: AsyncSession = Depends(get_db)):
+async def read_product(product_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    current = await crud.get_product_version(db, product_id=product_id)
+    if current is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
+    etag = http_cache.make_etag("product", product_id, current.version, current.updated_at)
+    if http_cache.is_not_modified(request, etag, current.updated_at):
+        return http_cache.not_modified_response(etag, current.updated_at)
+
     db_product = await crud.get_product(db, product_id=product_id)
     if db_product is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
+    etag = http_cache.make_etag("product", product_id, db_product.version, db_product.updated_at)
+    response.headers.update(http_cache.cache_headers(etag, db_product.updated_at))
     return db_product
 
 # Endpoint para atualizar um produto
@@ -67,31 +111,26 @@ async def update_product(
     product_id: int,
     product_update: schemas.ProductUpdate, # <-- Renomeado para clareza
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user) # <-- ADICIONADO: Protege a rota
+    current_user: Principal = Depends(get_current_user) # <-- ADICIONADO: Protege a rota
 ):
-    db_product = await crud.get_product(db, product_id=product_id)
-    if db_product is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
-
     # Verificação de autorização: Apenas o proprietário do estabelecimento pode atualizar seus produtos
-    establishment = await crud.get_establishment_by_owner_id(db, current_user.id)
-    if not establishment or establishment.id != db_product.establishment_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Você não tem permissão para atualizar este produto."
-        )
+    forbidden = "Você não tem permissão para atualizar este produto."
+    establishment_id = current_user.establishment_id
+    if establishment_id is None:
+        raise await _not_found_or_forbidden(db, product_id, forbidden)
     # Se o produto_update inclui establishment_id, ele também deve ser verificado para garantir que
     # o proprietário não está movendo o produto para um estabelecimento que não é dele.
-    if product_update.establishment_id is not None and product_update.establishment_id != establishment.id:
+    if product_update.establishment_id is not None and product_update.establishment_id != establishment_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Você não pode mover produtos para estabelecimentos que não são seus."
         )
 
-
-    updated_product = await crud.update_product(db, product_id=product_id, product_update=product_update)
-    if updated_product is None: # Embora update_product geralmente retorne o objeto ou None se não encontrar
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Falha ao atualizar o produto.")
+    updated_product = await crud.update_product(
+        db, product_id=product_id, product_update=product_update, establishment_id=establishment_id
+    )
+    if updated_product is None:
+        raise await _not_found_or_forbidden(db, product_id, forbidden)
     return updated_product
 
 # Endpoint para deletar um produto
@@ -99,21 +138,77 @@ async def update_product(
 async def delete_product(
     product_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user) # <-- ADICIONADO: Protege a rota
+    current_user: Principal = Depends(get_current_user) # <-- ADICIONADO: Protege a rota
 ):
-    db_product = await crud.get_product(db, product_id=product_id)
-    if db_product is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
-
     # Verificação de autorização: Apenas o proprietário do estabelecimento pode deletar seus produtos
-    establishment = await crud.get_establishment_by_owner_id(db, current_user.id)
-    if not establishment or establishment.id != db_product.establishment_id:
+    forbidden = "Você não tem permissão para deletar este produto."
+    if current_user.establishment_id is None:
+        raise await _not_found_or_forbidden(db, product_id, forbidden)
+
+    success = await crud.delete_product(db, product_id=product_id, establishment_id=current_user.establishment_id)
+    if not success:
+        raise await _not_found_or_forbidden(db, product_id, forbidden)
+    return {"message": "Produto deletado com sucesso!"} # Retorna uma mensagem explícita
+
+# ====================================================================
+# Endpoints para Imagens de Produtos
+# ====================================================================
+
+# Endpoint para enviar a imagem de um produto
+# O original é gravado pelo hash do conteúdo e as miniaturas são geradas em segundo plano,
+# fora do event loop; image_url e image_variants já apontam para as URLs definitivas.
+@router.post("/{product_id}/image", response_model=schemas.ProductResponse, dependencies=[Depends(deadlines.within(30))]) # Upload e miniaturas
+async def upload_product_image(
+    product_id: int,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    # Verificação de autorização: Apenas o proprietário do estabelecimento pode alterar a imagem
+    # (a posse do produto é conferida no UPDATE, ao final)
+    forbidden = "Você não tem permissão para alterar a imagem deste produto."
+    if current_user.establishment_id is None:
+        raise await _not_found_or_forbidden(db, product_id, forbidden)
+
+    data = await file.read(images.MAX_UPLOAD_BYTES + 1)
+    if len(data) > images.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Imagem muito grande.")
+    if not images.is_supported_image(data):
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Você não tem permissão para deletar este produto."
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Formato de imagem não suportado. Envie JPEG, PNG ou WebP."
         )
 
-    success = await crud.delete_product(db, product_id=product_id)
-    if not success: # O CRUD agora deve retornar True/False ou algo que indique sucesso
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Falha ao deletar o produto.")
-    return {"message": "Produto deletado com sucesso!"} # Retorna uma mensagem explícita
\ No newline at end of file
+    digest = await run_in_threadpool(images.store_original, data)
+    background_tasks.add_task(images.generate_thumbnails, digest)
+
+    db_product = await crud.set_product_image(
+        db,
+        product_id=product_id,
+        image_url=images.thumbnail_url(digest, images.LIST_THUMBNAIL_SIZE),
+        image_variants=images.variant_urls(digest),
+        establishment_id=current_user.establishment_id
+    )
+    if db_product is None:
+        raise await _not_found_or_forbidden(db, product_id, forbidden)
+    return db_product
+
+# Endpoint para servir as miniaturas (com suporte a Range, via FileResponse)
+# O conteúdo de uma URL nunca muda, então pode ficar em cache indefinidamente.
+@router.get("/images/{digest}/{size}.webp", response_class=FileResponse)
+async def read_product_image(digest: str, size: int):
+    if not images.is_valid_digest(digest) or size not in images.THUMBNAIL_SIZES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Imagem não encontrada")
+
+    path = images.thumbnail_path(digest, size)
+    if not os.path.exists(path):
+        # A miniatura ainda não foi gerada (ou foi apagada): gera sob demanda a partir do original
+        if not os.path.exists(images.original_path(digest)) or not await images.generate_thumbnails(digest):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Imagem não encontrada")
+
+    return FileResponse(
+        path,
+        media_type="image/webp",
+        headers={"Cache-Control": images.IMMUTABLE_CACHE_CONTROL}
+    )
@@ -0,0 +1,21 @@
+# lanchonete_backend/app/routers/sync.py
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas, reads, sync
+from app.database import get_db
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["Sync"]
+)
+
+# Sincronização incremental do catálogo para o app (pública, como a listagem de produtos).
+# Primeira chamada com since=0 (catálogo completo); depois, com o seq da resposta anterior.
+@router.get("/", response_model=schemas.SyncResponse)
+async def read_changes(
+    since: int = Query(0, ge=0, description="seq da última sincronização (0: catálogo completo)"),
+    db: AsyncSession = Depends(get_db)
+):
+    return reads.json_response(reads.SYNC, await sync.changes_since(db, since))
@@ -1,21 +1,20 @@
 # lanchonete_backend/app/routers/users.py
 
+from dataclasses import dataclass
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm # Para formulário de login
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
-from app import schemas, crud
+from app import schemas, crud, invalidation, deadlines
 from app.database import get_db
 from app.security import (
     create_access_token, # <-- CORRIGIDO: 'access' com dois 's'
-    verify_password,
+    verify_password_async,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     decode_access_token # <-- CORRIGIDO: 'access' com dois 's'
 )
-from app.models import User # Para o CurrentUser dependency
-
 # Para a autenticação usando OAuth2PasswordBearer
 from fastapi.security import OAuth2PasswordBearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/token")
@@ -26,6 +25,31 @@ router = APIRouter(
 )
 
 # --- Dependência para obter o usuário logado ---
+
+# Usuário autenticado, com o ID do estabelecimento do proprietário já resolvido: as rotas usam
+# current_user.establishment_id em vez de consultar o estabelecimento a cada requisição.
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    is_active: bool
+    is_owner: bool
+    establishment_id: Optional[int] = None # Estabelecimento do proprietário (None se ainda não criou)
+
+# Principals por e-mail, em memória do processo. O canal "principals:<user_id>" é publicado quando
+# um estabelecimento é criado ou deletado. Proprietários ainda sem estabelecimento não entram no
+# cache, para que o estabelecimento recém-criado apareça já na próxima requisição, em qualquer worker;
+# um establishment_id velho (estabelecimento deletado há menos de invalidation.POLL_INTERVAL em
+# outro worker) só faz as escritas do CRUD não encontrarem nada, pois elas conferem a posse no WHERE.
+# O cache guarda até PRINCIPAL_CACHE_MAX_ENTRIES usuários (os usados há mais tempo saem primeiro),
+# cada um por até PRINCIPAL_CACHE_TTL_SECONDS: um token válido de cada usuário já visto não
+# faz a memória do processo crescer sem limite.
+PRINCIPAL_CACHE_MAX_ENTRIES = 10_000
+PRINCIPAL_CACHE_TTL_SECONDS = 300
+_principals = invalidation.LocalCache(
+    "principals", max_entries=PRINCIPAL_CACHE_MAX_ENTRIES, ttl=PRINCIPAL_CACHE_TTL_SECONDS
+)
+
 async def get_current_user(
     db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme) # <-- CORRIGIDO AQUI: Usando oauth2_scheme
@@ -41,26 +65,38 @@ async def get_current_user(
     email: str = payload.get("sub")
     if email is None:
         raise credentials_exception
-    user = await crud.get_user_by_email(db, email) # <-- Já estava certo, mantido
-    if user is None:
-        raise credentials_exception
-    return user
+    principal = _principals.get(email)
+    if principal is None:
+        row = await crud.get_user_with_establishment_id(db, email) # Uma consulta: usuário + estabelecimento
+        if row is None:
+            raise credentials_exception
+        user, establishment_id = row
+        principal = Principal(
+            id=user.id,
+            email=user.email,
+            is_active=user.is_active,
+            is_owner=user.is_owner,
+            establishment_id=establishment_id
+        )
+        if not principal.is_owner or principal.establishment_id is not None:
+            _principals.set(email, principal)
+    return principal
 
 # --- Endpoints de Autenticação ---
 
-@router.post("/register/", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/register/", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(deadlines.within(5))])
 async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     db_user = await crud.get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email já registrado")
     return await crud.create_user(db=db, user=user)
 
-@router.post("/token", response_model=schemas.Token)
+@router.post("/token", response_model=schemas.Token, dependencies=[Depends(deadlines.within(5))]) # bcrypt: rejeita cedo quando a fila de hashes está longa
 async def login_for_access_token( # <-- CORRIGIDO: 'access' com dois 's'
     form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
 ):
     user = await crud.get_user_by_email(db, form_data.username) # <-- Corrigido aqui também, se não estava
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciais inválidas",
@@ -76,14 +112,14 @@ async def login_for_access_token( # <-- CORRIGIDO: 'access' com dois 's'
 # --- Endpoints de Usuário (Protegidos) ---
 
 @router.get("/me/", response_model=schemas.UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_user)):
     """Retorna os dados do usuário logado."""
     return current_user
 
 @router.get("/", response_model=List[schemas.UserResponse])
 async def read_users(
     skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user) # Exemplo de rota protegida
+    current_user: Principal = Depends(get_current_user) # Exemplo de rota protegida
 ):
     """Lista todos os usuários (apenas para usuários autenticados)."""
     users = await crud.get_users(db, skip=skip, limit=limit)
@@ -1,6 +1,6 @@
 # lanchonete_backend/app/schemas.py
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, EmailStr, Field # Importa Field para exemplo de validação, se precisar
 from datetime import datetime
 # --- SCHEMAS EXISTENTES (apenas para contexto) ---
@@ -37,6 +37,8 @@ class EstablishmentBase(BaseModel):
     address: str
     phone: str # Pode usar Field(..., pattern="^\d{10,11}$") para validação de formato
     description: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90) # Localização, usada na busca por proximidade
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 # Schema para criar um estabelecimento (não inclui owner_id, pois será definido no backend)
 class EstablishmentCreate(EstablishmentBase):
@@ -53,6 +55,17 @@ class EstablishmentResponse(EstablishmentBase):
     class Config:
         from_attributes = True # Permite mapeamento de ORM (SQLAlchemy)
 
+# Schema para os contadores do painel do proprietário
+class EstablishmentStatsResponse(BaseModel):
+    establishment_id: int
+    open_orders: int # Pedidos ainda não entregues nem cancelados
+    orders_today: int # Pedidos de hoje, exceto cancelados
+    revenue_today: float # Faturamento de hoje, exceto cancelados
+
+# Schema para a busca de estabelecimentos próximos (inclui a distância até o cliente)
+class EstablishmentNearbyResponse(EstablishmentResponse):
+    distance_km: float
+
 # --- SCHEMAS PARA PRODUTOS (apenas para contexto) ---
 
 class ProductBase(BaseModel):
@@ -63,6 +76,7 @@ class ProductBase(BaseModel):
     is_available: bool = True
     establishment_id: int # O ID do estabelecimento ao qual o produto pertence
     category_id: Optional[int] = None # ID da categoria (pode ser nulo)
+    stock: Optional[int] = Field(None, ge=0) # Unidades em estoque (None: sem controle; ao zerar, o produto fica indisponível)
 
 class ProductCreate(ProductBase):
     pass
@@ -75,9 +89,11 @@ class ProductUpdate(BaseModel): # Schema para atualização (campos opcionais)
     is_available: Optional[bool] = None
     establishment_id: Optional[int] = None
     category_id: Optional[int] = None
+    stock: Optional[int] = Field(None, ge=0)
 
 class ProductResponse(ProductBase):
     id: int
+    image_variants: Optional[Dict[str, str]] = None # Miniaturas WebP por tamanho (preenchido pelo upload de imagem)
     # Opcional: incluir o estabelecimento e a categoria completos
     # establishment: Optional["EstablishmentResponse"] = None # Cuidado com importação circular
     # category: Optional["CategoryResponse"] = None # Cuidado com importação circular
@@ -101,7 +117,7 @@ class CategoryResponse(CategoryBase):
 
 class OrderItemBase(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(..., gt=0)
 
 class OrderItemCreate(OrderItemBase):
     pass
@@ -144,6 +160,101 @@ class OrderResponse(OrderBase):
     class Config:
         from_attributes = True
 
+# --- SCHEMAS PARA A FILA DE COZINHA ---
+
+class KitchenQueueEntry(BaseModel):
+    id: int
+    customer_id: int
+    status: str
+    order_date: datetime
+    total_amount: float
+    is_pickup: bool
+    delivery_address: Optional[str] = None
+    items: List[OrderItemBase] = []
+    estimated_ready_at: datetime # Previsão de pronto: depois dos pedidos à frente na fila, pelo tempo mediano dos preparos recentes
+
+class KitchenQueueResponse(BaseModel):
+    establishment_id: int
+    estimated_preparation_minutes: float
+    orders: List[KitchenQueueEntry] = []
+
+# --- SCHEMAS PARA A VITRINE (tela inicial do estabelecimento no app) ---
+
+class StorefrontCategory(CategoryResponse):
+    products: List[ProductResponse] = [] # Produtos disponíveis desta categoria
+
+class StorefrontResponse(BaseModel):
+    establishment: EstablishmentResponse
+    categories: List[StorefrontCategory] = [] # Só categorias com produtos disponíveis, por nome
+    uncategorized_products: List[ProductResponse] = [] # Produtos disponíveis sem categoria
+
+# --- SCHEMAS PARA A FILA DE JOBS (métricas) ---
+
+class JobTypeMetrics(BaseModel):
+    job_type: str
+    pending: int # Na fila (prontos ou aguardando nova tentativa), em todos os processos
+    running: int
+    failed: int # Esgotaram as tentativas
+    oldest_ready_seconds: Optional[float] = None # Há quanto tempo o job pronto mais antigo espera
+    running_here: int # Os campos *_here são deste processo, desde o startup
+    completed_here: int
+    retried_here: int
+    failed_here: int
+    wait_p50_ms: Optional[float] = None # Enfileirado -> início da execução (amostras recentes)
+    wait_p95_ms: Optional[float] = None
+    run_p50_ms: Optional[float] = None # Duração da execução (amostras recentes)
+    run_p95_ms: Optional[float] = None
+
+class JobsMetricsResponse(BaseModel):
+    worker_id: str
+    types: List[JobTypeMetrics] = []
+
+# --- SCHEMAS PARA O MONITOR DO EVENT LOOP (diagnóstico de latência) ---
+
+class EventLoopBlock(BaseModel):
+    at: datetime # Quando o loop voltou a rodar
+    duration_ms: float
+    stack: List[str] = [] # Código que bloqueava o loop, do frame mais externo ao mais interno ("módulo:função")
+
+class EventLoopMetricsResponse(BaseModel):
+    monitoring: bool # Monitor ligado (só com LANCHONETE_ADMIN_EMAILS no startup)
+    probe_interval_ms: float
+    threshold_ms: float # Atrasos a partir deste valor contam como bloqueio
+    lag_p50_ms: Optional[float] = None # Atraso do loop (amostras do último minuto)
+    lag_p99_ms: Optional[float] = None
+    lag_max_ms: Optional[float] = None
+    blocked_total: int # Bloqueios desde o startup
+    recent_blocks: List[EventLoopBlock] = [] # Mais recentes primeiro
+
+# --- SCHEMAS PARA AS LISTAGENS PAGINADAS ("página X de Y" no app) ---
+
+class ProductPageResponse(BaseModel):
+    items: List[ProductResponse] = []
+    total: int # Produtos no catálogo
+    next_offset: Optional[int] = None # Valor de skip da próxima página (None na última)
+
+class OrderPageResponse(BaseModel):
+    items: List[OrderResponse] = []
+    total: int # Pedidos com os mesmos filtros (com filtros, pode estar alguns segundos atrasado em relação a outros processos)
+    total_is_approximate: bool = False # Com ?approximate=true, a contagem parou no limite: "total ou mais"
+    next_offset: Optional[int] = None # Valor de skip da próxima página (None na última)
+
+# --- SCHEMAS PARA A SINCRONIZAÇÃO DO CATÁLOGO (GET /sync) ---
+
+class SyncDeleted(BaseModel):
+    products: List[int] = []
+    categories: List[int] = []
+    establishments: List[int] = []
+
+class SyncResponse(BaseModel):
+    seq: int # Enviar como ?since= na próxima sincronização
+    full: bool = False # Catálogo completo: substitui os dados guardados no app (em vez de atualizá-los)
+    has_more: bool = False # Ainda há alterações: sincronizar de novo, já com o novo seq
+    products: List[ProductResponse] = [] # Criados ou alterados
+    categories: List[CategoryResponse] = []
+    establishments: List[EstablishmentResponse] = []
+    deleted: SyncDeleted = SyncDeleted() # IDs removidos (só nas respostas incrementais)
+
 # --- Ajustes para evitar referência circular (se você adicionar as relações de volta) ---
 # Se você decidir adicionar as relações complexas (ex: ProductResponse.establishment),
 # pode precisar usar `update_forward_refs()` no final do arquivo schemas.py ou
@@ -1,11 +1,14 @@
 # lanchonete_backend/app/security.py
 
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from app import deadlines
+
 # Configurações de segurança
 SECRET_KEY = "sua-chave-secreta-bem-forte-e-randomica" # ATENÇÃO: Mude para uma chave segura em produção!
 ALGORITHM = "HS256" # Algoritmo de hash para o JWT
@@ -24,6 +27,16 @@ def get_password_hash(password: str) -> str:
     """Gera o hash de uma senha."""
     return pwd_context.hash(password)
 
+# O bcrypt é lento de propósito (dezenas de ms por senha): nas rotas, roda em threads
+# com fila limitada pelo prazo da requisição, sem travar o event loop
+_password_pool = deadlines.BoundedExecutor(os.cpu_count() or 2, "bcrypt")
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _password_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _password_pool.run(get_password_hash, password)
+
 # --- Funções de JWT ---
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str: # <-- CORRIGIDO
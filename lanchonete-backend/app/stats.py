@@ -0,0 +1,250 @@
+# lanchonete_backend/app/stats.py
+
+# Contadores por estabelecimento para o painel do proprietário: pedidos abertos,
+# pedidos do dia e faturamento do dia (establishment_stats). Também o total de pedidos por
+# estabelecimento e por cliente (customer_stats), inclusive arquivados: é o total das
+# listagens paginadas sem filtros, lido sem COUNT(*).
+#
+# Cada escrita de pedido calcula a contribuição do pedido antes e depois da mudança que ela
+# efetivamente fez e aplica a diferença com um único UPSERT, na mesma transação da escrita. Um job periódico recalcula
+# os valores a partir da tabela de pedidos e registra no log qualquer divergência encontrada.
+
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import and_, case, false, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.archive import FINISHED_STATUSES
+from app.database import AsyncSessionLocal, shard_for_establishment, shard_keys, use_shard
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL_SECONDS = 15 * 60
+
+_task: Optional[asyncio.Task] = None
+
+class OrderSnapshot(NamedTuple):
+    establishment_id: int
+    status: str
+    order_date: datetime
+    total_amount: float
+    customer_id: int
+
+def snapshot(order: models.Order) -> OrderSnapshot:
+    """Campos do pedido que afetam os contadores (capturar antes de alterar o pedido)."""
+    return OrderSnapshot(order.establishment_id, order.status, order.order_date, order.total_amount, order.customer_id)
+
+def _contribution(order: Optional[OrderSnapshot], today: date):
+    """(abertos, pedidos do dia, faturamento do dia, total) com que o pedido contribui."""
+    if order is None:
+        return 0, 0, 0.0, 0
+    is_open = 1 if order.status not in FINISHED_STATUSES else 0
+    counts_today = order.status != "cancelled" and order.order_date is not None and order.order_date.date() == today
+    return is_open, (1 if counts_today else 0), (order.total_amount if counts_today else 0.0), 1
+
+async def record_order_change(db: AsyncSession, before: Optional[OrderSnapshot], after: Optional[OrderSnapshot]) -> None:
+    """Aplica aos contadores a diferença entre o pedido antes e depois da escrita (None = não existe).
+
+    `before` precisa ser o estado que a escrita de fato substituiu (o RETURNING do DELETE, ou a
+    leitura que o UPDATE de update_order confirma no WHERE), não uma leitura qualquer anterior:
+    com duas escritas concorrentes, a diferença seria aplicada duas vezes.
+    """
+    today = date.today() # order_date é gravado em horário local
+    for establishment_id in {order.establishment_id for order in (before, after) if order is not None}:
+        old = _contribution(before if before and before.establishment_id == establishment_id else None, today)
+        new = _contribution(after if after and after.establishment_id == establishment_id else None, today)
+        open_delta, count_delta, revenue_delta, total_delta = (n - o for n, o in zip(new, old))
+        if not (open_delta or count_delta or revenue_delta or total_delta):
+            continue
+        stats = models.EstablishmentStats
+        same_day = stats.stats_date == today
+        stmt = insert(stats).values(
+            establishment_id=establishment_id,
+            open_orders=open_delta,
+            stats_date=today,
+            orders_today=count_delta,
+            revenue_today=revenue_delta,
+            total_orders=total_delta
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[stats.establishment_id],
+            set_={
+                "open_orders": stats.open_orders + open_delta,
+                "total_orders": stats.total_orders + total_delta,
+                # Virou o dia: os contadores do dia recomeçam a partir desta escrita
+                "orders_today": case((same_day, stats.orders_today + count_delta), else_=count_delta),
+                "revenue_today": case((same_day, stats.revenue_today + revenue_delta), else_=revenue_delta),
+                "stats_date": today,
+            }
+        )
+        await db.execute(stmt)
+    # Total do cliente: só muda quando o pedido é criado ou removido
+    for customer_id in {order.customer_id for order in (before, after) if order is not None}:
+        delta = int(after is not None and after.customer_id == customer_id) - int(before is not None and before.customer_id == customer_id)
+        if delta:
+            stmt = insert(models.CustomerStats).values(customer_id=customer_id, total_orders=delta)
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[models.CustomerStats.customer_id],
+                set_={"total_orders": models.CustomerStats.total_orders + delta}
+            ))
+
+async def get_order_total(db: AsyncSession, establishment_id: Optional[int] = None, customer_id: Optional[int] = None) -> int:
+    """Total de pedidos (inclusive arquivados) do estabelecimento ou do cliente, pela chave primária."""
+    if establishment_id is not None:
+        use_shard(db, shard_for_establishment(establishment_id))
+        stmt = select(models.EstablishmentStats.total_orders).where(models.EstablishmentStats.establishment_id == establishment_id)
+        return (await db.execute(stmt)).scalar() or 0
+    # Com sharding, cada shard tem a parte do cliente nos pedidos dos seus estabelecimentos
+    total = 0
+    for shard in shard_keys():
+        use_shard(db, shard)
+        stmt = select(models.CustomerStats.total_orders).where(models.CustomerStats.customer_id == customer_id)
+        total += (await db.execute(stmt)).scalar() or 0
+    return total
+
+async def get_stats(db: AsyncSession, establishment_id: int):
+    """Lê os contadores com uma única busca pela chave primária."""
+    use_shard(db, shard_for_establishment(establishment_id))
+    stats = await db.get(models.EstablishmentStats, establishment_id)
+    today = date.today()
+    if stats is None:
+        return {"establishment_id": establishment_id, "open_orders": 0, "orders_today": 0, "revenue_today": 0.0}
+    same_day = stats.stats_date == today
+    return {
+        "establishment_id": establishment_id,
+        "open_orders": stats.open_orders,
+        "orders_today": stats.orders_today if same_day else 0,
+        "revenue_today": round(stats.revenue_today, 2) if same_day else 0.0,
+    }
+
+# --- Reconciliação periódica ---
+
+def _expected_stats_query(today: date):
+    day_start = datetime.combine(today, time.min)
+    day_end = day_start + timedelta(days=1)
+    is_today = and_(
+        models.Order.order_date >= day_start,
+        models.Order.order_date < day_end,
+        models.Order.status != "cancelled"
+    )
+    return (
+        select(
+            models.Order.establishment_id,
+            func.count().filter(models.Order.status.not_in(FINISHED_STATUSES)).label("open_orders"),
+            func.count().filter(is_today).label("orders_today"),
+            func.coalesce(func.sum(models.Order.total_amount).filter(is_today), 0.0).label("revenue_today"),
+            func.count().label("total_orders"),
+        )
+        .group_by(models.Order.establishment_id)
+    )
+
+async def _archived_totals(db: AsyncSession, column) -> dict:
+    """Pedidos arquivados por estabelecimento ou por cliente (`column` de ArchivedOrder)."""
+    result = await db.execute(select(column, func.count()).group_by(column))
+    return dict(result.all())
+
+async def _reconcile_customers(db: AsyncSession) -> int:
+    hot = dict((await db.execute(select(models.Order.customer_id, func.count()).group_by(models.Order.customer_id))).all())
+    archived = await _archived_totals(db, models.ArchivedOrder.customer_id)
+    current = dict((await db.execute(select(models.CustomerStats.customer_id, models.CustomerStats.total_orders))).all())
+    drifted = 0
+    for customer_id in hot.keys() | archived.keys() | current.keys():
+        want = hot.get(customer_id, 0) + archived.get(customer_id, 0)
+        have = current.get(customer_id, 0)
+        if want == have:
+            continue
+        drifted += 1
+        logger.warning("Divergência no total de pedidos do cliente %s: mantido %s, recalculado %s", customer_id, have, want)
+        stmt = insert(models.CustomerStats).values(customer_id=customer_id, total_orders=want)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[models.CustomerStats.customer_id],
+            set_={"total_orders": stmt.excluded.total_orders}
+        ))
+    return drifted
+
+async def reconcile(db: AsyncSession) -> int:
+    """Recalcula os contadores a partir dos pedidos, corrige e registra as divergências. Retorna quantas houve."""
+    drifted = 0
+    for shard in shard_keys(): # Cada shard tem os contadores dos seus estabelecimentos
+        use_shard(db, shard)
+        drifted += await _reconcile_shard(db)
+    return drifted
+
+async def _reconcile_shard(db: AsyncSession) -> int:
+    today = date.today()
+    # Escrita vazia para abrir a transação de escrita já no início: assim nenhum pedido
+    # é gravado entre o recálculo e a correção (o SQLite só tem um escritor por vez)
+    await db.execute(
+        update(models.EstablishmentStats)
+        .where(false())
+        .values(open_orders=models.EstablishmentStats.open_orders)
+        .execution_options(synchronize_session=False)
+    )
+    expected = {row.establishment_id: row for row in (await db.execute(_expected_stats_query(today))).all()}
+    archived = await _archived_totals(db, models.ArchivedOrder.establishment_id)
+    current = {row.establishment_id: row for row in (await db.execute(select(models.EstablishmentStats))).scalars().all()}
+
+    drifted = 0
+    for establishment_id in expected.keys() | archived.keys() | current.keys():
+        row = expected.get(establishment_id)
+        total = (row.total_orders if row else 0) + archived.get(establishment_id, 0)
+        want = (row.open_orders, row.orders_today, round(row.revenue_today, 2), total) if row else (0, 0, 0.0, total)
+        stats = current.get(establishment_id)
+        have = (0, 0, 0.0, 0)
+        if stats is not None:
+            same_day = stats.stats_date == today
+            have = (
+                stats.open_orders, stats.orders_today if same_day else 0,
+                round(stats.revenue_today, 2) if same_day else 0.0, stats.total_orders
+            )
+        if want == have:
+            continue
+        drifted += 1
+        logger.warning(
+            "Divergência nos contadores do estabelecimento %s: mantido %s, recalculado %s (abertos, pedidos do dia, faturamento do dia, total)",
+            establishment_id, have, want
+        )
+        stmt = insert(models.EstablishmentStats).values(
+            establishment_id=establishment_id,
+            open_orders=want[0],
+            stats_date=today,
+            orders_today=want[1],
+            revenue_today=want[2],
+            total_orders=want[3]
+        )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[models.EstablishmentStats.establishment_id],
+            set_={name: getattr(stmt.excluded, name) for name in ("open_orders", "stats_date", "orders_today", "revenue_today", "total_orders")}
+        ))
+    drifted += await _reconcile_customers(db)
+    await db.commit()
+    return drifted
+
+async def _run_periodically() -> None:
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                await reconcile(db)
+        except Exception:
+            logger.exception("Falha ao reconciliar os contadores dos estabelecimentos")
+        await asyncio.sleep(RECONCILE_INTERVAL_SECONDS)
+
+def start() -> None:
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run_periodically())
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,147 @@
+# lanchonete_backend/app/storefront.py
+
+# Vitrine do estabelecimento (GET /establishments/{id}/storefront): dados do estabelecimento e
+# produtos disponíveis agrupados por categoria, em uma única resposta para a tela inicial do app.
+#
+# O JSON é montado uma vez e guardado em memória já comprimido (gzip), por estabelecimento.
+# As escritas do CRUD em produtos, categorias e estabelecimentos publicam o canal
+# "storefront:<establishment_id>" (ou "storefront", quando afetam todas as vitrines, como a
+# alteração de uma categoria). A vitrine afetada é descartada e remontada em segundo plano;
+# a leitura normal é só uma busca no dicionário, sem tocar no banco. Guarda no máximo
+# STOREFRONT_CACHE_MAX_ENTRIES vitrines (as usadas há mais tempo saem e são remontadas no acesso).
+
+import asyncio
+import contextvars
+import gzip
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import http_cache, invalidation, models, schemas
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Storefront:
+    gzipped: bytes # JSON de schemas.StorefrontResponse, comprimido
+    etag: str
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if http_cache.is_not_modified(request, self.etag, None):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return Response(self.gzipped, media_type="application/json", headers=headers)
+        # Cliente sem suporte a gzip (raro): descomprime a cada requisição
+        return Response(gzip.decompress(self.gzipped), media_type="application/json", headers=headers)
+
+STOREFRONT_CACHE_MAX_ENTRIES = 1_000
+
+# Sem canais: a invalidação é por estabelecimento, feita por _invalidate
+_storefronts = invalidation.LocalCache(max_entries=STOREFRONT_CACHE_MAX_ENTRIES) # establishment_id -> Storefront
+_rebuilding: Dict[int, asyncio.Task] = {}
+# Invalidações recebidas durante cada montagem em andamento: uma montagem que começou antes de
+# alguma delas é refeita. Só existe enquanto a montagem roda.
+_generations: Dict[int, int] = {}
+
+# --- Montagem ---
+
+async def render(db: AsyncSession, establishment_id: int) -> Optional[Storefront]:
+    """Monta a vitrine a partir do banco (três consultas). None se o estabelecimento não existe."""
+    result = await db.execute(select(models.Establishment).where(models.Establishment.id == establishment_id))
+    establishment = result.scalars().first()
+    if establishment is None:
+        return None
+    result = await db.execute(
+        select(models.Product)
+        .where(models.Product.establishment_id == establishment_id, models.Product.is_available.is_(True))
+        .order_by(models.Product.name, models.Product.id)
+    )
+    products = result.scalars().all()
+    category_ids = {product.category_id for product in products if product.category_id is not None}
+    categories = []
+    if category_ids:
+        result = await db.execute(
+            select(models.Category).where(models.Category.id.in_(category_ids)).order_by(models.Category.name)
+        )
+        categories = result.scalars().all()
+
+    by_category: Dict[int, list] = {category.id: [] for category in categories}
+    uncategorized = []
+    for product in products:
+        by_category.get(product.category_id, uncategorized).append(schemas.ProductResponse.model_validate(product))
+    payload = schemas.StorefrontResponse(
+        establishment=schemas.EstablishmentResponse.model_validate(establishment),
+        categories=[
+            schemas.StorefrontCategory(id=category.id, name=category.name, products=by_category[category.id])
+            for category in categories
+        ],
+        uncategorized_products=uncategorized,
+    )
+    body = payload.model_dump_json().encode()
+    etag = f'"storefront-{establishment_id}-{hashlib.sha256(body).hexdigest()[:16]}"'
+    return Storefront(gzipped=gzip.compress(body, mtime=0), etag=etag)
+
+async def _rebuild(establishment_id: int) -> Optional[Storefront]:
+    try:
+        while True:
+            generation = _generations.get(establishment_id, 0)
+            async with AsyncSessionLocal() as db:
+                storefront = await render(db, establishment_id)
+            if _generations.get(establishment_id, 0) != generation:
+                continue # Invalidada durante a montagem: os dados lidos podem estar velhos
+            if storefront is None:
+                _storefronts.pop(establishment_id)
+            else:
+                _storefronts.set(establishment_id, storefront)
+            return storefront
+    except Exception:
+        logger.exception("Falha ao montar a vitrine do estabelecimento %s", establishment_id)
+        raise
+    finally:
+        _rebuilding.pop(establishment_id, None)
+        _generations.pop(establishment_id, None)
+
+def _schedule(establishment_id: int) -> asyncio.Task:
+    task = _rebuilding.get(establishment_id)
+    if task is None:
+        # Contexto vazio: a montagem é compartilhada e não herda o prazo da requisição que a disparou
+        task = asyncio.get_running_loop().create_task(_rebuild(establishment_id), context=contextvars.Context())
+        # A falha já foi registrada no log; evita o aviso de exceção não lida quando ninguém aguarda
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        _rebuilding[establishment_id] = task
+    return task
+
+# --- Invalidação (canais publicados pelo CRUD) ---
+
+def _invalidate(channel: str) -> None:
+    _, _, suffix = channel.partition(":")
+    establishment_ids = [int(suffix)] if suffix.isdigit() else list(_storefronts.keys() | _rebuilding.keys())
+    for establishment_id in establishment_ids:
+        if establishment_id in _rebuilding:
+            _generations[establishment_id] = _generations.get(establishment_id, 0) + 1
+        # Só remonta as vitrines que estavam em uso; as demais são montadas no primeiro acesso
+        if _storefronts.pop(establishment_id) is not None or establishment_id in _rebuilding:
+            try:
+                _schedule(establishment_id)
+            except RuntimeError: # Fora do event loop (ex.: script): a vitrine é montada no próximo acesso
+                pass
+
+invalidation.subscribe("storefront", _invalidate)
+
+# --- Leitura ---
+
+async def get_storefront(establishment_id: int) -> Optional[Storefront]:
+    """Vitrine em memória; se ainda não existe (ou está sendo remontada), aguarda a montagem."""
+    storefront = _storefronts.get(establishment_id)
+    if storefront is not None:
+        return storefront
+    # shield: se o cliente desconectar, a montagem continua para as próximas requisições
+    return await asyncio.shield(_schedule(establishment_id))
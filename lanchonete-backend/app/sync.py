@@ -0,0 +1,90 @@
+# lanchonete_backend/app/sync.py
+
+# Feed de alterações do catálogo (GET /sync?since=<seq>): o app guarda produtos, categorias e
+# estabelecimentos localmente e, a cada abertura, baixa só o que mudou desde a última sincronização.
+#
+# A sequência é a mesma da invalidação de caches (ver app/invalidation.py): toda escrita do CRUD
+# em um registro do catálogo publica o canal "products:<id>", "categories:<id>" ou
+# "establishments:<id>", e a tabela cache_versions guarda a sequência global da última escrita de
+# cada canal. Os canais com sequência maior que `since` são os registros alterados desde então;
+# os que não existem mais no banco vão como removidos (tombstones). Como o SQLite tem um único
+# escritor por vez, as sequências ficam visíveis em ordem e nenhuma alteração é pulada.
+#
+# since=0 (primeira sincronização) devolve o catálogo completo: registros gravados sem publicar
+# (ex.: pelo seed.py) não estão em cache_versions. Um since maior que a sequência atual (banco
+# recriado) também recebe o catálogo completo.
+
+from typing import Dict, List
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, reads
+
+SYNC_BATCH_SIZE = 1000 # Registros alterados por resposta (sem partir uma escrita); o restante vem com has_more
+
+# Prefixo do canal -> modelo (a ordem é a dos campos de schemas.SyncResponse)
+_MODELS = {
+    "products": models.Product,
+    "categories": models.Category,
+    "establishments": models.Establishment,
+}
+
+async def _current_seq(db: AsyncSession) -> int:
+    result = await db.execute(select(func.coalesce(func.max(models.CacheVersion.seq), 0)))
+    return result.scalar_one()
+
+async def _load(db: AsyncSession, kind: str, ids=None) -> list:
+    """Registros (todos ou os de `ids`) com as colunas da resposta."""
+    model = _MODELS[kind]
+    stmt = select(*reads.PRODUCT_COLUMNS) if kind == "products" else select(model)
+    if ids is not None:
+        stmt = stmt.where(model.id.in_(ids))
+    result = await db.execute(stmt.order_by(model.id))
+    return result.all() if kind == "products" else result.scalars().all()
+
+async def changes_since(db: AsyncSession, since: int) -> dict:
+    """Conteúdo de schemas.SyncResponse: o catálogo completo ou as alterações depois de `since`."""
+    current = await _current_seq(db) # Lida antes dos registros: o que mudar depois vem de novo na próxima
+    if since == 0 or since > current:
+        response = {"seq": current, "full": True}
+        for kind in _MODELS:
+            response[kind] = await _load(db, kind)
+        return response
+
+    catalog = or_(*(models.CacheVersion.channel.like(f"{kind}:%") for kind in _MODELS))
+    result = await db.execute(
+        select(models.CacheVersion.channel, models.CacheVersion.seq)
+        .where(models.CacheVersion.seq > since, catalog)
+        .order_by(models.CacheVersion.seq)
+        .limit(SYNC_BATCH_SIZE + 1)
+    )
+    rows = result.all()
+    has_more = len(rows) > SYNC_BATCH_SIZE
+    if has_more:
+        # Uma escrita publica todos os seus canais com a mesma sequência (ex.: a categoria removida
+        # e os produtos que ficaram sem ela). A página termina sempre no fim de uma sequência: o
+        # cliente continua a partir dela e pularia o resto do grupo. Um grupo maior que a página
+        # vai inteiro.
+        boundary = rows[SYNC_BATCH_SIZE - 1].seq
+        if rows[SYNC_BATCH_SIZE].seq == boundary:
+            group = await db.execute(
+                select(models.CacheVersion.channel, models.CacheVersion.seq)
+                .where(models.CacheVersion.seq == boundary, catalog)
+            )
+            rows = [row for row in rows if row.seq < boundary] + group.all()
+            later = await db.execute(select(models.CacheVersion.seq).where(models.CacheVersion.seq > boundary, catalog).limit(1))
+            has_more = later.first() is not None
+        else:
+            rows = rows[:SYNC_BATCH_SIZE]
+    changed: Dict[str, List[int]] = {kind: [] for kind in _MODELS}
+    for row in rows:
+        kind, _, record_id = row.channel.partition(":")
+        changed[kind].append(int(record_id))
+
+    response = {"seq": boundary if has_more else current, "has_more": has_more, "deleted": {}}
+    for kind, ids in changed.items():
+        records = await _load(db, kind, ids) if ids else []
+        response[kind] = records
+        response["deleted"][kind] = sorted(set(ids) - {record.id for record in records})
+    return response
@@ -0,0 +1,148 @@
+# lanchonete_backend/benchmarks/bench_archive.py
+
+# Arquivamento de pedidos: consultas de pedidos antes e depois de mover os pedidos antigos para
+# o arquivo, a vazão do arquivamento e a latência de quem grava pedidos enquanto ele roda
+# (cada lote segura o lock de escrita do SQLite só durante a própria transação).
+#
+#   python -m benchmarks.bench_archive [--old 200000] [--recent 10000] [--batch-size 500] [--pause 0.05]
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import percentile_ms, prepare
+
+ESTABLISHMENTS = 20
+CHUNK = 20_000 # Linhas por INSERT na carga inicial
+
+async def seed(args):
+    from app import models
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        for index in range(ESTABLISHMENTS):
+            owner = models.User(email=f"dono{index}@bench", hashed_password="x", is_owner=True)
+            db.add(owner)
+            await db.flush()
+            establishment = models.Establishment(name=f"Lanchonete {index}", address="Rua A", phone="1", owner_id=owner.id)
+            db.add(establishment)
+            await db.flush()
+            db.add(models.Product(name="Lanche", price=10, establishment_id=establishment.id))
+        customer = models.User(email="cliente@bench", hashed_password="x")
+        db.add(customer)
+        await db.commit()
+        customer_id = customer.id
+
+        rng = random.Random(1)
+        now = datetime.now()
+        rows = []
+        for order_id in range(1, args.old + args.recent + 1):
+            old = order_id <= args.old
+            rows.append({
+                "id": order_id, "customer_id": customer_id, "establishment_id": rng.randint(1, ESTABLISHMENTS),
+                "order_date": now - timedelta(days=rng.randint(100, 700) if old else rng.randint(0, 30), seconds=rng.randint(0, 86_399)),
+                "total_amount": 10.0, "status": rng.choice(("delivered", "cancelled")) if old else "pending",
+                "is_pickup": True, "payment_method": "pix",
+            })
+            if len(rows) == CHUNK:
+                await _insert_orders(db, rows)
+                rows = []
+        if rows:
+            await _insert_orders(db, rows)
+        await db.commit()
+    return customer_id
+
+async def _insert_orders(db, rows):
+    from sqlalchemy import insert
+    from app import models
+    await db.execute(insert(models.Order), rows)
+    await db.execute(insert(models.OrderItem), [
+        {"order_id": row["id"], "product_id": row["establishment_id"], "quantity": 1, "price_at_time_of_order": 10.0} for row in rows
+    ])
+
+async def measure_reads(label: str) -> None:
+    from app import crud, stats
+    from app.database import AsyncSessionLocal
+
+    async def timed(fn, repeat=20):
+        samples = []
+        for _ in range(repeat):
+            async with AsyncSessionLocal() as db:
+                started = time.perf_counter()
+                await fn(db)
+                samples.append(time.perf_counter() - started)
+        return round(statistics.median(samples) * 1000, 2)
+
+    async def count_by_payment(db):
+        crud._order_counts.invalidate() # Mede a contagem, não o cache dela
+        await crud.count_orders(db, establishment_id=1, payment_methods=["pix"])
+
+    first_page = await timed(lambda db: crud.get_orders(db, establishment_id=1, limit=20), repeat=50)
+    open_orders = await timed(lambda db: crud.get_orders(db, establishment_id=1, statuses=["pending"], limit=20), repeat=50)
+    by_payment = await timed(count_by_payment)
+    hot_scan = await timed(lambda db: db.execute(stats._expected_stats_query(date.today())), repeat=5)
+    print(
+        f"{label}: primeira página {first_page}ms, pedidos em aberto {open_orders}ms, "
+        f"total por forma de pagamento (tabela quente + arquivo) {by_payment}ms, "
+        f"recálculo dos contadores (varre a tabela quente) {hot_scan}ms"
+    )
+
+async def run(args) -> None:
+    import main
+    from sqlalchemy import func, select
+    from app import archive, crud, models, schemas
+    from app.database import AsyncSessionLocal, all_engines
+
+    await main.create_db_tables()
+    started = time.monotonic()
+    customer_id = await seed(args)
+    print(f"carga: {args.old} pedidos antigos finalizados + {args.recent} recentes em {time.monotonic() - started:.0f}s")
+    await measure_reads("antes")
+
+    # Enquanto o arquivamento roda, um cliente grava pedidos sem parar
+    writes = []
+    archiving = asyncio.Event()
+
+    async def writer():
+        order = schemas.OrderCreate(establishment_id=1, payment_method="pix", is_pickup=True, items=[{"product_id": 1, "quantity": 1}])
+        while not archiving.is_set():
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                await crud.create_order(db, order, customer_id)
+            writes.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+
+    if args.pause is not None:
+        archive.ARCHIVE_BATCH_PAUSE_SECONDS = args.pause
+    writer_task = asyncio.create_task(writer())
+    started = time.monotonic()
+    moved = await archive.archive_orders(batch_size=args.batch_size)
+    elapsed = time.monotonic() - started
+    archiving.set()
+    await writer_task
+    print(
+        f"arquivamento: {moved} pedidos em {elapsed:.1f}s ({moved / elapsed:.0f}/s, lotes de {args.batch_size}); "
+        f"gravações concorrentes: {len(writes)}, p50={percentile_ms(writes, 0.5)}ms p99={percentile_ms(writes, 0.99)}ms "
+        f"máx={percentile_ms(writes, 1.0)}ms"
+    )
+    async with AsyncSessionLocal() as db:
+        hot = (await db.execute(select(func.count()).select_from(models.Order))).scalar()
+    print(f"tabela quente: {hot} pedidos")
+    await measure_reads("depois")
+    for _, db_engine in all_engines():
+        await db_engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Consultas e gravações de pedidos antes, durante e depois do arquivamento")
+    parser.add_argument("--old", type=int, default=200_000, help="pedidos finalizados com mais de 90 dias")
+    parser.add_argument("--recent", type=int, default=10_000, help="pedidos recentes em aberto")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=None, help="pausa entre lotes (padrão: ARCHIVE_BATCH_PAUSE_SECONDS)")
+    args = parser.parse_args()
+    prepare()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# lanchonete_backend/benchmarks/bench_nearby.py
+
+# Busca de estabelecimentos próximos: o R*Tree (geo.find_nearby) contra a varredura ingênua
+# (lê latitude/longitude de todos, calcula a haversine e ordena), com N estabelecimentos
+# espalhados por uma região de ~220 km em volta de São Paulo. Confere que os dois devolvem os
+# mesmos estabelecimentos, na mesma ordem.
+#
+#   python -m benchmarks.bench_nearby [--establishments 100000] [--queries 50]
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks.common import prepare
+
+CENTER = (-23.55, -46.63)
+SPREAD_DEGREES = 1.0
+CHUNK = 20_000 # Linhas por INSERT na carga inicial
+SCENARIOS = ((2, 20), (5, 20), (20, 20), (50, 100)) # (raio em km, limite)
+
+async def seed(count: int) -> None:
+    from sqlalchemy import insert
+    from app import geo, models
+    from app.database import AsyncSessionLocal, engine
+
+    rng = random.Random(1)
+    async with AsyncSessionLocal() as db:
+        for start in range(1, count + 1, CHUNK):
+            ids = range(start, min(start + CHUNK, count + 1))
+            await db.execute(insert(models.User), [
+                {"id": index, "email": f"dono{index}@bench", "hashed_password": "x", "is_owner": True} for index in ids
+            ])
+            await db.execute(insert(models.Establishment), [{
+                "id": index, "name": f"Lanchonete {index}", "address": "Rua A", "phone": "1", "owner_id": index,
+                "latitude": CENTER[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+                "longitude": CENTER[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+            } for index in ids])
+        await db.commit()
+    async with engine.begin() as conn:
+        await conn.run_sync(geo.rebuild_index)
+
+async def naive_nearby(db, lat: float, lon: float, radius_km: float, limit: int):
+    from sqlalchemy import select
+    from app import geo, models
+
+    rows = await db.execute(select(models.Establishment.id, models.Establishment.latitude, models.Establishment.longitude))
+    found = []
+    for establishment_id, latitude, longitude in rows:
+        distance = geo.haversine_km(lat, lon, latitude, longitude)
+        if distance <= radius_km:
+            found.append((distance, establishment_id))
+    found.sort()
+    return [establishment_id for _, establishment_id in found[:limit]]
+
+async def run(args) -> None:
+    import main
+    from app import geo
+    from app.database import AsyncSessionLocal, all_engines
+
+    await main.create_db_tables()
+    started = time.monotonic()
+    await seed(args.establishments)
+    print(f"carga: {args.establishments} estabelecimentos em {time.monotonic() - started:.0f}s")
+
+    rng = random.Random(2)
+    points = [
+        (CENTER[0] + rng.uniform(-SPREAD_DEGREES / 2, SPREAD_DEGREES / 2), CENTER[1] + rng.uniform(-SPREAD_DEGREES / 2, SPREAD_DEGREES / 2))
+        for _ in range(args.queries)
+    ]
+    for radius_km, limit in SCENARIOS:
+        rtree_times, naive_times, mismatches = [], [], 0
+        for lat, lon in points:
+            async with AsyncSessionLocal() as db:
+                before = time.perf_counter()
+                nearby = await geo.find_nearby(db, lat, lon, radius_km, limit)
+                rtree_times.append(time.perf_counter() - before)
+            if len(naive_times) < args.naive_queries:
+                async with AsyncSessionLocal() as db:
+                    before = time.perf_counter()
+                    expected = await naive_nearby(db, lat, lon, radius_km, limit)
+                    naive_times.append(time.perf_counter() - before)
+                mismatches += [establishment.id for establishment, _ in nearby] != expected
+        rtree_ms = statistics.median(rtree_times) * 1000
+        naive_ms = statistics.median(naive_times) * 1000
+        print(
+            f"raio {radius_km} km, {limit} mais próximos: R*Tree {rtree_ms:.2f}ms, varredura {naive_ms:.0f}ms "
+            f"({naive_ms / rtree_ms:.0f}x), resultados diferentes: {mismatches}/{len(naive_times)}"
+        )
+    for _, db_engine in all_engines():
+        await db_engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Busca de estabelecimentos próximos: R*Tree x varredura com haversine")
+    parser.add_argument("--establishments", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=50, help="pontos de busca por cenário")
+    parser.add_argument("--naive-queries", type=int, default=10, help="quantos deles também pela varredura (lenta)")
+    args = parser.parse_args()
+    prepare()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
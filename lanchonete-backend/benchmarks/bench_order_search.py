@@ -0,0 +1,150 @@
+# lanchonete_backend/benchmarks/bench_order_search.py
+
+# Busca de pedidos do proprietário (crud.get_orders) com os filtros mais comuns da cozinha e do
+# caixa: o plano do SQLite para a subconsulta que escolhe os IDs da página (com os índices de
+# cobertura deve aparecer "USING COVERING INDEX", sem ler as linhas da tabela) e o tempo da busca
+# completa, com os índices de cobertura e com os índices estreitos que existiam antes deles.
+#
+#   python -m benchmarks.bench_order_search [--orders 200000] [--repeat 20]
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import prepare
+
+ESTABLISHMENTS = 20
+CHUNK = 20_000 # Linhas por INSERT na carga inicial
+PAGE = 50
+# Índices de pedidos antes da busca filtrada: (nome, colunas)
+NARROW_INDEXES = (
+    ("ix_orders_establishment_status_date", ("establishment_id", "status", "order_date")),
+    ("ix_orders_establishment_date", ("establishment_id", "order_date")),
+)
+COVER_INDEXES = ("ix_orders_establishment_status_date_cover", "ix_orders_establishment_date_cover")
+
+def scenarios(now: datetime):
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return (
+        ("fila da cozinha (pending + preparing)", {"statuses": ["pending", "preparing"], "sort": "order_date"}),
+        ("entregas pendentes de hoje", {"statuses": ["pending"], "date_from": today, "is_pickup": False}),
+        ("PIX da semana passada", {"payment_methods": ["pix"], "date_from": now - timedelta(days=14), "date_to": now - timedelta(days=7)}),
+        ("entregues, mais caros primeiro", {"statuses": ["delivered"], "sort": "-total_amount"}),
+        ("listagem sem filtros", {}),
+    )
+
+async def seed(count: int, now: datetime) -> None:
+    from sqlalchemy import insert
+    from app import models
+    from app.database import AsyncSessionLocal
+
+    rng = random.Random(1)
+    async with AsyncSessionLocal() as db:
+        customer = models.User(email="cliente@bench", hashed_password="x")
+        db.add(customer)
+        for index in range(ESTABLISHMENTS):
+            owner = models.User(email=f"dono{index}@bench", hashed_password="x", is_owner=True)
+            db.add(owner)
+            await db.flush()
+            establishment = models.Establishment(name=f"Lanchonete {index}", address="Rua A", phone="1", owner_id=owner.id)
+            db.add(establishment)
+            await db.flush()
+            db.add(models.Product(name="Lanche", price=10, establishment_id=establishment.id))
+        await db.commit()
+        customer_id = customer.id
+
+        for start in range(1, count + 1, CHUNK):
+            rows = []
+            for order_id in range(start, min(start + CHUNK, count + 1)):
+                age = timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86_399))
+                # Pedidos das últimas horas ainda podem estar na cozinha; os demais já terminaram
+                if age < timedelta(hours=6):
+                    status = rng.choice(("pending", "preparing", "ready"))
+                else:
+                    status = rng.choices(("delivered", "cancelled"), weights=(9, 1))[0]
+                rows.append({
+                    "id": order_id, "customer_id": customer_id, "establishment_id": rng.randint(1, ESTABLISHMENTS),
+                    "order_date": now - age, "total_amount": float(rng.randint(10, 200)), "status": status,
+                    "is_pickup": rng.random() < 0.4, "payment_method": rng.choice(("pix", "cash", "card")),
+                })
+            await db.execute(insert(models.Order), rows)
+            await db.execute(insert(models.OrderItem), [
+                {"order_id": row["id"], "product_id": row["establishment_id"], "quantity": 1, "price_at_time_of_order": row["total_amount"]}
+                for row in rows
+            ])
+        await db.commit()
+
+def page_plan(connection, filters: dict) -> str:
+    """Plano do SQLite para a subconsulta dos IDs da página, como _order_page a monta."""
+    from sqlalchemy import select
+    from app import crud, models
+
+    filters = dict(filters)
+    sort = filters.pop("sort", "-order_date")
+    stmt = (
+        crud._with_order_filters(select(models.Order.id), models.Order, establishment_id=1, **filters)
+        .order_by(*crud._order_by(models.Order, sort))
+        .offset(0).limit(PAGE)
+    )
+    compiled = stmt.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    parameters = compiled.construct_params()
+    rows = connection.exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + str(compiled), tuple(parameters[name] for name in compiled.positiontup)
+    ).all()
+    return "; ".join(row[-1] for row in rows)
+
+async def measure(label: str, cases, repeat: int) -> None:
+    from app import crud
+    from app.database import AsyncSessionLocal, engine
+
+    print(f"--- {label}")
+    for name, filters in cases:
+        async with engine.connect() as conn:
+            plan = await conn.run_sync(page_plan, filters)
+        samples = []
+        for _ in range(repeat):
+            async with AsyncSessionLocal() as db:
+                started = time.perf_counter()
+                orders = await crud.get_orders(db, limit=PAGE, establishment_id=1, **filters)
+                samples.append(time.perf_counter() - started)
+        print(f"{name}: {statistics.median(samples) * 1000:.2f}ms ({len(orders)} pedidos)")
+        print(f"    plano: {plan}")
+
+async def run(args) -> None:
+    import main
+    from app.database import all_engines, engine
+
+    await main.create_db_tables()
+    now = datetime.now()
+    started = time.monotonic()
+    await seed(args.orders, now)
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+    print(f"carga: {args.orders} pedidos em {ESTABLISHMENTS} estabelecimentos em {time.monotonic() - started:.0f}s")
+
+    cases = scenarios(now)
+    await measure("índices de cobertura", cases, args.repeat)
+
+    async with engine.begin() as conn:
+        for name in COVER_INDEXES:
+            await conn.exec_driver_sql(f"DROP INDEX {name}")
+        for name, columns in NARROW_INDEXES:
+            await conn.exec_driver_sql(f"CREATE INDEX {name} ON orders ({', '.join(columns)})")
+        await conn.exec_driver_sql("ANALYZE")
+    await measure("índices estreitos (antes da busca filtrada)", cases, args.repeat)
+
+    for _, db_engine in all_engines():
+        await db_engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Busca de pedidos com filtros: índices de cobertura x índices estreitos")
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20, help="execuções de cada busca (mediana)")
+    args = parser.parse_args()
+    prepare()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# lanchonete_backend/benchmarks/bench_reads.py
+
+# Listagens somente leitura com N linhas (produtos e pedidos com itens): o caminho antigo, com
+# objetos do ORM (identity map, instrumentação) validados por from_attributes e serializados pelo
+# FastAPI (dump em Python + json.dumps), contra o atual, com linhas do Core (app/reads.py) e o
+# JSON gerado pelo pydantic-core. Mede o tempo da leitura até o corpo da resposta e a memória por
+# linha: a retida pelo resultado da consulta e o pico durante a resposta inteira.
+#
+#   python -m benchmarks.bench_reads [--rows 10000] [--repeat 10]
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.common import prepare
+
+CHUNK = 20_000 # Linhas por INSERT na carga inicial
+
+async def seed(count: int) -> int:
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from app import models
+    from app.database import AsyncSessionLocal
+
+    rng = random.Random(1)
+    now = datetime.now()
+    async with AsyncSessionLocal() as db:
+        owner = models.User(email="dono@bench", hashed_password="x", is_owner=True)
+        customer = models.User(email="cliente@bench", hashed_password="x")
+        db.add_all([owner, customer])
+        await db.flush()
+        establishment = models.Establishment(name="Lanchonete", address="Rua A", phone="1", owner_id=owner.id)
+        db.add(establishment)
+        await db.flush()
+        for start in range(1, count + 1, CHUNK):
+            ids = range(start, min(start + CHUNK, count + 1))
+            await db.execute(insert(models.Product), [{
+                "id": index, "name": f"Lanche {index}", "description": "Pão, carne e queijo", "price": float(rng.randint(5, 50)),
+                "establishment_id": establishment.id, "stock": 100,
+            } for index in ids])
+            await db.execute(insert(models.Order), [{
+                "id": index, "customer_id": customer.id, "establishment_id": establishment.id,
+                "order_date": now - timedelta(minutes=index), "total_amount": 20.0, "status": "delivered",
+                "is_pickup": index % 2 == 0, "payment_method": "pix", "delivery_address": "Rua B, 10",
+            } for index in ids])
+            await db.execute(insert(models.OrderItem), [{
+                "order_id": index, "product_id": product_id, "quantity": 1, "price_at_time_of_order": 10.0,
+            } for index in ids for product_id in (index, count + 1 - index)])
+        await db.commit()
+    return establishment.id
+
+def orm_paths(rows: int, establishment_id: int):
+    """(nome, consulta, adapter): como as rotas liam antes de app/reads.py."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+    from app import models, reads
+
+    async def products(db):
+        return (await db.execute(select(models.Product).offset(0).limit(rows))).scalars().all()
+
+    async def orders(db):
+        return (await db.execute(
+            select(models.Order)
+            .where(models.Order.establishment_id == establishment_id)
+            .order_by(models.Order.order_date.desc())
+            .offset(0).limit(rows)
+            .options(
+                selectinload(models.Order.customer),
+                selectinload(models.Order.establishment),
+                selectinload(models.Order.items).selectinload(models.OrderItem.product)
+            )
+        )).scalars().all()
+
+    return (("produtos", products, reads.PRODUCT_LIST), ("pedidos com itens", orders, reads.ORDER_LIST))
+
+def core_paths(rows: int, establishment_id: int):
+    from app import crud, reads
+
+    async def products(db):
+        return await crud.get_products(db, 0, rows)
+
+    async def orders(db):
+        return await crud.get_orders(db, skip=0, limit=rows, establishment_id=establishment_id)
+
+    return (("produtos", products, reads.PRODUCT_LIST), ("pedidos com itens", orders, reads.ORDER_LIST))
+
+def orm_body(adapter, content) -> bytes:
+    # O que o FastAPI faz com response_model: valida, gera objetos Python "json" e chama json.dumps
+    value = adapter.validate_python(content, from_attributes=True)
+    return json.dumps(adapter.dump_python(value, mode="json"), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def core_body(adapter, content) -> bytes:
+    from app import reads
+    return reads.json_response(adapter, content).body
+
+async def measure(fetch, render, adapter, repeat: int):
+    from app.database import AsyncSessionLocal
+
+    samples = []
+    for _ in range(repeat + 2): # As duas primeiras aquecem caches (instruções compiladas, páginas do SQLite)
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            content = await fetch(db)
+            render(adapter, content)
+            samples.append(time.perf_counter() - started)
+    # Memória: a retida pelo resultado (com a sessão aberta, como durante a requisição) e o pico da resposta
+    async with AsyncSessionLocal() as db:
+        tracemalloc.start()
+        content = await fetch(db)
+        retained = tracemalloc.get_traced_memory()[0]
+        render(adapter, content)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return statistics.median(samples[2:]), retained / len(content), peak / len(content), len(content)
+
+async def run(args) -> None:
+    import main
+    from app.database import all_engines
+
+    await main.create_db_tables()
+    establishment_id = await seed(args.rows)
+
+    for (name, orm_fetch, adapter), (_, core_fetch, _) in zip(orm_paths(args.rows, establishment_id), core_paths(args.rows, establishment_id)):
+        before = await measure(orm_fetch, orm_body, adapter, args.repeat)
+        after = await measure(core_fetch, core_body, adapter, args.repeat)
+        for label, (seconds, retained, peak, count) in (("ORM + from_attributes", before), ("Core + reads", after)):
+            print(
+                f"{name}, {label}: {seconds * 1000:.0f}ms para {count} linhas ({count / seconds:,.0f} linhas/s), "
+                f"{retained:,.0f} bytes/linha retidos, pico {peak:,.0f} bytes/linha"
+            )
+        print(f"{name}: {before[0] / after[0]:.1f}x mais rápido, {before[1] / after[1]:.1f}x menos memória retida")
+
+    for _, db_engine in all_engines():
+        await db_engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Listagens somente leitura: ORM + from_attributes x Core + app/reads.py")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10, help="execuções de cada caminho (mediana)")
+    args = parser.parse_args()
+    prepare()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
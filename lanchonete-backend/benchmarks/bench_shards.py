@@ -0,0 +1,28 @@
+# lanchonete_backend/benchmarks/bench_shards.py
+
+# Vazão agregada de criação de pedidos sem sharding e com 1, 4 e 16 shards: roda o
+# benchmarks.bench_stock uma vez para cada número de shards, cada um no seu processo (o número de
+# shards é lido quando a aplicação é importada) e no seu diretório temporário.
+#
+#   python -m benchmarks.bench_shards [--shards 0 1 4 16] [--concurrency 16] [--seconds 20]
+import argparse
+import os
+import subprocess
+import sys
+
+from benchmarks.common import BACKEND_DIR
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vazão de pedidos por número de shards (0 = sem sharding)")
+    parser.add_argument("--shards", type=int, nargs="+", default=[0, 1, 4, 16])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+    for shards in args.shards:
+        subprocess.run([
+            sys.executable, "-m", "benchmarks.bench_stock", "--shards", str(shards),
+            "--concurrency", str(args.concurrency), "--seconds", str(args.seconds),
+        ], cwd=BACKEND_DIR, env={**os.environ, "PYTHONPATH": BACKEND_DIR}, check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# lanchonete_backend/benchmarks/bench_statements.py
+
+# Custo do lado do Python por consulta: a mesma consulta construída com select(...) a cada chamada
+# (gera a chave do cache de instruções compiladas percorrendo a construção inteira) e com
+# lambda_stmt, como no CRUD (a chave vem do código da lambda e dos valores capturados).
+# Engine síncrono num SQLite em memória, para que o tempo medido seja quase só o do SQLAlchemy.
+#
+#   python -m benchmarks.bench_statements [--calls 2000]
+import argparse
+import timeit
+
+from benchmarks.common import prepare
+
+# Importados em run(), depois de prepare(); globais do módulo, como no CRUD, e não variáveis
+# capturadas pelas lambdas (que o lambda_stmt exigiria rastrear)
+models = select = selectinload = None
+
+def user_by_email(email):
+    return lambda: select(models.User).where(models.User.email == email)
+
+def principal(email):
+    return lambda: (
+        select(models.User, models.Establishment.id)
+        .outerjoin(models.Establishment, models.Establishment.owner_id == models.User.id)
+        .where(models.User.email == email)
+    )
+
+def product_version(product_id):
+    return lambda: select(models.Product.version, models.Product.updated_at).where(models.Product.id == product_id)
+
+def order_with_items(order_id):
+    return lambda: (
+        select(models.Order)
+        .where(models.Order.id == order_id)
+        .options(
+            selectinload(models.Order.customer),
+            selectinload(models.Order.establishment),
+            selectinload(models.Order.items).selectinload(models.OrderItem.product)
+        )
+    )
+
+# (nome, consulta, argumento): o argumento é capturado pela lambda, como os parâmetros das funções do CRUD
+QUERIES = (
+    ("usuário por e-mail", user_by_email, "dono@bench"),
+    ("principal (usuário + estabelecimento)", principal, "dono@bench"),
+    ("versão do produto (ETag)", product_version, 1),
+    ("pedido com itens", order_with_items, 1),
+)
+
+def run(args) -> None:
+    global models, select, selectinload
+    from sqlalchemy import create_engine, lambda_stmt, select
+    from sqlalchemy.orm import Session, selectinload
+    from app import models
+    from app.database import Base
+
+    engine = create_engine("sqlite://", query_cache_size=1200)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        owner = models.User(email="dono@bench", hashed_password="x", is_owner=True)
+        db.add(owner)
+        db.flush()
+        establishment = models.Establishment(name="Lanchonete", address="Rua A", phone="1", owner_id=owner.id)
+        db.add(establishment)
+        db.flush()
+        product = models.Product(name="Lanche", price=10, establishment_id=establishment.id)
+        db.add(product)
+        db.flush()
+        order = models.Order(customer_id=owner.id, establishment_id=establishment.id, total_amount=10, payment_method="pix")
+        db.add(order)
+        db.flush()
+        db.add(models.OrderItem(order_id=order.id, product_id=product.id, quantity=1, price_at_time_of_order=10))
+        db.commit()
+
+        for name, query, argument in QUERIES:
+            def built():
+                db.execute(query(argument)()).all()
+                db.expunge_all()
+
+            def cached():
+                db.execute(lambda_stmt(query(argument))).all()
+                db.expunge_all()
+
+            timings = {}
+            for label, call in (("select()", built), ("lambda_stmt", cached)):
+                call() # Compila e guarda no cache antes de medir
+                timings[label] = min(timeit.repeat(call, number=args.calls, repeat=5)) / args.calls * 1e6
+            print(
+                f"{name}: select() {timings['select()']:.0f}us, lambda_stmt {timings['lambda_stmt']:.0f}us "
+                f"({timings['lambda_stmt'] / timings['select()'] - 1:+.0%})"
+            )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Custo por consulta: select() reconstruído x lambda_stmt")
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+    prepare()
+    run(args)
+
+if __name__ == "__main__":
+    main()
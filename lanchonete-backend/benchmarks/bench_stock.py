@@ -0,0 +1,90 @@
+# lanchonete_backend/benchmarks/bench_stock.py
+
+# Vazão de criação de pedidos com e sem controle de estoque (crud.create_order chamado direto,
+# sem HTTP), com N pedidos simultâneos espalhados por 32 estabelecimentos de 3 produtos.
+#
+#   python -m benchmarks.bench_stock [--shards 4] [--concurrency 8] [--seconds 20] [--stock]
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import percentile_ms, prepare
+
+ESTABLISHMENTS = 32
+PRODUCTS_PER_ESTABLISHMENT = 3
+
+async def run(args) -> None:
+    import main
+    from sqlalchemy import select
+    from app import crud, models, schemas
+    from app.database import AsyncSessionLocal, all_engines
+
+    await main.create_db_tables()
+    async with AsyncSessionLocal() as db:
+        for index in range(ESTABLISHMENTS):
+            owner = models.User(email=f"dono{index}@bench", hashed_password="x", is_owner=True)
+            db.add(owner)
+            await db.flush()
+            establishment = models.Establishment(name=f"Lanchonete {index}", address="Rua A", phone="1", owner_id=owner.id)
+            db.add(establishment)
+            await db.flush()
+            for position in range(PRODUCTS_PER_ESTABLISHMENT):
+                db.add(models.Product(
+                    name=f"Produto {position}", price=position + 1, establishment_id=establishment.id,
+                    stock=10 ** 9 if args.stock else None
+                ))
+        customer = models.User(email="cliente@bench", hashed_password="x")
+        db.add(customer)
+        await db.commit()
+        customer_id = customer.id
+        products = {}
+        for product in (await db.execute(select(models.Product))).scalars():
+            products.setdefault(product.establishment_id, []).append(product.id)
+    establishment_ids = sorted(products)
+
+    latencies = []
+    errors = 0
+    stop_at = time.monotonic() + args.seconds
+
+    async def worker(offset: int) -> None:
+        nonlocal errors
+        position = offset
+        while time.monotonic() < stop_at:
+            establishment_id = establishment_ids[position % len(establishment_ids)]
+            position += args.concurrency
+            order = schemas.OrderCreate(
+                establishment_id=establishment_id, payment_method="pix", is_pickup=True,
+                items=[{"product_id": product_id, "quantity": 1} for product_id in products[establishment_id]]
+            )
+            started = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as db:
+                    await crud.create_order(db, order, customer_id)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker(offset) for offset in range(args.concurrency)))
+    elapsed = time.monotonic() - started
+    print(
+        f"stock={'sim' if args.stock else 'não'} shards={args.shards} concurrency={args.concurrency} "
+        f"pedidos={len(latencies)} vazão={len(latencies) / elapsed:.0f}/s "
+        f"p50={percentile_ms(latencies, 0.50)}ms p99={percentile_ms(latencies, 0.99)}ms erros={errors}"
+    )
+    for _, db_engine in all_engines():
+        await db_engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vazão de criação de pedidos com e sem controle de estoque")
+    parser.add_argument("--shards", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--stock", action="store_true", help="produtos com estoque controlado")
+    args = parser.parse_args()
+    prepare(args.shards)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
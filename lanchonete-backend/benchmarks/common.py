@@ -0,0 +1,27 @@
+# lanchonete_backend/benchmarks/common.py
+
+# Preparação comum aos benchmarks: cada execução roda num diretório temporário (banco vazio,
+# sem tocar no sql_app.db do projeto) e escolhe o sharding antes de importar a aplicação.
+import logging
+import os
+import sys
+import tempfile
+from typing import List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def prepare(shards: int = 0) -> str:
+    """Entra num diretório temporário e deixa `app` importável. Chamar antes de importar a aplicação."""
+    directory = tempfile.mkdtemp(prefix="lanchonete-bench-")
+    os.chdir(directory)
+    os.environ["LANCHONETE_SHARDS"] = str(shards)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    logging.disable(logging.WARNING) # Avisos de carga (prazos, bloqueios) atrapalham a leitura do resultado
+    return directory
+
+def percentile_ms(latencies: List[float], fraction: float) -> Optional[float]:
+    if not latencies:
+        return None
+    ordered = sorted(latencies)
+    return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000, 1)
@@ -0,0 +1,138 @@
+# lanchonete_backend/benchmarks/load_deadlines.py
+
+# Prazos e descarte de carga sob sobrecarga, pelo HTTP de verdade: sobe o main:app num uvicorn
+# (diretório temporário, banco vazio) e dispara rajadas de logins (bcrypt, o trecho mais caro da
+# API) e de pedidos com clientes impacientes, que desconectam antes da resposta. Ao final confere
+# se todo pedido em aberto gravado está na fila da cozinha (memória do processo).
+#
+#   python -m benchmarks.load_deadlines [--baseline] [--port 8042]
+#
+# --baseline desliga o descarte (sem limite de requisições simultâneas nem prazos), para comparar.
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BACKEND_DIR, percentile_ms, prepare
+
+PASSWORD = "senha-de-carga"
+LOGIN_BURSTS = ((2, 20), (100, 600)) # (simultâneos, total)
+ORDER_CONCURRENCY = 50
+ORDERS = 1000
+IMPATIENT_TIMEOUT = 0.3 # Segundos até o cliente impaciente desistir do pedido
+
+def serve(args) -> None:
+    import uvicorn
+    import main
+    from app import deadlines
+
+    logging.disable(logging.WARNING)
+    if args.baseline:
+        deadlines.MAX_IN_FLIGHT = 10 ** 9
+        deadlines.DEFAULT_DEADLINE_SECONDS = 10 ** 9
+        deadlines._Load.estimated_wait = lambda self: 0.0
+        deadlines.BoundedExecutor.estimated_wait = lambda self: 0.0
+        deadlines.Deadline.set_seconds = lambda self, seconds: None
+    uvicorn.run(main.app, port=args.port, log_level="warning")
+
+def _summary(results) -> str:
+    by_status = {}
+    for code, latency in results:
+        by_status.setdefault(code, []).append(latency)
+    return ", ".join(
+        f"{code}: {len(latencies)} p50={percentile_ms(latencies, 0.5)}ms p99={percentile_ms(latencies, 0.99)}ms"
+        for code, latencies in sorted(by_status.items(), key=lambda item: str(item[0]))
+    )
+
+async def burst(concurrency: int, total: int, request) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                code = (await request()).status_code
+            except Exception as error: # Cliente desistiu (timeout) ou a conexão caiu
+                code = type(error).__name__
+            results.append((code, time.perf_counter() - started))
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return results
+
+async def run(args) -> None:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as client:
+        for _ in range(100):
+            try:
+                await client.get("/docs")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+
+        async def login(email: str) -> dict:
+            response = await client.post("/users/token", data={"username": email, "password": PASSWORD})
+            return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        for email, is_owner in (("dono@carga.com", True), ("cliente@carga.com", False)):
+            await client.post("/users/register/", json={"email": email, "password": PASSWORD, "is_owner": is_owner})
+        owner = await login("dono@carga.com")
+        customer = await login("cliente@carga.com")
+        establishment = (await client.post("/establishments/", json={"name": "Lanchonete", "address": "Rua A", "phone": "1"}, headers=owner)).json()
+        product = (await client.post("/products/", json={"name": "Lanche", "price": 10.0, "establishment_id": establishment["id"]}, headers=owner)).json()
+        await client.get("/orders/queue", headers=owner) # Fila carregada na memória
+
+        for concurrency, total in LOGIN_BURSTS:
+            started = time.monotonic()
+            results = await burst(concurrency, total, lambda: client.post(
+                "/users/token", data={"username": "cliente@carga.com", "password": PASSWORD}
+            ))
+            print(f"logins simultâneos={concurrency} total={total} em {time.monotonic() - started:.1f}s: {_summary(results)}")
+
+        order = {"establishment_id": establishment["id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 1}]}
+        started = time.monotonic()
+        results = await burst(ORDER_CONCURRENCY, ORDERS, lambda: client.post(
+            "/orders/", json=order, headers=customer, timeout=IMPATIENT_TIMEOUT
+        ))
+        print(f"pedidos simultâneos={ORDER_CONCURRENCY} total={ORDERS} em {time.monotonic() - started:.1f}s: {_summary(results)}")
+
+        async def settled(url: str, **kwargs):
+            # Depois da rajada, o servidor ainda descarta (ou, sem descarte, atrasa) requisições
+            # até terminar o que ficou em andamento
+            while True:
+                response = await client.get(url, headers=owner, **kwargs)
+                if response.status_code == 200:
+                    return response.json()
+                await asyncio.sleep(1)
+
+        stored = await settled("/orders/", params={"limit": ORDERS * 2})
+        queue = (await settled("/orders/queue"))["orders"]
+        missing = {item["id"] for item in stored if item["status"] == "pending"} - {item["id"] for item in queue}
+        print(f"pedidos gravados: {len(stored)}, na fila da cozinha: {len(queue)}, gravados fora da fila: {len(missing)}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rajadas de logins e pedidos contra o app com prazos e descarte de carga")
+    parser.add_argument("--baseline", action="store_true", help="sem descarte de carga nem prazos")
+    parser.add_argument("--port", type=int, default=8042)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS) # Processo do servidor
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+        return
+    directory = prepare()
+    command = [sys.executable, "-m", "benchmarks.load_deadlines", "--serve", "--port", str(args.port)]
+    if args.baseline:
+        command.append("--baseline")
+    server = subprocess.Popen(command, cwd=directory, env={**os.environ, "PYTHONPATH": BACKEND_DIR})
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
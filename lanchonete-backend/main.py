@@ -1,9 +1,16 @@
 # lanchonete_backend/main.py
 
 from fastapi import FastAPI
-from app.database import engine, Base
+from sqlalchemy.exc import OperationalError
+from app.database import (
+    engine, shard_engines, add_engine_hook, Base, add_missing_columns, sync_indexes, rebuild_outdated_foreign_keys,
+    create_shard_tables, check_order_placement, AsyncSessionLocal
+)
 import asyncio
+from contextlib import asynccontextmanager
 from app import models # Importa todos os modelos definidos em models.py
+from app import invalidation, images, geo, archive, stats, jobs, deadlines, profiling
+from app.kitchen import kitchen_queue
 from fastapi.middleware.cors import CORSMiddleware
 
 # Importa TODOS os routers que você criou
@@ -12,12 +19,58 @@ from app.routers import users
 from app.routers import establishments
 from app.routers import categories
 from app.routers import orders 
+from app.routers import admin
+from app.routers import sync
+
+# Função para criar as tabelas no banco de dados (já configurado)
+async def create_db_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(sync_indexes)
+        await conn.run_sync(geo.rebuild_index)
+    # Fora da transação acima: a recriação precisa desligar as chaves estrangeiras antes de começar
+    async with engine.connect() as conn:
+        await conn.run_sync(rebuild_outdated_foreign_keys)
+    await create_shard_db_tables()
+
+# Com sharding (ver app/database.py), as tabelas de pedidos de cada shard
+async def create_shard_db_tables():
+    for shard_engine in shard_engines:
+        async with shard_engine.begin() as conn:
+            await conn.run_sync(create_shard_tables)
+            await conn.run_sync(add_missing_columns)
+            await conn.run_sync(sync_indexes)
+
+# Startup e shutdown da aplicação (já configurado): antes do yield, cria as tabelas e inicia os
+# jobs em segundo plano; depois, encerra-os e o pool de processos das miniaturas
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print("Criando tabelas do banco de dados (se não existirem)...")
+    await create_db_tables()
+    print("Tabelas criadas ou já existentes.")
+    await check_order_placement() # Pedidos gravados com outro número de shards impedem o início
+    await invalidation.init()
+    async with AsyncSessionLocal() as db:
+        await kitchen_queue.load(db) # Fila de cozinha em memória, a partir dos pedidos ativos
+    archive.start() # Job periódico que move pedidos finalizados antigos para o arquivo
+    stats.start() # Reconciliação periódica dos contadores (a primeira roda já no startup)
+    jobs.start() # Worker da fila de jobs (efeitos colaterais dos pedidos)
+    if admin.ADMIN_EMAILS:
+        profiling.start() # Monitor de atraso do event loop, lido só pelas rotas de admin
+    yield
+    await jobs.stop() # Espera os jobs em execução (até jobs.DRAIN_TIMEOUT_SECONDS)
+    await archive.stop()
+    await stats.stop()
+    await profiling.stop()
+    images.shutdown()
 
 # Cria uma instância da aplicação FastAPI
 app = FastAPI(
     title="API de Lanchonete",
     description="API para gerenciamento de pedidos e produtos de lanchonete.",
     version="1.0.0",
+    lifespan=lifespan,
     # Adicione a configuração de segurança OpenAPI para JWT
     openapi_extra={
         "security": [
@@ -57,17 +110,15 @@ app.add_middleware(
     allow_headers=["*"], # Permite todos os cabeçalhos
 )
 
-# Função para criar as tabelas no banco de dados (já configurado)
-async def create_db_tables():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+# Consulta (no máximo a cada invalidation.POLL_INTERVAL) as invalidações de cache
+# publicadas por outros workers, antes de atender a requisição
+app.add_middleware(invalidation.PollMiddleware)
 
-# Evento de startup para criar as tabelas (já configurado)
-@app.on_event("startup")
-async def startup_event():
-    print("Criando tabelas do banco de dados (se não existirem)...")
-    await create_db_tables()
-    print("Tabelas criadas ou já existentes.")
+# Prazo por requisição e rejeição sob sobrecarga (ver app/deadlines.py). Adicionado por último
+# para ficar por fora dos demais middlewares e contar a requisição inteira
+app.add_middleware(deadlines.DeadlineMiddleware)
+add_engine_hook(deadlines.install_database_hooks) # Prazo da requisição no progress handler do SQLite
+app.add_exception_handler(OperationalError, deadlines.database_error_handler)
 
 # Inclui os routers na aplicação principal (apenas uma vez para cada)
 app.include_router(products.router)
@@ -75,6 +126,8 @@ app.include_router(users.router)
 app.include_router(establishments.router)
 app.include_router(categories.router)
 app.include_router(orders.router)
+app.include_router(admin.router)
+app.include_router(sync.router)
 
 # Define a rota raiz (endpoint) (já configurado)
 @app.get("/")
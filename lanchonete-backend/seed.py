@@ -0,0 +1,316 @@
+# lanchonete_backend/seed.py
+
+# Gerador de dados sintéticos para testes de carga e ajuste de índices.
+#
+# Preenche o banco definido em app/database.py com estabelecimentos (e seus proprietários),
+# categorias, produtos, clientes e pedidos com itens, usando INSERTs em lote do SQLAlchemy Core
+# (sem ORM), em transações grandes. Com sharding (LANCHONETE_SHARDS, ver app/database.py),
+# os pedidos vão para o shard do estabelecimento. Os dados seguem distribuições assimétricas,
+# como as reais: poucos estabelecimentos e produtos concentram a maior parte dos pedidos (Zipf),
+# os pedidos se concentram no almoço e no jantar e crescem no fim de semana.
+#
+# A mesma semente gera sempre os mesmos dados (com as datas relativas ao dia da execução). Os IDs começam depois dos já existentes, então
+# o gerador pode ser rodado sobre um banco com dados (as categorias de mesmo nome são reaproveitadas).
+#
+# Uso (na pasta lanchonete-backend, com a API parada):
+#   python seed.py --establishments 2000 --products 200000 --orders 3000000 --seed 42
+#
+# Todos os usuários gerados têm a senha SEED_PASSWORD.
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import logging
+import random
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app import geo, models, stats
+from app.database import AsyncSessionLocal, engine, shard_engines, shard_for_establishment, shard_keys, SHARD_ID_SPAN
+from app.security import get_password_hash
+from main import create_db_tables
+
+SEED_PASSWORD = "senha123"
+BATCH_SIZE = 50_000 # Linhas por executemany; uma transação por tabela (ou por lote de pedidos)
+
+CATEGORY_NAMES = (
+    "Lanches", "Bebidas", "Porções", "Sobremesas", "Pizzas", "Pastéis", "Salgados", "Açaí",
+    "Sucos", "Cafés", "Combos", "Pratos Feitos", "Saladas", "Sorvetes", "Hot Dogs", "Espetinhos",
+)
+# (nome, faixa de preço) por categoria; as demais usam DEFAULT_PRICE_RANGE
+PRODUCT_NAMES = {
+    "Lanches": (("X-Burger", "X-Salada", "X-Bacon", "X-Tudo", "X-Egg", "Misto Quente"), (12.0, 38.0)),
+    "Bebidas": (("Refrigerante Lata", "Refrigerante 2L", "Água", "Cerveja", "Chá Gelado"), (4.0, 14.0)),
+    "Porções": (("Batata Frita", "Calabresa Acebolada", "Frango a Passarinho", "Mandioca"), (18.0, 55.0)),
+    "Sobremesas": (("Pudim", "Brownie", "Mousse", "Petit Gâteau"), (8.0, 24.0)),
+    "Pizzas": (("Pizza Mussarela", "Pizza Calabresa", "Pizza Portuguesa", "Pizza Quatro Queijos"), (35.0, 75.0)),
+    "Pastéis": (("Pastel de Carne", "Pastel de Queijo", "Pastel de Frango", "Pastel de Palmito"), (7.0, 16.0)),
+}
+DEFAULT_PRICE_RANGE = (6.0, 40.0)
+CITIES = ( # (latitude, longitude) de centros urbanos; os estabelecimentos se espalham em volta
+    (-23.55, -46.63), (-22.91, -43.17), (-19.92, -43.94), (-25.43, -49.27), (-30.03, -51.23), (-12.97, -38.50),
+)
+# Peso relativo dos pedidos por hora do dia: picos no almoço e no jantar
+HOUR_WEIGHTS = (1, 0, 0, 0, 0, 0, 1, 2, 3, 3, 5, 12, 16, 12, 6, 4, 5, 7, 12, 16, 15, 10, 5, 2)
+WEEKDAY_WEIGHTS = (0.8, 0.8, 0.9, 1.0, 1.3, 1.5, 1.4) # Segunda a domingo
+PAYMENT_METHODS = (("pix", 50), ("credit_card", 30), ("cash", 12), ("debit_card", 8))
+ITEMS_PER_ORDER = ((1, 40), (2, 30), (3, 16), (4, 9), (5, 5))
+QUANTITY = ((1, 75), (2, 18), (3, 5), (4, 2))
+# Status dos pedidos de dias anteriores; os de hoje ficam espalhados pelos status ativos
+PAST_STATUSES = (("delivered", 92), ("cancelled", 8))
+TODAY_STATUSES = (
+    ("pending", 15), ("preparing", 15), ("on_delivery", 10), ("ready_for_pickup", 5), ("delivered", 50), ("cancelled", 5),
+)
+
+def _cum_weights(pairs):
+    values = [value for value, _ in pairs]
+    return values, list(itertools.accumulate(weight for _, weight in pairs))
+
+def _zipf_cum_weights(n: int, exponent: float):
+    """Pesos acumulados de uma distribuição de Zipf sobre n posições (a primeira é a mais popular)."""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+class Picker:
+    """Sorteio rápido por pesos acumulados (bisect), sem recriar a tabela a cada chamada."""
+    def __init__(self, rng: random.Random, values, cum_weights):
+        self.rng = rng
+        self.values = values
+        self.cum_weights = cum_weights
+        self.total = cum_weights[-1]
+
+    def __call__(self):
+        return self.values[bisect.bisect(self.cum_weights, self.rng.random() * self.total)]
+
+async def _next_id(conn, model) -> int:
+    return ((await conn.execute(select(func.max(model.id)))).scalar() or 0) + 1
+
+async def _write_orders(conn, orders, items) -> None:
+    await _insert(conn, models.Order.__table__, orders)
+    await _insert(conn, models.OrderItem.__table__, items)
+    await conn.commit()
+
+async def _insert(conn, table, rows) -> None:
+    for start in range(0, len(rows), BATCH_SIZE):
+        await conn.execute(insert(table), rows[start:start + BATCH_SIZE])
+
+def _progress(label: str, count: int, started: float) -> None:
+    elapsed = time.monotonic() - started
+    print(f"  {label}: {count:,} linhas em {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f}/s)")
+
+# --- Geração ---
+
+async def seed(args) -> None:
+    rng = random.Random(args.seed)
+    password_hash = get_password_hash(SEED_PASSWORD) # Um hash só: bcrypt por usuário levaria horas
+    now = datetime.now().replace(microsecond=0) # order_date é gravado em horário local
+    today = now.date()
+
+    await create_db_tables()
+    async with engine.connect() as conn:
+        # Carga em massa: sem fsync a cada transação (um crash no meio da carga exige recomeçar)
+        await conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        await conn.commit()
+
+        # Usuários: um proprietário por estabelecimento e os clientes
+        started = time.monotonic()
+        first_user = await _next_id(conn, models.User)
+        tag = f"s{args.seed}-{first_user}" # Deixa os e-mails únicos entre execuções
+        owner_ids = list(range(first_user, first_user + args.establishments))
+        customer_ids = list(range(first_user + args.establishments, first_user + args.establishments + args.customers))
+        users = [
+            {"id": user_id, "email": f"dono{n}.{tag}@seed.lanchonete", "hashed_password": password_hash, "is_active": True, "is_owner": True}
+            for n, user_id in enumerate(owner_ids)
+        ] + [
+            {"id": user_id, "email": f"cliente{n}.{tag}@seed.lanchonete", "hashed_password": password_hash, "is_active": True, "is_owner": False}
+            for n, user_id in enumerate(customer_ids)
+        ]
+        await _insert(conn, models.User.__table__, users)
+        await conn.commit()
+        _progress("usuários", len(users), started)
+        del users
+
+        # Estabelecimentos, em volta das cidades
+        started = time.monotonic()
+        first_establishment = await _next_id(conn, models.Establishment)
+        establishment_ids = list(range(first_establishment, first_establishment + args.establishments))
+        establishments = []
+        for n, (establishment_id, owner_id) in enumerate(zip(establishment_ids, owner_ids)):
+            lat, lon = rng.choice(CITIES)
+            establishments.append({
+                "id": establishment_id,
+                "name": f"Lanchonete {n} ({tag})",
+                "address": f"Rua Sintética, {rng.randint(1, 9999)}",
+                "phone": f"119{rng.randint(10_000_000, 99_999_999)}",
+                "description": None,
+                "latitude": round(lat + rng.gauss(0, 0.08), 6),
+                "longitude": round(lon + rng.gauss(0, 0.08), 6),
+                "owner_id": owner_id,
+                "version": 1,
+                "updated_at": now,
+            })
+        await _insert(conn, models.Establishment.__table__, establishments)
+        await conn.commit()
+        _progress("estabelecimentos", len(establishments), started)
+        del establishments
+
+        # Categorias (globais e de nome único): reaproveita as que já existem
+        existing = dict((await conn.execute(select(models.Category.name, models.Category.id))).all())
+        wanted = [CATEGORY_NAMES[n] if n < len(CATEGORY_NAMES) else f"Categoria {n}" for n in range(args.categories)]
+        next_category = await _next_id(conn, models.Category)
+        new_categories = []
+        for name in wanted:
+            if name not in existing:
+                existing[name] = next_category
+                new_categories.append({"id": next_category, "name": name, "version": 1, "updated_at": now})
+                next_category += 1
+        await _insert(conn, models.Category.__table__, new_categories)
+        await conn.commit()
+        categories = [(name, existing[name]) for name in wanted]
+
+        # Produtos: quantidade por estabelecimento assimétrica (poucos com cardápio enorme)
+        started = time.monotonic()
+        next_product = await _next_id(conn, models.Product)
+        per_establishment = [rng.lognormvariate(0, 0.6) for _ in establishment_ids]
+        scale = args.products / max(sum(per_establishment), 1e-9)
+        menus = {} # establishment_id -> [(product_id, price)], do mais para o menos popular
+        products = []
+        for establishment_id, share in zip(establishment_ids, per_establishment):
+            menu = []
+            for _ in range(max(1, round(share * scale))):
+                category_name, category_id = rng.choice(categories) if categories and rng.random() < 0.9 else (None, None)
+                names, (low, high) = PRODUCT_NAMES.get(category_name, ((category_name or "Item",), DEFAULT_PRICE_RANGE))
+                price = round(round(rng.uniform(low, high)) - 0.1, 2) # Preços "quebrados": 19.90
+                products.append({
+                    "id": next_product,
+                    "name": f"{rng.choice(names)} {len(menu) + 1}",
+                    "description": None,
+                    "price": price,
+                    "image_url": None,
+                    "image_variants": None,
+                    "is_available": rng.random() < 0.9,
+                    "version": 1,
+                    "updated_at": now,
+                    "establishment_id": establishment_id,
+                    "category_id": category_id,
+                })
+                menu.append((next_product, price))
+                next_product += 1
+            menus[establishment_id] = menu
+        await _insert(conn, models.Product.__table__, products)
+        await conn.commit()
+        _progress("produtos", len(products), started)
+        del products
+
+        # Pedidos e itens, em lotes (cada lote em sua transação), com os IDs seguintes de cada
+        # shard (sem sharding, um só: None, o próprio `conn`)
+        started = time.monotonic()
+        shard_conns = {}
+        next_order, next_item, pending = {}, {}, {}
+        stack = AsyncExitStack()
+        for shard in shard_keys():
+            shard_conn = conn
+            if shard is not None:
+                shard_conn = await stack.enter_async_context(shard_engines[shard].connect())
+                await shard_conn.exec_driver_sql("PRAGMA synchronous=OFF")
+                await shard_conn.commit()
+            shard_conns[shard] = shard_conn
+            next_order[shard] = max(
+                await _next_id(shard_conn, models.Order),
+                await _next_id(shard_conn, models.ArchivedOrder), # Não reutiliza IDs arquivados
+                (shard or 0) * SHARD_ID_SPAN + 1
+            )
+            next_item[shard] = await _next_id(shard_conn, models.OrderItem)
+            pending[shard] = ([], [])
+        pick_establishment = Picker(rng, establishment_ids, _zipf_cum_weights(len(establishment_ids), args.skew))
+        pick_customer = Picker(rng, customer_ids, _zipf_cum_weights(len(customer_ids), 0.6))
+        pick_hour = Picker(rng, list(range(24)), list(itertools.accumulate(HOUR_WEIGHTS)))
+        pick_payment = Picker(rng, *_cum_weights(PAYMENT_METHODS))
+        pick_items = Picker(rng, *_cum_weights(ITEMS_PER_ORDER))
+        pick_quantity = Picker(rng, *_cum_weights(QUANTITY))
+        pick_past_status = Picker(rng, *_cum_weights(PAST_STATUSES))
+        pick_today_status = Picker(rng, *_cum_weights(TODAY_STATUSES))
+        # Dias do período, com peso pelo dia da semana e leve crescimento até hoje
+        days = [today - timedelta(days=offset) for offset in range(args.days)]
+        pick_day = Picker(rng, days, list(itertools.accumulate(
+            WEEKDAY_WEIGHTS[day.weekday()] * (1.0 - 0.5 * offset / args.days) for offset, day in enumerate(days)
+        )))
+        menu_pickers = {} # Tamanho do cardápio -> pesos acumulados de Zipf (compartilhados)
+
+        written_orders = written_items = 0
+        for _ in range(args.orders):
+            establishment_id = pick_establishment()
+            shard = shard_for_establishment(establishment_id)
+            orders, items = pending[shard]
+            menu = menus[establishment_id]
+            cum_weights = menu_pickers.get(len(menu))
+            if cum_weights is None:
+                cum_weights = menu_pickers[len(menu)] = _zipf_cum_weights(len(menu), args.skew)
+            day = pick_day()
+            order_date = datetime(day.year, day.month, day.day, pick_hour(), rng.randrange(60), rng.randrange(60))
+            if order_date > now: # Hoje, numa hora que ainda não chegou
+                order_date = now - timedelta(minutes=rng.randrange(1, 180))
+            order_status = pick_today_status() if order_date.date() == today else pick_past_status()
+            is_pickup = rng.random() < 0.3
+            total = 0.0
+            for _ in range(pick_items()):
+                product_id, price = menu[bisect.bisect(cum_weights, rng.random() * cum_weights[-1])]
+                quantity = pick_quantity()
+                total += price * quantity
+                items.append({"id": next_item[shard], "order_id": next_order[shard], "product_id": product_id, "quantity": quantity, "price_at_time_of_order": price})
+                next_item[shard] += 1
+            orders.append({
+                "id": next_order[shard],
+                "customer_id": pick_customer(),
+                "establishment_id": establishment_id,
+                "order_date": order_date,
+                "total_amount": round(total, 2),
+                "status": order_status,
+                "delivery_address": None if is_pickup else f"Rua do Cliente, {rng.randint(1, 9999)}",
+                "is_pickup": is_pickup,
+                "payment_method": pick_payment(),
+                # Mesma regra de crud.update_order: preenchido ao sair da fila, exceto no cancelamento
+                "prepared_at": None if order_status in ("pending", "preparing", "cancelled") else order_date + timedelta(minutes=rng.randint(6, 40)),
+            })
+            next_order[shard] += 1
+            if len(orders) >= BATCH_SIZE:
+                await _write_orders(shard_conns[shard], orders, items)
+                written_orders += len(orders)
+                written_items += len(items)
+                pending[shard] = ([], [])
+        for shard, (orders, items) in pending.items():
+            await _write_orders(shard_conns[shard], orders, items)
+            written_orders += len(orders)
+            written_items += len(items)
+        await stack.aclose()
+        _progress("pedidos + itens", written_orders + written_items, started)
+
+    # Dados derivados: índice geográfico e contadores do painel
+    async with engine.begin() as conn:
+        await conn.run_sync(geo.rebuild_index)
+    # A carga não passa pelo CRUD: a reconciliação monta os contadores (sem avisar de cada "divergência")
+    logging.getLogger(stats.__name__).setLevel(logging.ERROR)
+    async with AsyncSessionLocal() as db:
+        await stats.reconcile(db)
+    print(f"Pronto: {written_orders:,} pedidos e {written_items:,} itens. Senha dos usuários gerados: {SEED_PASSWORD}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Preenche o banco com dados sintéticos para testes de carga.")
+    parser.add_argument("--seed", type=int, default=42, help="Semente; a mesma semente gera os mesmos dados")
+    parser.add_argument("--establishments", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=len(CATEGORY_NAMES))
+    parser.add_argument("--products", type=int, default=100_000, help="Total de produtos, divididos entre os estabelecimentos")
+    parser.add_argument("--customers", type=int, default=50_000)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=180, help="Período coberto pelos pedidos, até hoje")
+    parser.add_argument("--skew", type=float, default=1.1, help="Expoente de Zipf da popularidade de estabelecimentos e produtos")
+    args = parser.parse_args()
+    if args.establishments < 1 or args.customers < 1 or args.days < 1:
+        parser.error("--establishments, --customers e --days devem ser pelo menos 1")
+    asyncio.run(seed(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# lanchonete_backend/tests/conftest.py
+
+# O app usa caminhos relativos (sql_app.db, shards/, imagens): os testes rodam num diretório
+# temporário, com um banco vazio, sem tocar no sql_app.db do projeto.
+# Os testes rodam sem sharding; os que usam a fixture `sharded` trocam para SHARDS shards
+# enquanto rodam (ver tests/test_sharding.py).
+import itertools
+import os
+import tempfile
+
+os.environ.pop("LANCHONETE_SHARDS", None)
+os.environ.pop("LANCHONETE_ADMIN_EMAILS", None)
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+PASSWORD = "senha-de-teste"
+SHARDS = 2
+
+_serial = itertools.count(1) # E-mails e nomes de categoria (únicos) entre todos os testes da sessão
+
+def pytest_sessionstart(session):
+    os.chdir(tempfile.mkdtemp(prefix="lanchonete-tests-"))
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def sharded(client):
+    """O app com SHARDS shards (como LANCHONETE_SHARDS=2) durante o teste, sobre o mesmo banco global.
+
+    Os arquivos dos shards ficam no diretório dos testes e são reaproveitados entre os testes.
+    """
+    import main
+    from app import database
+
+    database.configure_shards(SHARDS)
+    client.portal.call(main.create_shard_db_tables)
+    yield database.shard_engines
+    engines = list(database.shard_engines)
+    database.configure_shards(0)
+    for shard_engine in engines:
+        client.portal.call(shard_engine.dispose)
+
+@pytest.fixture
+def make_user(client):
+    """Cria um usuário novo e devolve os cabeçalhos de autenticação dele."""
+    def make(is_owner: bool = False) -> dict:
+        email = f"usuario{next(_serial)}@teste.com"
+        response = client.post("/users/register/", json={"email": email, "password": PASSWORD, "is_owner": is_owner})
+        assert response.status_code == 201, response.text
+        response = client.post("/users/token", data={"username": email, "password": PASSWORD})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return make
+
+@pytest.fixture
+def owner(make_user):
+    return make_user(is_owner=True)
+
+@pytest.fixture
+def customer(make_user):
+    return make_user()
+
+@pytest.fixture
+def establishment(client, owner):
+    response = client.post("/establishments/", json={"name": "Lanchonete", "address": "Rua A, 1", "phone": "11999999999"}, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+@pytest.fixture
+def category(client, owner):
+    response = client.post("/categories/", json={"name": f"Categoria {next(_serial)}"}, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+@pytest.fixture
+def statements(client, monkeypatch):
+    """SQL executado pelas requisições (sem tarefas em segundo plano nem a consulta periódica de invalidações)."""
+    from app import deadlines, invalidation
+    from app.database import all_engines
+
+    monkeypatch.setattr(invalidation, "POLL_INTERVAL", float("inf"))
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if deadlines.current() is not None: # Só as requisições têm Deadline
+            captured.append(" ".join(statement.split()))
+
+    engines = [db_engine.sync_engine for _, db_engine in all_engines()]
+    for db_engine in engines:
+        event.listen(db_engine, "before_cursor_execute", record)
+    yield captured
+    for db_engine in engines:
+        event.remove(db_engine, "before_cursor_execute", record)
@@ -0,0 +1,41 @@
+# lanchonete_backend/tests/test_admin.py
+
+# Rotas de diagnóstico: desligadas sem LANCHONETE_ADMIN_EMAILS, mesmo para proprietários, e sem
+# o monitor do event loop rodando.
+import pytest
+
+from app import profiling
+from app.routers import admin
+
+ADMIN_URLS = ("/admin/jobs/metrics", "/admin/event-loop", "/admin/profile?seconds=0.2")
+
+@pytest.mark.parametrize("url", ADMIN_URLS)
+def test_admin_routes_are_off_by_default(client, owner, url):
+    assert admin.ADMIN_EMAILS == frozenset()
+    response = client.get(url, headers=owner)
+    assert response.status_code == 403, response.text
+    assert client.get(url).status_code == 401
+
+@pytest.mark.parametrize("url", ADMIN_URLS)
+def test_listed_admin_can_use_admin_routes(client, make_user, monkeypatch, url):
+    headers = make_user()
+    email = client.get("/users/me/", headers=headers).json()["email"]
+    monkeypatch.setattr(admin, "ADMIN_EMAILS", frozenset({email}))
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    assert client.get(url, headers=make_user(is_owner=True)).status_code == 403
+
+def test_event_loop_monitor_is_off_without_admins(client, make_user, monkeypatch):
+    # A aplicação dos testes sobe sem LANCHONETE_ADMIN_EMAILS
+    assert profiling._monitor.task is None and profiling._monitor.watchdog is None
+    headers = make_user()
+    monkeypatch.setattr(admin, "ADMIN_EMAILS", frozenset({client.get("/users/me/", headers=headers).json()["email"]}))
+    body = client.get("/admin/event-loop", headers=headers).json()
+    assert (body["monitoring"], body["lag_p50_ms"], body["blocked_total"]) == (False, None, 0)
+
+    client.portal.call(profiling.start)
+    try:
+        assert client.get("/admin/event-loop", headers=headers).json()["monitoring"] is True
+    finally:
+        client.portal.call(profiling.stop)
+    assert profiling._monitor.task is None
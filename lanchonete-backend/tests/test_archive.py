@@ -0,0 +1,79 @@
+# lanchonete_backend/tests/test_archive.py
+
+# Arquivamento: só pedidos que continuam finalizados (e antigos) no momento da escrita saem da
+# tabela quente, mesmo que tenham mudado depois de escolhidos para o lote.
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from app import archive, crud, models, schemas, stats
+from app.database import AsyncSessionLocal
+
+def _old_orders(client, owner, customer, establishment, count):
+    product = client.post("/products/", json={"name": "Pão de queijo", "price": 3.0, "establishment_id": establishment["id"]}, headers=owner).json()
+    ids = []
+    for _ in range(count):
+        order = client.post(
+            "/orders/", json={"establishment_id": establishment["id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 1}]},
+            headers=customer
+        ).json()
+        assert client.put(f"/orders/{order['id']}", json={"status": "delivered"}, headers=owner).status_code == 200
+        ids.append(order["id"])
+
+    async def age():
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(models.Order).where(models.Order.id.in_(ids)).values(order_date=datetime.now() - timedelta(days=400)))
+            await db.commit()
+            await stats.reconcile(db) # A mudança direta de order_date não passa pelos contadores
+
+    client.portal.call(age)
+    return ids
+
+class _ChangedAfterPick:
+    """Sessão que roda `change` logo depois da primeira instrução (a escolha do lote)."""
+
+    def __init__(self, db, change):
+        self._db = db
+        self._change = change
+        self._picked = False
+
+    async def execute(self, *args, **kwargs):
+        result = await self._db.execute(*args, **kwargs)
+        if not self._picked:
+            self._picked = True
+            await self._change()
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+def test_order_reopened_after_pick_stays_hot(client, owner, customer, establishment):
+    order_ids = _old_orders(client, owner, customer, establishment, 3)
+    reopened = order_ids[1]
+
+    async def reopen():
+        async with AsyncSessionLocal() as db:
+            await crud.update_order(db, reopened, schemas.OrderUpdate(status="pending"))
+
+    async def run():
+        cutoff = datetime.now() - timedelta(days=archive.ARCHIVE_AFTER_DAYS)
+        async with AsyncSessionLocal() as db:
+            moved = await archive.archive_batch(_ChangedAfterPick(db, reopen), cutoff)
+        async with AsyncSessionLocal() as db:
+            hot = (await db.execute(select(models.Order.id, models.Order.status).where(models.Order.id.in_(order_ids)))).all()
+            archived = (await db.execute(select(models.ArchivedOrder.id).where(models.ArchivedOrder.id.in_(order_ids)))).scalars().all()
+            hot_items = (await db.execute(
+                select(func.count()).select_from(models.OrderItem).where(models.OrderItem.order_id == reopened)
+            )).scalar()
+            archived_items = (await db.execute(
+                select(func.count()).select_from(models.ArchivedOrderItem).where(models.ArchivedOrderItem.order_id == reopened)
+            )).scalar()
+        return moved, hot, archived, hot_items, archived_items
+
+    moved, hot, archived, hot_items, archived_items = client.portal.call(run)
+    assert moved == 2
+    assert [tuple(row) for row in hot] == [(reopened, "pending")]
+    assert sorted(archived) == [order_ids[0], order_ids[2]]
+    assert (hot_items, archived_items) == (1, 0)
+    # Os arquivados continuam legíveis pelo ID
+    assert client.get(f"/orders/{order_ids[0]}", headers=owner).json()["status"] == "delivered"
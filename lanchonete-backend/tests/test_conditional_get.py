@@ -0,0 +1,87 @@
+# lanchonete_backend/tests/test_conditional_get.py
+
+# GET condicional: cada escrita que muda a resposta de um recurso precisa mudar o ETag dele,
+# senão o cliente continua recebendo 304 com a cópia antiga.
+import io
+
+import pytest
+from PIL import Image
+
+@pytest.fixture
+def product(client, owner, establishment):
+    response = client.post("/products/", json={"name": "X-Burguer", "price": 20.0, "establishment_id": establishment["id"]}, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _cached_etag(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.text
+    etag = response.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": response.headers["last-modified"]}).status_code == 304
+    return etag
+
+def _assert_invalidated(client, url, etag, expected_status=200):
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == expected_status, response.text
+    if expected_status == 200:
+        assert response.headers["etag"] != etag
+    return response
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_product_update(client, owner, product):
+    url = f"/products/{product['id']}"
+    etag = _cached_etag(client, url)
+    assert client.put(url, json={"price": 22.5}, headers=owner).status_code == 200
+    assert _assert_invalidated(client, url, etag).json()["price"] == 22.5
+
+def test_product_image_upload(client, owner, product):
+    url = f"/products/{product['id']}"
+    etag = _cached_etag(client, url)
+    response = client.post(f"{url}/image", files={"file": ("lanche.png", _png(), "image/png")}, headers=owner)
+    assert response.status_code == 200, response.text
+    assert _assert_invalidated(client, url, etag).json()["image_variants"]
+
+def test_product_delete(client, owner, product):
+    url = f"/products/{product['id']}"
+    etag = _cached_etag(client, url)
+    assert client.delete(url, headers=owner).status_code == 200
+    _assert_invalidated(client, url, etag, expected_status=404)
+
+def test_category_delete_changes_its_products(client, owner, establishment, category):
+    response = client.post(
+        "/products/", json={"name": "Suco", "price": 8.0, "establishment_id": establishment["id"], "category_id": category["id"]}, headers=owner
+    )
+    url = f"/products/{response.json()['id']}"
+    etag = _cached_etag(client, url)
+    assert client.delete(f"/categories/{category['id']}", headers=owner).status_code == 200
+    assert _assert_invalidated(client, url, etag).json()["category_id"] is None
+
+def test_establishment_update(client, owner, establishment):
+    url = f"/establishments/{establishment['id']}"
+    etag = _cached_etag(client, url)
+    response = client.put(url, json={"name": "Lanchonete 2", "address": "Rua B, 2", "phone": "11988888888"}, headers=owner)
+    assert response.status_code == 200, response.text
+    assert _assert_invalidated(client, url, etag).json()["name"] == "Lanchonete 2"
+
+def test_establishment_delete(client, owner, establishment):
+    url = f"/establishments/{establishment['id']}"
+    etag = _cached_etag(client, url)
+    assert client.delete(url, headers=owner).status_code == 200
+    _assert_invalidated(client, url, etag, expected_status=404)
+
+def test_category_update(client, owner, category):
+    url = f"/categories/{category['id']}"
+    etag = _cached_etag(client, url)
+    assert client.put(url, json={"name": category["name"] + " (nova)"}, headers=owner).status_code == 200
+    assert _assert_invalidated(client, url, etag).json()["name"] == category["name"] + " (nova)"
+
+def test_category_delete(client, owner, category):
+    url = f"/categories/{category['id']}"
+    etag = _cached_etag(client, url)
+    assert client.delete(url, headers=owner).status_code == 200
+    _assert_invalidated(client, url, etag, expected_status=404)
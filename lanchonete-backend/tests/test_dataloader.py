@@ -0,0 +1,96 @@
+# lanchonete_backend/tests/test_dataloader.py
+
+# Buscas por ID agrupadas (crud.DataLoader) e os endpoints ?ids=: N buscas viram um único
+# SELECT ... IN, na ordem pedida e sem os IDs inexistentes; o cache vive até o commit/rollback.
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, models
+from app.database import AsyncSessionLocal, engine
+
+@pytest.fixture
+def products(client, owner, establishment):
+    return [
+        client.post("/products/", json={"name": f"Lanche {n}", "price": 10.0 + n, "establishment_id": establishment["id"]}, headers=owner).json()
+        for n in range(3)
+    ]
+
+@pytest.fixture
+def selects():
+    """SELECTs executados fora das requisições (as buscas feitas direto pelo teste)."""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT"):
+            captured.append(" ".join(statement.split()))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield captured
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+def _from(table: str, statements):
+    return [statement for statement in statements if f"FROM {table}" in statement]
+
+def test_ids_endpoint_is_one_select_in_the_requested_order(client, products, statements):
+    first, second, third = (product["id"] for product in products)
+    statements.clear()
+    response = client.get(f"/products/?ids={third},999999,{first},{third},{second}")
+    assert response.status_code == 200, response.text
+    # Inexistentes omitidos, repetidos uma vez só, na ordem pedida
+    assert [product["id"] for product in response.json()] == [third, first, second]
+    assert len(_from("products", statements)) == 1, statements
+
+def test_ids_endpoints_of_establishments_and_categories(client, owner, establishment, category, statements):
+    statements.clear()
+    response = client.get(f"/establishments/?ids=999999,{establishment['id']}", headers=owner)
+    assert [item["id"] for item in response.json()] == [establishment["id"]]
+    response = client.get(f"/categories/?ids={category['id']},999999")
+    assert [item["id"] for item in response.json()] == [category["id"]]
+    assert len(_from("establishments", statements)) == 1
+    assert len(_from("categories", statements)) == 1
+
+@pytest.mark.parametrize("ids", [
+    ",".join(str(n) for n in range(1, crud.MAX_BATCH_IDS + 2)), # Um além do limite
+    "1,dois,3",
+    "1;2",
+])
+def test_invalid_ids_are_rejected(client, ids):
+    response = client.get(f"/products/?ids={ids}")
+    assert response.status_code == 400, response.text
+
+def test_parse_ids():
+    assert crud.parse_ids("3, 1,,3, 2,") == [3, 1, 2]
+    assert crud.parse_ids("") == []
+    assert len(crud.parse_ids(",".join(str(n) for n in range(crud.MAX_BATCH_IDS)))) == crud.MAX_BATCH_IDS
+
+def test_concurrent_lookups_share_one_query(client, products, selects):
+    ids = [product["id"] for product in products]
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            found = await asyncio.gather(*(crud.get_product(db, obj_id) for obj_id in [ids[2], 999999, ids[0], ids[1]]))
+            queried = len(_from("products", selects))
+            again = await crud.get_product(db, ids[0]) # Já carregado nesta sessão
+            return found, queried, again, len(_from("products", selects))
+
+    found, queried, again, total = client.portal.call(run)
+    assert [product.id if product else None for product in found] == [ids[2], None, ids[0], ids[1]]
+    assert (queried, total) == (1, 1)
+    assert again is found[2]
+
+@pytest.mark.parametrize("end", ["commit", "rollback"])
+def test_cache_is_dropped_at_the_end_of_the_transaction(client, products, selects, end):
+    product_id = products[0]["id"]
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            await crud.get_product(db, product_id)
+            await getattr(db, end)()
+            assert crud._LOADER_KEY not in db.info
+            reloaded = await crud.get_product(db, product_id)
+            assert isinstance(reloaded, models.Product)
+
+    client.portal.call(run)
+    assert len(_from("products", selects)) == 2
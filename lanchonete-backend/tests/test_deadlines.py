@@ -0,0 +1,91 @@
+# lanchonete_backend/tests/test_deadlines.py
+
+# Prazos no SQLite e cancelamento de requisições (prazo esgotado ou cliente desconectado): a
+# conexão já nasce com busy_timeout e progress handler, e o commit de um pedido e a atualização da
+# fila da cozinha terminam juntos, mesmo que o cancelamento chegue no meio do commit.
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import event, select, text
+from sqlalchemy.exc import OperationalError
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app import crud, deadlines, models, schemas
+from app.database import AsyncSessionLocal, engine
+from app.kitchen import kitchen_queue
+
+def test_shielded_finishes_before_cancelling():
+    steps = []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        steps.append("terminou")
+        return "ok"
+
+    async def run():
+        task = asyncio.create_task(deadlines.shielded(work()))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert steps == ["terminou"]
+        assert await deadlines.shielded(work()) == "ok"
+
+    asyncio.run(run())
+
+def test_middlewares_cancel_only_once(client):
+    # BaseHTTPMiddleware (@app.middleware("http")) cancela de novo cada await depois de um
+    # cancelamento, e a limpeza do SQLAlchemy deixa a conexão fora do pool
+    import main
+    assert not [middleware for middleware in main.app.user_middleware if middleware.cls is BaseHTTPMiddleware]
+
+def test_connection_applies_busy_timeout_and_deadline(client):
+    count_up = text("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) SELECT count(*) FROM c")
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            busy_timeout = (await db.execute(text("PRAGMA busy_timeout"))).scalar()
+        token = deadlines._current.set(deadlines.Deadline(time.monotonic(), 0.2))
+        try:
+            started = time.monotonic()
+            async with AsyncSessionLocal() as db:
+                with pytest.raises(OperationalError, match="interrupted"):
+                    await db.execute(count_up)
+            return busy_timeout, time.monotonic() - started
+        finally:
+            deadlines._current.reset(token)
+
+    busy_timeout, elapsed = client.portal.call(run)
+    assert busy_timeout == deadlines.BUSY_TIMEOUT_MS
+    assert elapsed < 2
+
+def test_order_cancelled_during_commit_reaches_the_queue(client, owner, customer, establishment):
+    product = client.post("/products/", json={"name": "Coxinha", "price": 6.0, "establishment_id": establishment["id"]}, headers=owner).json()
+    customer_id = client.get("/users/me/", headers=customer).json()["id"]
+    assert client.get("/orders/queue", headers=owner).status_code == 200 # Fila carregada na memória
+
+    async def run():
+        async def place():
+            order = schemas.OrderCreate(
+                establishment_id=establishment["id"], payment_method="pix", is_pickup=True,
+                items=[{"product_id": product["id"], "quantity": 1}]
+            )
+            async with AsyncSessionLocal() as db:
+                await crud.create_order(db, order, customer_id)
+
+        request = asyncio.create_task(place())
+        # Como o DeadlineMiddleware: a tarefa da requisição é cancelada enquanto o COMMIT roda
+        event.listen(engine.sync_engine, "commit", lambda conn: request.cancel(), once=True)
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(
+                select(models.Order.id).where(models.Order.establishment_id == establishment["id"])
+            )).scalars().all()
+
+    stored = client.portal.call(run)
+    assert len(stored) == 1
+    assert list(kitchen_queue._queue(establishment["id"]).orders) == stored
+    queue = client.get("/orders/queue", headers=owner).json()
+    assert [order["id"] for order in queue["orders"]] == stored
@@ -0,0 +1,101 @@
+# lanchonete_backend/tests/test_images.py
+
+# Imagens de produtos (app/images.py): limites do upload, originais gravados pelo SHA-256 do
+# conteúdo (sem duplicatas), miniaturas WebP de 96/320/640 px geradas fora do event loop ou sob
+# demanda, e servidas com cache "immutable" e suporte a Range.
+import hashlib
+import io
+import os
+import random
+
+import pytest
+from PIL import Image
+
+from app import images
+
+@pytest.fixture
+def product(client, owner, establishment):
+    response = client.post("/products/", json={"name": "X-Tudo", "price": 25.0, "establishment_id": establishment["id"]}, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _photo(seed: int, size=(1200, 600)) -> bytes:
+    """PNG com ruído (não comprime a quase nada), com o lado maior acima da maior miniatura."""
+    rng = random.Random(seed)
+    image = Image.frombytes("RGB", size, bytes(rng.getrandbits(8) for _ in range(size[0] * size[1] * 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _upload(client, owner, product, data: bytes, filename: str = "lanche.png"):
+    return client.post(f"/products/{product['id']}/image", files={"file": (filename, data, "image/png")}, headers=owner)
+
+def test_upload_limits(client, owner, product):
+    too_big = b"\x89PNG\r\n\x1a\n" + b"\0" * images.MAX_UPLOAD_BYTES
+    assert _upload(client, owner, product, too_big).status_code == 413
+    assert _upload(client, owner, product, b"GIF89a" + b"\0" * 100, "lanche.gif").status_code == 415
+    assert _upload(client, owner, product, b"%PDF-1.4 lanche.png").status_code == 415
+    # Nada foi gravado nem apontado no produto
+    assert client.get(f"/products/{product['id']}").json()["image_url"] is None
+
+def test_upload_stores_by_digest_and_renders_variants(client, owner, establishment, product):
+    data = _photo(1)
+    digest = hashlib.sha256(data).hexdigest()
+    response = _upload(client, owner, product, data)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["image_url"] == f"/products/images/{digest}/{images.LIST_THUMBNAIL_SIZE}.webp"
+    assert body["image_variants"] == {str(size): f"/products/images/{digest}/{size}.webp" for size in (96, 320, 640)}
+
+    with open(images.original_path(digest), "rb") as original:
+        assert original.read() == data
+    # As miniaturas são geradas em segundo plano, depois da resposta: espera a geração em andamento
+    assert client.portal.call(images.generate_thumbnails, digest)
+    for size in images.THUMBNAIL_SIZES:
+        with Image.open(images.thumbnail_path(digest, size)) as thumbnail:
+            assert thumbnail.format == "WEBP"
+            assert thumbnail.size == (size, size // 2) # Proporção do original (2:1) mantida
+
+    # O mesmo arquivo em outro produto: mesma URL, original gravado uma vez só
+    stored = os.stat(images.original_path(digest))
+    other = client.post("/products/", json={"name": "X-Bacon", "price": 27.0, "establishment_id": establishment["id"]}, headers=owner).json()
+    assert _upload(client, owner, other, data, "outro-nome.png").json()["image_url"] == body["image_url"]
+    assert os.stat(images.original_path(digest)).st_mtime_ns == stored.st_mtime_ns
+    assert os.listdir(os.path.dirname(images.original_path(digest))).count(digest) == 1
+
+def test_thumbnail_is_served_immutable_with_range(client, owner, product):
+    data = _photo(2)
+    digest = hashlib.sha256(data).hexdigest()
+    url = _upload(client, owner, product, data).json()["image_variants"]["640"]
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["cache-control"] == images.IMMUTABLE_CACHE_CONTROL
+    with open(images.thumbnail_path(digest, 640), "rb") as thumbnail:
+        assert response.content == thumbnail.read()
+
+    partial = client.get(url, headers={"Range": "bytes=10-109"})
+    assert partial.status_code == 206
+    assert partial.content == response.content[10:110]
+    assert partial.headers["content-range"] == f"bytes 10-109/{len(response.content)}"
+    assert partial.headers["cache-control"] == images.IMMUTABLE_CACHE_CONTROL
+
+def test_missing_variant_is_rendered_on_demand(client, owner, product):
+    data = _photo(3)
+    digest = hashlib.sha256(data).hexdigest()
+    _upload(client, owner, product, data)
+    assert client.portal.call(images.generate_thumbnails, digest)
+    os.remove(images.thumbnail_path(digest, 96))
+
+    response = client.get(f"/products/images/{digest}/96.webp")
+    assert response.status_code == 200
+    assert os.path.exists(images.thumbnail_path(digest, 96))
+    with Image.open(io.BytesIO(response.content)) as thumbnail:
+        assert max(thumbnail.size) == 96
+
+def test_unknown_images_are_not_found(client):
+    unknown = hashlib.sha256(b"nunca enviado").hexdigest()
+    assert client.get(f"/products/images/{unknown}/320.webp").status_code == 404 # Sem original
+    assert client.get(f"/products/images/{unknown}/200.webp").status_code == 404 # Tamanho fora da lista
+    assert client.get("/products/images/..%2F..%2Fsql_app.db/320.webp").status_code == 404
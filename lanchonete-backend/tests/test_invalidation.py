@@ -0,0 +1,83 @@
+# lanchonete_backend/tests/test_invalidation.py
+
+# Invalidação entre processos: um segundo processo (outro worker, com o próprio engine) precisa
+# ver as gravações deste em até POLL_INTERVAL, e vice-versa.
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app import invalidation
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARGIN = 1.0 # Segundos de folga para o agendamento dos dois processos
+
+# Outro worker: assina o canal, consulta como se atendesse requisições a cada 10 ms e informa
+# quando recebeu a invalidação
+READER = """
+import asyncio, sys, time
+from app import invalidation
+
+async def main():
+    await invalidation.init()
+    seen = []
+    invalidation.subscribe(sys.argv[1], lambda channel: seen.append(time.time()))
+    print("ready", flush=True)
+    stop_at = time.monotonic() + float(sys.argv[2])
+    while not seen and time.monotonic() < stop_at:
+        await invalidation.poll()
+        await asyncio.sleep(0.01)
+    print(seen[0] if seen else "timeout", flush=True)
+
+asyncio.run(main())
+"""
+
+# Outro worker gravando: altera o estabelecimento direto pelo CRUD
+WRITER = """
+import asyncio, sys
+from app import crud, schemas
+from app.database import AsyncSessionLocal
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        await crud.update_establishment(
+            db, int(sys.argv[1]), schemas.EstablishmentCreate(name=sys.argv[2], address="Rua A, 1", phone="11999999999")
+        )
+
+asyncio.run(main())
+"""
+
+def _spawn(code: str, *args: str) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    return subprocess.Popen(
+        [sys.executable, "-c", code, *args], cwd=os.getcwd(), env=env, stdout=subprocess.PIPE, text=True
+    )
+
+def test_other_process_sees_write_within_poll_interval(client, owner):
+    category = client.post("/categories/", json={"name": "Bebidas"}, headers=owner).json()
+    reader = _spawn(READER, "categories", str(invalidation.POLL_INTERVAL + 10))
+    try:
+        assert reader.stdout.readline().strip() == "ready"
+        written_at = time.time()
+        response = client.put(f"/categories/{category['id']}", json={"name": "Sucos"}, headers=owner)
+        assert response.status_code == 200, response.text
+        seen = reader.stdout.readline().strip()
+    finally:
+        reader.wait(timeout=30)
+    assert seen != "timeout"
+    assert float(seen) - written_at <= invalidation.POLL_INTERVAL + MARGIN
+
+def test_write_from_other_process_reaches_cached_storefront(client, establishment):
+    url = f"/establishments/{establishment['id']}/storefront"
+    assert client.get(url).json()["establishment"]["name"] == "Lanchonete" # Vitrine em cache neste processo
+    writer = _spawn(WRITER, str(establishment["id"]), "Lanchonete Nova")
+    assert writer.wait(timeout=30) == 0
+    written_at = time.monotonic()
+    while time.monotonic() - written_at <= invalidation.POLL_INTERVAL + MARGIN:
+        if client.get(url).json()["establishment"]["name"] == "Lanchonete Nova":
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("vitrine não foi invalidada dentro de POLL_INTERVAL")
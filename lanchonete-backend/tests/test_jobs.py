@@ -0,0 +1,199 @@
+# lanchonete_backend/tests/test_jobs.py
+
+# Fila durável de jobs (app/jobs.py): o job nasce na transação do pedido, é reivindicado por um
+# único UPDATE ... RETURNING, volta para a fila quando o lease expira, é repetido com espera
+# exponencial até max_attempts e, no shutdown, os que não terminam a tempo voltam para a fila.
+# O worker do app fica parado nestes testes (fixture `worker`): cada teste usa tipos de job
+# próprios e conduz a fila diretamente.
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, select, update
+
+from app import jobs, models
+from app.database import AsyncSessionLocal, engine
+
+@pytest.fixture
+def worker(client, monkeypatch):
+    """Para o worker do app; handlers registrados no teste são descartados no fim."""
+    client.portal.call(jobs.stop)
+    monkeypatch.setattr(jobs, "_handlers", dict(jobs._handlers))
+    monkeypatch.setattr(jobs, "_stats", dict(jobs._stats))
+    yield
+    client.portal.call(jobs.stop)
+    monkeypatch.undo()
+    client.portal.call(jobs.start)
+
+async def _enqueue(job_type: str, *payloads: dict):
+    async with AsyncSessionLocal() as db:
+        queued = [jobs.enqueue(db, job_type, payload) for payload in payloads]
+        await db.commit()
+        return [job.id for job in queued]
+
+async def _claim(job_type: str, limit: int = 10):
+    async with AsyncSessionLocal() as db:
+        return await jobs._claim(db, job_type, limit)
+
+async def _jobs(job_type: str):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(models.Job).where(models.Job.job_type == job_type).order_by(models.Job.id))).scalars().all()
+
+async def _set(job_id: int, **values):
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(models.Job).where(models.Job.id == job_id).values(**values))
+        await db.commit()
+
+async def _order_jobs():
+    async with AsyncSessionLocal() as db:
+        return [job.payload["order_id"] for job in (await db.execute(select(models.Job).where(models.Job.job_type == "order_created"))).scalars()]
+
+def test_job_is_written_with_the_order(client, worker, owner, customer, establishment):
+    product = client.post("/products/", json={"name": "Pastel", "price": 7.0, "establishment_id": establishment["id"], "stock": 1}, headers=owner).json()
+    order = {"establishment_id": establishment["id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 1}]}
+
+    created = client.post("/orders/", json=order, headers=customer)
+    assert created.status_code == 201, created.text
+    before = client.portal.call(_order_jobs)
+    assert created.json()["id"] in before
+    # Sem estoque, o pedido é desfeito depois do enqueue: o job vai junto
+    assert client.post("/orders/", json=order, headers=customer).status_code == 409
+    assert client.portal.call(_order_jobs) == before
+
+def test_claim_takes_each_job_once_with_update_returning(client, worker):
+    ids = client.portal.call(_enqueue, "teste_reivindicacao", *({"n": n} for n in range(5)))
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(" ".join(statement.split()))
+
+    async def two_workers():
+        return await asyncio.gather(_claim("teste_reivindicacao", 3), _claim("teste_reivindicacao", 3))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        first, second = client.portal.call(two_workers)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    claimed = [row.id for row in first] + [row.id for row in second]
+    assert sorted(claimed) == ids # Cada job uma vez, entre os dois
+    assert {row.attempts for row in first + second} == {1}
+    assert {row.id: row.payload["n"] for row in first + second} == {job_id: n for n, job_id in enumerate(ids)}
+    claims = [statement for statement in statements if statement.startswith("UPDATE jobs")]
+    assert len(claims) == 2 and all("RETURNING" in statement for statement in claims)
+    assert not any(statement.startswith("SELECT") and "FROM jobs" in statement for statement in statements)
+
+    stored = client.portal.call(_jobs, "teste_reivindicacao")
+    assert {(job.status, job.locked_by) for job in stored} == {("running", jobs.WORKER_ID)}
+    assert client.portal.call(_claim, "teste_reivindicacao") == []
+
+def test_expired_lease_is_reclaimed_and_the_old_result_ignored(client, worker):
+    [job_id] = client.portal.call(_enqueue, "teste_lease", {})
+    assert [row.id for row in client.portal.call(_claim, "teste_lease")] == [job_id]
+    # Dentro do lease o job não é entregue de novo
+    assert client.portal.call(_claim, "teste_lease") == []
+
+    # Outro worker pegou o job e caiu: o lease expira e este worker o reivindica (2ª tentativa)
+    client.portal.call(lambda: _set(job_id, locked_by="outro:1", locked_at=datetime.now() - timedelta(seconds=jobs.LEASE_SECONDS + 1)))
+    [row] = client.portal.call(_claim, "teste_lease")
+    assert (row.id, row.attempts) == (job_id, 2)
+    assert client.portal.call(_jobs, "teste_lease")[0].locked_by == jobs.WORKER_ID
+
+    # O worker antigo, se voltar, não sobrescreve o resultado do job que já não é dele
+    client.portal.call(lambda: _set(job_id, locked_by="outro:2"))
+    client.portal.call(lambda: jobs._finish(None, job_id, status="done", finished_at=datetime.now()))
+    job = client.portal.call(_jobs, "teste_lease")[0]
+    assert (job.status, job.locked_by) == ("running", "outro:2")
+
+def test_retry_delay_backs_off_with_jitter(monkeypatch):
+    for attempts, base in ((1, 2.0), (2, 4.0), (3, 8.0), (20, jobs.RETRY_MAX_SECONDS)):
+        delays = {jobs._retry_delay(attempts) for _ in range(50)}
+        assert all(0.8 * base <= delay <= 1.2 * base for delay in delays)
+        assert len(delays) > 1 # Jobs que falham juntos não voltam juntos
+    monkeypatch.setattr(jobs.random, "uniform", lambda low, high: high)
+    assert jobs._retry_delay(3) == pytest.approx(9.6)
+
+def test_failing_handler_is_retried_up_to_max_attempts(client, worker):
+    calls = []
+
+    @jobs.handler("teste_falha", max_attempts=3)
+    async def fail(payload):
+        calls.append(payload)
+        raise ValueError("sem conexão com a impressora")
+
+    [job_id] = client.portal.call(_enqueue, "teste_falha", {"order_id": 1})
+
+    def run_once():
+        [row] = client.portal.call(_claim, "teste_falha")
+        client.portal.call(jobs._execute, "teste_falha", row, None)
+        return client.portal.call(_jobs, "teste_falha")[0]
+
+    for attempt in (1, 2):
+        started = datetime.now()
+        job = run_once()
+        assert (job.status, job.attempts, job.locked_at) == ("pending", attempt, None)
+        assert job.last_error == "ValueError: sem conexão com a impressora"
+        # Espera exponencial com jitter antes da próxima tentativa
+        base = jobs.RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+        assert started + timedelta(seconds=0.8 * base) <= job.run_at <= datetime.now() + timedelta(seconds=1.2 * base)
+        assert client.portal.call(_claim, "teste_falha") == [] # Ainda não está pronto
+        client.portal.call(lambda: _set(job_id, run_at=datetime.now()))
+
+    job = run_once()
+    assert (job.status, job.attempts) == ("failed", 3)
+    assert job.finished_at is not None
+    assert calls == [{"order_id": 1}] * 3
+    stats = jobs._stats["teste_falha"]
+    assert (stats.completed, stats.retried, stats.failed) == (0, 2, 1)
+    assert client.portal.call(_claim, "teste_falha") == []
+
+def test_stop_drains_running_jobs_and_requeues_the_rest(client, worker):
+    stuck = asyncio.Event() # Nunca é liberado
+
+    @jobs.handler("teste_shutdown", concurrency=2)
+    async def work(payload):
+        if payload["stuck"]:
+            await stuck.wait()
+        else:
+            await asyncio.sleep(0.2)
+
+    quick, slow = client.portal.call(_enqueue, "teste_shutdown", {"stuck": False}, {"stuck": True})
+
+    async def run_and_stop():
+        jobs.start()
+        for _ in range(100):
+            if jobs._stats["teste_shutdown"].running == 2:
+                break
+            await asyncio.sleep(0.05)
+        assert jobs._stats["teste_shutdown"].running == 2
+        await jobs.stop(timeout=1.0)
+
+    client.portal.call(run_and_stop)
+    finished = {job.id: job for job in client.portal.call(_jobs, "teste_shutdown")}
+    assert finished[quick].status == "done"
+    # O interrompido volta para a fila sem gastar a tentativa
+    assert (finished[slow].status, finished[slow].attempts, finished[slow].locked_by) == ("pending", 0, None)
+    assert jobs._stats["teste_shutdown"].running == 0
+
+def test_metrics_report_depth_and_latencies(client, worker):
+    @jobs.handler("teste_metricas")
+    async def work(payload):
+        await asyncio.sleep(0.01)
+
+    client.portal.call(_enqueue, "teste_metricas", *({} for _ in range(4)))
+    for row in client.portal.call(_claim, "teste_metricas", 2):
+        client.portal.call(jobs._execute, "teste_metricas", row, None)
+    client.portal.call(_claim, "teste_metricas", 1) # Fica "running"
+
+    async def read():
+        async with AsyncSessionLocal() as db:
+            return await jobs.metrics(db)
+
+    report = client.portal.call(read)
+    assert report["worker_id"] == jobs.WORKER_ID
+    [entry] = [entry for entry in report["types"] if entry["job_type"] == "teste_metricas"]
+    assert (entry["pending"], entry["running"], entry["failed"]) == (1, 1, 0)
+    assert entry["oldest_ready_seconds"] >= 0
+    assert (entry["completed_here"], entry["retried_here"], entry["failed_here"]) == (2, 0, 0)
+    assert 10 <= entry["run_p50_ms"] <= entry["run_p95_ms"]
+    assert 0 <= entry["wait_p50_ms"] <= entry["wait_p95_ms"]
@@ -0,0 +1,132 @@
+# lanchonete_backend/tests/test_kitchen.py
+
+# Fila de cozinha (GET /orders/queue, app/kitchen.py): pedidos ativos em ordem de chegada, filtro
+# por status, previsão de pronto que considera os pedidos à frente, estimativa pela mediana dos
+# últimos RECENT_PREPARATIONS preparos e recarga quando outro processo grava um pedido.
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import invalidation, kitchen, models, stats
+from app.database import AsyncSessionLocal
+from app.kitchen import kitchen_queue
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Outro worker mudando o status de um pedido direto pelo CRUD
+WRITER = """
+import asyncio, sys
+from app import crud, schemas
+from app.database import AsyncSessionLocal
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        await crud.update_order(db, int(sys.argv[1]), schemas.OrderUpdate(status=sys.argv[2]))
+
+asyncio.run(main())
+"""
+
+@pytest.fixture
+def product(client, owner, establishment):
+    response = client.post("/products/", json={"name": "X-Salada", "price": 18.0, "establishment_id": establishment["id"]}, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _order(client, customer, product):
+    response = client.post(
+        "/orders/", json={"establishment_id": product["establishment_id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 2}]},
+        headers=customer
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _queue(client, owner, query: str = ""):
+    response = client.get(f"/orders/queue{query}", headers=owner)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def _ready_at(entry) -> datetime:
+    return datetime.fromisoformat(entry["estimated_ready_at"])
+
+def test_queue_lists_active_orders_in_arrival_order(client, owner, customer, product):
+    first, second, third, done = (_order(client, customer, product)["id"] for _ in range(4))
+    assert client.put(f"/orders/{second}", json={"status": "preparing"}, headers=owner).status_code == 200
+    assert client.put(f"/orders/{done}", json={"status": "delivered"}, headers=owner).status_code == 200
+
+    queue = _queue(client, owner)
+    assert [(entry["id"], entry["status"]) for entry in queue["orders"]] == [(first, "pending"), (second, "preparing"), (third, "pending")]
+    assert queue["orders"][0]["items"] == [{"product_id": product["id"], "quantity": 2}]
+    assert [entry["id"] for entry in _queue(client, owner, "?status=pending")["orders"]] == [first, third]
+    assert [entry["id"] for entry in _queue(client, owner, "?status=preparing&status=pending")["orders"]] == [first, second, third]
+
+def test_queue_rejects_other_statuses_and_customers(client, owner, customer, establishment):
+    assert client.get("/orders/queue?status=delivered", headers=owner).status_code == 400
+    assert client.get("/orders/queue", headers=customer).status_code == 403
+
+def test_ready_estimate_waits_for_the_orders_ahead(client, owner, customer, product):
+    before = datetime.now()
+    ids = [_order(client, customer, product)["id"] for _ in range(3)]
+    assert client.put(f"/orders/{ids[1]}", json={"status": "preparing"}, headers=owner).status_code == 200
+
+    queue = _queue(client, owner)
+    assert queue["estimated_preparation_minutes"] == kitchen.DEFAULT_PREPARATION_TIME.total_seconds() / 60 # Sem histórico
+    step = kitchen.DEFAULT_PREPARATION_TIME
+    ready = [_ready_at(entry) for entry in queue["orders"]]
+    # Pedidos feitos quase juntos: cada um espera o anterior
+    assert before + step <= ready[0] <= datetime.now() + step
+    assert [later - earlier for earlier, later in zip(ready, ready[1:])] == [step, step]
+    # Com filtro, a previsão ainda conta os pedidos de fora à frente
+    [filtered] = _queue(client, owner, "?status=preparing")["orders"]
+    assert (filtered["id"], _ready_at(filtered)) == (ids[1], ready[1])
+
+def test_ready_estimate_is_never_in_the_past(client, owner, customer, product):
+    ids = [_order(client, customer, product)["id"] for _ in range(2)]
+
+    async def age_first():
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(models.Order).where(models.Order.id == ids[0]).values(order_date=datetime.now() - timedelta(hours=1)))
+            await db.commit()
+            await stats.reconcile(db) # A mudança direta de order_date não passa pelos contadores
+            await kitchen_queue.load(db, product["establishment_id"])
+
+    client.portal.call(age_first)
+    before = datetime.now()
+    first, second = (_ready_at(entry) for entry in _queue(client, owner)["orders"])
+    # O atrasado fica pronto "agora" e ainda segura o seguinte
+    assert before <= first <= datetime.now()
+    assert second - first == kitchen.DEFAULT_PREPARATION_TIME
+
+def test_preparation_estimate_is_the_median_of_recent_preparations(client, owner, customer, product):
+    total = kitchen.RECENT_PREPARATIONS + 10
+    ids = [_order(client, customer, product)["id"] for _ in range(total)]
+    for order_id in ids:
+        assert client.put(f"/orders/{order_id}", json={"status": "ready"}, headers=owner).status_code == 200
+
+    async def prepared_in_minutes():
+        # O k-ésimo pedido levou k minutos; os últimos RECENT_PREPARATIONS entram na estimativa
+        async with AsyncSessionLocal() as db:
+            for minutes, order_id in enumerate(ids, start=1):
+                order = await db.get(models.Order, order_id)
+                order.prepared_at = order.order_date + timedelta(minutes=minutes)
+            await db.commit()
+            await kitchen_queue.load(db, product["establishment_id"])
+
+    client.portal.call(prepared_in_minutes)
+    recent = range(total - kitchen.RECENT_PREPARATIONS + 1, total + 1)
+    assert _queue(client, owner)["estimated_preparation_minutes"] == (recent[0] + recent[-1]) / 2
+
+def test_write_from_another_process_reloads_the_queue(client, owner, customer, product):
+    order_id = _order(client, customer, product)["id"]
+    establishment_id = product["establishment_id"]
+    assert [entry["status"] for entry in _queue(client, owner)["orders"]] == ["pending"]
+
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    subprocess.run([sys.executable, "-c", WRITER, str(order_id), "preparing"], cwd=os.getcwd(), env=env, check=True)
+    client.portal.call(invalidation.poll, True)
+    assert establishment_id in kitchen_queue._stale
+    assert [entry["status"] for entry in _queue(client, owner)["orders"]] == ["preparing"]
+    assert establishment_id not in kitchen_queue._stale
@@ -0,0 +1,111 @@
+# lanchonete_backend/tests/test_order_search.py
+
+# Busca de pedidos (GET /orders/ e /orders/page com filtros): status, período, forma de pagamento
+# e retirada, as ordenações, e a paginação que continua dos pedidos da tabela quente para os
+# arquivados (app/archive.py) sem pular nem repetir pedidos.
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import archive, models, stats
+from app.database import AsyncSessionLocal
+
+# nome: (quantidade a R$ 10, pagamento, retirada, status, idade)
+HISTORY = {
+    "old_1": (5, "pix", False, "delivered", timedelta(days=400)),
+    "old_2": (2, "cash", True, "delivered", timedelta(days=401)),
+    "old_3": (7, "pix", False, "cancelled", timedelta(days=402)),
+    "live_1": (3, "pix", True, "delivered", timedelta(days=3)),
+    "live_2": (1, "cash", False, "pending", timedelta(days=2)),
+    "live_3": (4, "pix", False, "preparing", timedelta(days=1)),
+    "live_4": (6, "card", True, "cancelled", timedelta(hours=1)),
+}
+# Do mais recente para o mais antigo
+BY_DATE = ["live_4", "live_3", "live_2", "live_1", "old_1", "old_2", "old_3"]
+
+@pytest.fixture
+def history(client, owner, customer, establishment):
+    """Os pedidos de HISTORY no estabelecimento, os "old_*" já arquivados. Devolve nome -> ID."""
+    product = client.post("/products/", json={"name": "Marmita", "price": 10.0, "establishment_id": establishment["id"]}, headers=owner).json()
+    ids = {}
+    for name, (quantity, payment_method, is_pickup, status, _) in HISTORY.items():
+        response = client.post("/orders/", json={
+            "establishment_id": establishment["id"], "payment_method": payment_method, "is_pickup": is_pickup,
+            "items": [{"product_id": product["id"], "quantity": quantity}],
+        }, headers=customer)
+        assert response.status_code == 201, response.text
+        ids[name] = response.json()["id"]
+        if status != "pending":
+            assert client.put(f"/orders/{ids[name]}", json={"status": status}, headers=owner).status_code == 200
+
+    async def backdate_and_archive():
+        now = datetime.now()
+        async with AsyncSessionLocal() as db:
+            for name, (*_, age) in HISTORY.items():
+                await db.execute(update(models.Order).where(models.Order.id == ids[name]).values(order_date=now - age))
+            await db.commit()
+            await stats.reconcile(db) # A mudança direta de order_date não passa pelos contadores
+        return await archive.archive_orders()
+
+    assert client.portal.call(backdate_and_archive) >= 3
+    return ids
+
+def _search(client, owner, history, query: str = ""):
+    response = client.get(f"/orders/?{query}", headers=owner)
+    assert response.status_code == 200, response.text
+    names = {order_id: name for name, order_id in history.items()}
+    return [names[order["id"]] for order in response.json()]
+
+def test_status_filter_continues_into_the_archive(client, owner, history):
+    assert _search(client, owner, history, "status=pending") == ["live_2"]
+    assert _search(client, owner, history, "status=pending&status=preparing") == ["live_3", "live_2"]
+    assert _search(client, owner, history, "status=delivered") == ["live_1", "old_1", "old_2"]
+    assert _search(client, owner, history, "status=cancelled&status=delivered") == ["live_4", "live_1", "old_1", "old_2", "old_3"]
+
+def test_date_range_filter(client, owner, history):
+    now = datetime.now()
+    window = lambda start, end: f"date_from={(now - start).isoformat()}&date_to={(now - end).isoformat()}"
+    assert _search(client, owner, history, window(timedelta(days=2, hours=12), timedelta(hours=12))) == ["live_3", "live_2"]
+    assert _search(client, owner, history, window(timedelta(days=401, hours=12), timedelta(days=399))) == ["old_1", "old_2"]
+    assert _search(client, owner, history, window(timedelta(days=3, hours=1), timedelta(days=2, hours=23))) == ["live_1"]
+
+def test_payment_and_pickup_filters(client, owner, history):
+    assert _search(client, owner, history, "payment_method=pix") == ["live_3", "live_1", "old_1", "old_3"]
+    assert _search(client, owner, history, "payment_method=cash&payment_method=card") == ["live_4", "live_2", "old_2"]
+    assert _search(client, owner, history, "is_pickup=true") == ["live_4", "live_1", "old_2"]
+    assert _search(client, owner, history, "is_pickup=false&payment_method=pix&status=delivered") == ["old_1"]
+
+def test_sorts(client, owner, history):
+    assert _search(client, owner, history) == BY_DATE
+    assert _search(client, owner, history, "sort=order_date") == BY_DATE[::-1]
+    # 70, 60, 50, 40, 30, 20, 10: as duas tabelas intercaladas
+    by_total = ["old_3", "live_4", "old_1", "live_3", "live_1", "old_2", "live_2"]
+    assert _search(client, owner, history, "sort=-total_amount") == by_total
+    assert _search(client, owner, history, "sort=total_amount") == by_total[::-1]
+    assert _search(client, owner, history, "sort=-total_amount&skip=2&limit=3") == by_total[2:5]
+
+@pytest.mark.parametrize("sort, expected", [("-order_date", BY_DATE), ("order_date", BY_DATE[::-1])])
+def test_pages_continue_from_live_into_archived_rows(client, owner, history, sort, expected):
+    for limit in (1, 2, 3, 5):
+        pages = []
+        for skip in range(0, len(expected) + limit, limit):
+            pages += _search(client, owner, history, f"sort={sort}&skip={skip}&limit={limit}")
+        assert pages == expected, limit
+    # Página que começa na tabela quente e termina no arquivo
+    assert _search(client, owner, history, f"sort={sort}&skip=2&limit=3") == expected[2:5]
+
+    page = client.get(f"/orders/page?sort={sort}&skip=3&limit=3", headers=owner).json()
+    assert [order["id"] for order in page["items"]] == [history[name] for name in expected[3:6]]
+    assert (page["total"], page["next_offset"]) == (7, 6)
+
+@pytest.mark.parametrize("query", [
+    "sort=price",
+    "sort=-status",
+    "date_from=2024-02-01T00:00:00&date_to=2024-01-01T00:00:00", # Período invertido
+    "date_from=2024-01-01T00:00:00&date_to=2024-01-01T00:00:00", # Período vazio
+])
+def test_invalid_filters_are_rejected(client, owner, establishment, query):
+    for url in ("/orders/", "/orders/page"):
+        response = client.get(f"{url}?{query}", headers=owner)
+        assert response.status_code == 400, response.text
@@ -0,0 +1,76 @@
+# lanchonete_backend/tests/test_pages.py
+
+# Listagens em envelope (GET /orders/page e /products/page): o total sem COUNT(*) a cada página,
+# o next_offset da última página, o limite de ?approximate=true e o total logo depois de uma escrita.
+import pytest
+
+from app import crud
+
+@pytest.fixture
+def product(client, owner, establishment):
+    response = client.post("/products/", json={"name": "Misto quente", "price": 9.0, "establishment_id": establishment["id"]}, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _order(client, customer, product, payment_method: str = "pix"):
+    response = client.post(
+        "/orders/", json={"establishment_id": product["establishment_id"], "payment_method": payment_method, "items": [{"product_id": product["id"], "quantity": 1}]},
+        headers=customer
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _page(client, headers, query: str):
+    response = client.get(f"/orders/page?{query}", headers=headers)
+    assert response.status_code == 200, response.text
+    page = response.json()
+    return len(page["items"]), page["total"], page["total_is_approximate"], page["next_offset"]
+
+def test_orders_page_totals_and_offsets(client, owner, customer, product):
+    for payment_method in ("pix", "pix", "cash", "pix", "card"):
+        _order(client, customer, product, payment_method)
+    assert _page(client, owner, "limit=2") == (2, 5, False, 2)
+    assert _page(client, owner, "skip=2&limit=2") == (2, 5, False, 4)
+    assert _page(client, owner, "skip=4&limit=2") == (1, 5, False, None) # Última página
+    assert _page(client, owner, "limit=5") == (5, 5, False, None) # Página cheia que chega ao total
+    assert _page(client, owner, "payment_method=pix&limit=2") == (2, 3, False, 2)
+    assert _page(client, owner, "payment_method=pix&skip=2&limit=2") == (1, 3, False, None)
+    assert _page(client, customer, "status=pending&limit=10") == (5, 5, False, None)
+
+def test_filtered_total_follows_a_new_order(client, owner, customer, product):
+    _order(client, customer, product)
+    assert _page(client, owner, "payment_method=pix") == (1, 1, False, None) # Contagem guardada
+    _order(client, customer, product)
+    # O novo pedido invalida a contagem guardada (canal orders:<establishment_id>)
+    assert _page(client, owner, "payment_method=pix&limit=1") == (1, 2, False, 1)
+    assert _page(client, owner, "limit=1") == (1, 2, False, 1)
+    [order] = client.get("/orders/?limit=1", headers=owner).json()
+    assert client.put(f"/orders/{order['id']}", json={"payment_method": "cash"}, headers=owner).status_code == 200
+    assert _page(client, owner, "payment_method=pix") == (1, 1, False, None)
+
+def test_approximate_total_stops_at_the_cap(client, owner, customer, product, monkeypatch):
+    monkeypatch.setattr(crud, "APPROXIMATE_COUNT_CAP", 3)
+    for _ in range(5):
+        _order(client, customer, product)
+    # Parou no limite: "3 ou mais", e a página cheia sempre oferece a próxima
+    assert _page(client, owner, "status=pending&approximate=true&limit=2") == (2, 3, True, 2)
+    assert _page(client, owner, "status=pending&approximate=true&skip=2&limit=2") == (2, 4, True, 4)
+    assert _page(client, owner, "status=pending&approximate=true&skip=4&limit=2") == (1, 5, True, None)
+    # Sem approximate, a contagem é exata
+    assert _page(client, owner, "status=pending&limit=2") == (2, 5, False, 2)
+    # Abaixo do limite, o total aproximado é o exato
+    assert _page(client, owner, "status=pending&payment_method=cash&approximate=true") == (0, 0, False, None)
+
+def test_products_page_totals_and_offsets(client, owner, product):
+    total = client.get("/products/page?limit=1").json()["total"]
+    assert total >= 1
+    page = client.get(f"/products/page?skip={total - 1}&limit=20").json()
+    assert (len(page["items"]), page["total"], page["next_offset"]) == (1, total, None)
+    page = client.get("/products/page?limit=1").json()
+    assert (len(page["items"]), page["next_offset"]) == (1, 1 if total > 1 else None)
+
+    created = client.post("/products/", json={"name": "Bauru", "price": 11.0, "establishment_id": product["establishment_id"]}, headers=owner)
+    assert created.status_code == 201, created.text
+    page = client.get(f"/products/page?skip={total - 1}&limit=20").json()
+    assert (len(page["items"]), page["total"], page["next_offset"]) == (2, total + 1, None)
+    assert client.get(f"/products/page?skip={total - 1}&limit=1").json()["next_offset"] == total
@@ -0,0 +1,72 @@
+# lanchonete_backend/tests/test_principals.py
+
+# Principal em cache: as rotas do proprietário usam current_user.establishment_id, sem consultar
+# o estabelecimento do dono; com o principal em cache, nem o usuário é consultado.
+import time
+
+import pytest
+
+from app import invalidation
+from app.routers import users
+
+@pytest.fixture
+def shop(client, owner, customer, establishment):
+    product = client.post("/products/", json={"name": "Esfirra", "price": 5.0, "establishment_id": establishment["id"]}, headers=owner).json()
+    order = client.post(
+        "/orders/", json={"establishment_id": establishment["id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 1}]},
+        headers=customer
+    ).json()
+    return {"establishment": establishment["id"], "product": product["id"], "order": order["id"]}
+
+OWNER_REQUESTS = {
+    "list_orders": ("get", "/orders/", None),
+    "kitchen_queue": ("get", "/orders/queue", None),
+    "read_order": ("get", "/orders/{order}", None),
+    "update_order": ("put", "/orders/{order}", {"status": "preparing"}),
+    "create_product": ("post", "/products/", {"name": "Kibe", "price": 4.0, "establishment_id": "{establishment}"}),
+    "update_product": ("put", "/products/{product}", {"price": 5.5}),
+    "stats": ("get", "/establishments/{establishment}/stats", None),
+    "delete_order": ("delete", "/orders/{order}", None),
+}
+
+def _format(value, ids):
+    if isinstance(value, str):
+        formatted = value.format(**ids)
+        return int(formatted) if value.startswith("{") else formatted
+    if isinstance(value, dict):
+        return {key: _format(item, ids) for key, item in value.items()}
+    return value
+
+def _touches_owner_lookup(statement: str) -> bool:
+    # Busca do usuário pelo e-mail do token ou do estabelecimento pelo dono (não os dados da resposta)
+    return "users.email =" in statement or "establishments.owner_id =" in statement
+
+@pytest.mark.parametrize("name", OWNER_REQUESTS)
+def test_owner_endpoint_skips_principal_queries(client, owner, shop, statements, name):
+    method, url, body = OWNER_REQUESTS[name]
+    kwargs = {"json": _format(body, shop)} if body is not None else {}
+
+    users._principals.invalidate() # Primeira requisição: uma consulta (usuário + estabelecimento)
+    statements.clear()
+    assert client.get("/users/me/", headers=owner).status_code == 200
+    assert len(statements) == 1 and "FROM users LEFT OUTER JOIN establishments" in statements[0], statements
+
+    statements.clear()
+    response = client.request(method, _format(url, shop), headers=owner, **kwargs)
+    assert response.status_code < 300, response.text
+    assert not [statement for statement in statements if _touches_owner_lookup(statement)], statements
+
+def test_local_cache_bounds():
+    cache = invalidation.LocalCache(max_entries=2, ttl=0.2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1 # "a" passa a ser a usada mais recentemente
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+    time.sleep(0.25)
+    assert cache.get("a") is None and cache.get("c") is None
+
+def test_principal_cache_is_bounded():
+    assert users._principals.max_entries == users.PRINCIPAL_CACHE_MAX_ENTRIES
+    assert users._principals.ttl == users.PRINCIPAL_CACHE_TTL_SECONDS
@@ -0,0 +1,69 @@
+# lanchonete_backend/tests/test_query_counts.py
+
+# Instruções SQL por endpoint de escrita: cada escrita é um único UPDATE/DELETE ... RETURNING com
+# a posse no WHERE (mais a publicação da invalidação e, nos pedidos, contadores e itens), sem
+# carregar a linha antes. Os usuários já estão no cache de principals.
+import pytest
+
+@pytest.fixture
+def scene(client, owner, make_user, establishment, category):
+    customer = make_user()
+    other_owner = make_user(is_owner=True)
+    client.post("/establishments/", json={"name": "Outra", "address": "Rua B, 2", "phone": "11988888888"}, headers=other_owner)
+    product = client.post(
+        "/products/", json={"name": "X-Burguer", "price": 20.0, "establishment_id": establishment["id"], "category_id": category["id"]}, headers=owner
+    ).json()
+    order = client.post(
+        "/orders/", json={"establishment_id": establishment["id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 2}]},
+        headers=customer
+    ).json()
+    for headers in (owner, customer, other_owner):
+        assert client.get("/users/me/", headers=headers).status_code == 200 # Principal em cache
+    return {
+        "owner": owner, "customer": customer, "other_owner": other_owner, "establishment": establishment,
+        "category": category, "product": product, "order": order,
+    }
+
+def _verbs(statements):
+    return [statement.split()[0] for statement in statements]
+
+# (método, url, corpo, quem, status esperado, instruções esperadas)
+CASES = {
+    "update_product": ("put", "/products/{product}", {"price": 22.0}, "owner", 200, ["UPDATE", "INSERT"]),
+    "update_product_forbidden": ("put", "/products/{product}", {"price": 1.0}, "other_owner", 403, ["UPDATE", "SELECT"]),
+    "delete_product_in_orders": ("delete", "/products/{product}", None, "owner", 409, ["DELETE"]),
+    "update_category": ("put", "/categories/{category}", {"name": "Categoria renomeada"}, "owner", 200, ["UPDATE", "INSERT"]),
+    "delete_category": ("delete", "/categories/{category}", None, "owner", 200, ["UPDATE", "DELETE", "INSERT"]),
+    "update_establishment": (
+        "put", "/establishments/{establishment}", {"name": "Nova", "address": "Rua A, 1", "phone": "11999999999"}, "owner", 200,
+        ["UPDATE", "DELETE", "INSERT"] # DELETE: sem coordenadas, sai do índice geográfico
+    ),
+    "update_order_address": ("put", "/orders/{order}", {"delivery_address": "Rua C, 3"}, "owner", 200, ["UPDATE", "SELECT", "INSERT"]),
+    # Status: leitura do status anterior e UPDATE condicionado a ele; itens; contadores; invalidação
+    "update_order_status": ("put", "/orders/{order}", {"status": "delivered"}, "owner", 200, ["SELECT", "UPDATE", "SELECT", "INSERT", "INSERT"]),
+    "update_order_forbidden": ("put", "/orders/{order}", {"delivery_address": "x"}, "other_owner", 403, ["UPDATE", "SELECT"]),
+    # Itens (o CASCADE os remove), DELETE, contadores do estabelecimento e do cliente, invalidação
+    # e, logo antes do commit, a devolução ao estoque (pedido em aberto)
+    "delete_order": ("delete", "/orders/{order}", None, "customer", 200, ["SELECT", "DELETE", "INSERT", "INSERT", "INSERT", "UPDATE"]),
+}
+
+@pytest.mark.parametrize("case", CASES)
+def test_write_statements(client, scene, statements, case):
+    method, url, body, who, expected_status, expected = CASES[case]
+    url = url.format(**{name: scene[name]["id"] for name in ("product", "category", "establishment", "order")})
+    kwargs = {"json": body} if body is not None else {}
+    statements.clear()
+    response = client.request(method, url, headers=scene[who], **kwargs)
+    assert response.status_code == expected_status, response.text
+    assert _verbs(statements) == expected, statements
+
+def test_create_order_statements(client, scene, statements):
+    statements.clear()
+    response = client.post(
+        "/orders/",
+        json={"establishment_id": scene["establishment"]["id"], "payment_method": "pix", "items": [{"product_id": scene["product"]["id"], "quantity": 1}]},
+        headers=scene["customer"]
+    )
+    assert response.status_code == 201, response.text
+    # Produtos do carrinho, pedido, contadores (2), invalidação, job e itens
+    assert _verbs(statements) == ["SELECT", "INSERT", "INSERT", "INSERT", "INSERT", "INSERT", "INSERT"], statements
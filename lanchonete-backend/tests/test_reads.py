@@ -0,0 +1,116 @@
+# lanchonete_backend/tests/test_reads.py
+
+# As listagens lidas pelo Core (app/reads.py) respondem o mesmo JSON que o caminho anterior:
+# objetos do ORM validados por schemas.*Response (from_attributes) e serializados como o FastAPI
+# faz com response_model. Compara campo a campo, na mesma ordem, com itens aninhados, datas e nulos.
+import json
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+
+from app import archive, models, schemas
+from app.database import AsyncSessionLocal
+
+def _orm_json(schema, obj):
+    """O que o FastAPI responderia com response_model=schema para um objeto do ORM."""
+    return json.loads(json.dumps(schema.model_validate(obj, from_attributes=True).model_dump(mode="json")))
+
+def _assert_same(core: dict, orm: dict):
+    assert core == orm
+    assert list(core) == list(orm) # Mesma ordem dos campos
+    for name, value in core.items():
+        if isinstance(value, dict):
+            _assert_same(value, orm[name])
+        elif isinstance(value, list):
+            for core_item, orm_item in zip(value, orm[name]):
+                if isinstance(core_item, dict):
+                    _assert_same(core_item, orm_item)
+
+@pytest.fixture
+def catalog(client, owner, establishment, category):
+    """Um produto com todos os campos preenchidos (imagem, categoria, estoque) e um só com os obrigatórios."""
+    full = client.post("/products/", json={
+        "name": "X-Egg", "description": "Pão, ovo e queijo", "price": 19.9, "establishment_id": establishment["id"],
+        "category_id": category["id"], "stock": 12,
+    }, headers=owner).json()
+    async def set_image():
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(models.Product).where(models.Product.id == full["id"]).values(
+                image_url="/products/images/ab/320.webp", image_variants={"96": "/a/96.webp", "320": "/a/320.webp"}
+            ))
+            await db.commit()
+    client.portal.call(set_image)
+    bare = client.post("/products/", json={"name": "Água", "price": 3.0, "establishment_id": establishment["id"]}, headers=owner).json()
+    return full, bare
+
+async def _orm_products(ids):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(models.Product).where(models.Product.id.in_(ids)).order_by(models.Product.id))
+        return result.scalars().all()
+
+async def _orm_orders(model, ids):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(model).where(model.id.in_(ids)).options(selectinload(model.items)).order_by(model.order_date.desc(), model.id.desc()))
+        return result.scalars().all()
+
+def test_products_match_the_orm_response(client, catalog):
+    ids = [product["id"] for product in catalog]
+    expected = [_orm_json(schemas.ProductResponse, product) for product in client.portal.call(_orm_products, ids)]
+    assert expected[1]["image_variants"] is None and expected[1]["description"] is None # Nulos no JSON
+
+    listed = {product["id"]: product for product in client.get("/products/?limit=100000").json()}
+    for product in expected:
+        _assert_same(listed[product["id"]], product)
+    paged = client.get(f"/products/page?skip={min(ids) - 1}&limit=100").json()["items"]
+    for product in expected:
+        _assert_same(next(item for item in paged if item["id"] == product["id"]), product)
+
+    synced = {product["id"]: product for product in client.get("/sync/?since=0").json()["products"]}
+    for product in expected:
+        _assert_same(synced[product["id"]], product)
+
+def test_category_matches_the_orm_response(client, category):
+    async def load():
+        async with AsyncSessionLocal() as db:
+            return await db.get(models.Category, category["id"])
+
+    _assert_same(client.get(f"/categories/{category['id']}").json(), _orm_json(schemas.CategoryResponse, client.portal.call(load)))
+
+def test_orders_match_the_orm_response(client, owner, customer, catalog):
+    full, bare = catalog
+    establishment_id = full["establishment_id"]
+    placed = []
+    for items, extra in (
+        ([{"product_id": full["id"], "quantity": 2}, {"product_id": bare["id"], "quantity": 3}], {"delivery_address": "Rua das Flores, 12"}),
+        ([{"product_id": bare["id"], "quantity": 1}], {"is_pickup": True}), # delivery_address nulo
+    ):
+        response = client.post("/orders/", json={"establishment_id": establishment_id, "payment_method": "pix", "items": items, **extra}, headers=customer)
+        assert response.status_code == 201, response.text
+        placed.append(response.json()["id"])
+
+    expected = [_orm_json(schemas.OrderResponse, order) for order in client.portal.call(_orm_orders, models.Order, placed)]
+    assert len(expected[1]["items"]) == 2 and expected[0]["delivery_address"] is None
+    for url in ("/orders/", "/orders/page"):
+        body = client.get(url, headers=owner).json()
+        listed = body["items"] if isinstance(body, dict) else body
+        assert [order["id"] for order in listed] == [order["id"] for order in expected]
+        for core, orm in zip(listed, expected):
+            _assert_same(core, orm)
+    # O cliente vê os mesmos pedidos pelo mesmo caminho
+    listed = {order["id"]: order for order in client.get("/orders/?limit=1000", headers=customer).json()}
+    for orm in expected:
+        _assert_same(listed[orm["id"]], orm)
+
+def test_archived_orders_match_the_orm_response(client, owner, customer, catalog):
+    from tests.test_archive import _old_orders
+    establishment = {"id": catalog[0]["establishment_id"]}
+    ids = _old_orders(client, owner, customer, establishment, 2)
+    assert client.portal.call(archive.archive_orders) >= 2
+
+    expected = [_orm_json(schemas.OrderResponse, order) for order in client.portal.call(_orm_orders, models.ArchivedOrder, ids)]
+    assert [order["id"] for order in expected] == sorted(ids, reverse=True)
+    listed = client.get("/orders/?status=delivered", headers=owner).json()
+    assert [order["id"] for order in listed] == [order["id"] for order in expected]
+    for core, orm in zip(listed, expected):
+        _assert_same(core, orm)
@@ -0,0 +1,214 @@
+# lanchonete_backend/tests/test_sharding.py
+
+# Sharding por estabelecimento (LANCHONETE_SHARDS, ver app/database.py), com a fixture `sharded`:
+# cada pedido vai para o shard do estabelecimento, com o ID na faixa do shard; as leituras por ID
+# seguem a faixa, as listagens do cliente intercalam todos os shards (e os arquivos deles), e o
+# estoque, no banco global, nunca fica baixado sem o pedido gravado.
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+from app import archive, crud, database, models, schemas, stats
+from app.database import AsyncSessionLocal, engine, shard_for_order, shard_id_floor, use_shard
+from app.kitchen import kitchen_queue
+from tests.conftest import SHARDS
+
+def _establishment_in_shard(client, make_user, shard: int):
+    """(cabeçalhos do dono, estabelecimento) num estabelecimento que cai no shard pedido."""
+    while True:
+        owner = make_user(is_owner=True)
+        response = client.post("/establishments/", json={"name": "Lanchonete", "address": "Rua A, 1", "phone": "1"}, headers=owner)
+        assert response.status_code == 201, response.text
+        if response.json()["id"] % SHARDS == shard:
+            return owner, response.json()
+
+def _product(client, owner, establishment, price: float, **fields):
+    body = {"name": "Lanche", "price": price, "establishment_id": establishment["id"], **fields}
+    response = client.post("/products/", json=body, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _order(client, customer, product, quantity: int = 1):
+    response = client.post(
+        "/orders/", json={"establishment_id": product["establishment_id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": quantity}]},
+        headers=customer
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _stored_status(client, shard_engine, order_id: int):
+    async def read():
+        async with shard_engine.connect() as conn:
+            return (await conn.execute(select(models.Order.status).where(models.Order.id == order_id))).scalar()
+    return client.portal.call(read)
+
+def test_order_lives_in_the_shard_of_its_establishment(client, sharded, owner, customer, establishment):
+    shard = establishment["id"] % SHARDS
+    order = _order(client, customer, _product(client, owner, establishment, 8.0))
+    assert shard_for_order(order["id"]) == shard
+    assert shard_id_floor(shard) < order["id"] < shard_id_floor(shard + 1)
+    assert _stored_status(client, sharded[shard], order["id"]) == "pending"
+    assert _stored_status(client, engine, order["id"]) is None # Nada no banco global
+
+    assert client.get(f"/orders/{order['id']}", headers=customer).json()["total_amount"] == 8.0
+    response = client.put(f"/orders/{order['id']}", json={"status": "preparing"}, headers=owner)
+    assert response.status_code == 200, response.text
+    assert _stored_status(client, sharded[shard], order["id"]) == "preparing"
+    assert client.delete(f"/orders/{order['id']}", headers=owner).status_code == 200
+    assert _stored_status(client, sharded[shard], order["id"]) is None
+    assert client.get(f"/orders/{order['id']}", headers=customer).status_code == 404
+
+def test_ids_outside_the_shard_ranges_are_not_found(client, sharded, owner, establishment):
+    # Um ID do banco sem sharding e um de um shard que não existe com SHARDS shards
+    for order_id in (5, shard_id_floor(SHARDS) + 1):
+        assert client.get(f"/orders/{order_id}", headers=owner).status_code == 404
+        assert client.put(f"/orders/{order_id}", json={"status": "preparing"}, headers=owner).status_code == 404
+        assert client.delete(f"/orders/{order_id}", headers=owner).status_code == 404
+
+@pytest.fixture
+def spread_orders(client, sharded, make_user, customer):
+    """Pedidos do cliente em dois shards, os dois mais antigos já no arquivo. Devolve os IDs na ordem de criação."""
+    owners, products = [], []
+    for shard, price in ((0, 10.0), (1, 7.0)):
+        owner, establishment = _establishment_in_shard(client, make_user, shard)
+        owners.append(owner)
+        products.append(_product(client, owner, establishment, price))
+    # Totais: 10, 7, 30, 14
+    placed = [_order(client, customer, products[index % 2], quantity) for index, quantity in enumerate((1, 1, 3, 2))]
+    for order in placed[:2]:
+        assert client.put(f"/orders/{order['id']}", json={"status": "delivered"}, headers=owners[placed.index(order) % 2]).status_code == 200
+
+    async def archive_oldest():
+        for age_days, order in zip((401, 400), placed[:2]):
+            async with AsyncSessionLocal() as db:
+                use_shard(db, shard_for_order(order["id"]))
+                await db.execute(update(models.Order).where(models.Order.id == order["id"]).values(order_date=datetime.now() - timedelta(days=age_days)))
+                await db.commit()
+        # A data mudou por fora de crud: os contadores do dia são recalculados, como depois de uma carga
+        async with AsyncSessionLocal() as db:
+            await stats.reconcile(db)
+        return await archive.archive_orders()
+
+    assert client.portal.call(archive_oldest) == 2
+    return [order["id"] for order in placed]
+
+def test_customer_orders_are_merged_across_shards(client, customer, spread_orders):
+    first, second, third, fourth = spread_orders
+    listed = lambda query="": [order["id"] for order in client.get(f"/orders/{query}", headers=customer).json()]
+    assert listed() == [fourth, third, second, first] # Mais recentes primeiro, arquivados no fim
+    assert listed("?sort=order_date") == [first, second, third, fourth]
+    assert listed("?sort=total_amount") == [second, first, fourth, third] # 7, 10, 14, 30
+    assert listed("?sort=-total_amount&skip=1&limit=2") == [fourth, first]
+    assert listed("?status=delivered") == [second, first]
+
+def test_paged_totals_across_shards(client, customer, spread_orders):
+    page = client.get("/orders/page?limit=3", headers=customer).json()
+    assert (len(page["items"]), page["total"], page["next_offset"]) == (3, 4, 3)
+    page = client.get("/orders/page?skip=3&limit=3", headers=customer).json()
+    assert (len(page["items"]), page["total"], page["next_offset"]) == (1, 4, None)
+    page = client.get("/orders/page?status=pending", headers=customer).json()
+    assert (page["total"], page["total_is_approximate"]) == (2, False)
+    assert client.get("/orders/page?status=delivered&payment_method=pix", headers=customer).json()["total"] == 2
+
+def test_stats_follow_writes_in_the_shard(client, sharded, owner, customer, establishment):
+    order = _order(client, customer, _product(client, owner, establishment, 12.5), quantity=2)
+    url = f"/establishments/{establishment['id']}/stats"
+    assert client.get(url, headers=owner).json() == {
+        "establishment_id": establishment["id"], "open_orders": 1, "orders_today": 1, "revenue_today": 25.0
+    }
+    assert client.put(f"/orders/{order['id']}", json={"status": "cancelled"}, headers=owner).status_code == 200
+    assert client.get(url, headers=owner).json() == {
+        "establishment_id": establishment["id"], "open_orders": 0, "orders_today": 0, "revenue_today": 0.0
+    }
+
+    async def reconcile():
+        async with AsyncSessionLocal() as db:
+            return await stats.reconcile(db)
+
+    assert client.portal.call(reconcile) == 0
+
+def test_sharded_table_without_use_shard_is_refused(client, sharded):
+    async def run():
+        async with AsyncSessionLocal() as db:
+            with pytest.raises(RuntimeError, match="use_shard"):
+                await db.execute(select(models.Order.id))
+            with pytest.raises(RuntimeError, match="use_shard"):
+                await db.execute(select(models.EstablishmentStats))
+
+    client.portal.call(run)
+
+def test_startup_refuses_misplaced_orders(client, sharded, customer, establishment):
+    customer_id = client.get("/users/me/", headers=customer).json()["id"]
+    row = {
+        "customer_id": customer_id, "establishment_id": establishment["id"], "order_date": datetime.now(),
+        "total_amount": 1.0, "status": "pending", "is_pickup": True, "payment_method": "pix",
+    }
+    wrong_shard = 1 - establishment["id"] % SHARDS
+
+    async def check(db_engine, order_id):
+        async with db_engine.begin() as conn:
+            await conn.execute(insert(models.Order).values(id=order_id, **row))
+        try:
+            with pytest.raises(RuntimeError) as error:
+                await database.check_order_placement()
+        finally:
+            async with db_engine.begin() as conn:
+                await conn.execute(delete(models.Order).where(models.Order.id == order_id))
+        return str(error.value)
+
+    # Pedido gravado antes do sharding, no banco global
+    assert "orders em sql_app.db" in client.portal.call(check, engine, 10 ** 9)
+    # Pedido do estabelecimento no shard errado (número de shards mudou)
+    assert f"orders do shard {wrong_shard}" in client.portal.call(check, sharded[wrong_shard], shard_id_floor(wrong_shard) + 10 ** 9)
+
+def test_failed_order_commit_returns_the_stock(client, sharded, owner, customer, establishment):
+    shard = establishment["id"] % SHARDS
+    product = _product(client, owner, establishment, 6.0, stock=5)
+    customer_id = client.get("/users/me/", headers=customer).json()["id"]
+
+    # Só o commit da conexão que gravou o pedido falha (o worker de jobs também faz commits no shard)
+    def mark_order_insert(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO orders"):
+            conn.info["order_insert"] = True
+
+    def lock_timeout(conn):
+        if conn.info.pop("order_insert", False):
+            event.remove(shard_engine, "commit", lock_timeout)
+            raise OperationalError("COMMIT", {}, sqlite3.OperationalError("database is locked"))
+
+    async def place(quantity: int):
+        order = schemas.OrderCreate(establishment_id=establishment["id"], payment_method="pix", items=[{"product_id": product["id"], "quantity": quantity}])
+        async with AsyncSessionLocal() as db:
+            await crud.create_order(db, order, customer_id)
+
+    async def stored_orders():
+        async with AsyncSessionLocal() as db:
+            use_shard(db, shard)
+            return (await db.execute(select(models.Order.id).where(models.Order.establishment_id == establishment["id"]))).scalars().all()
+
+    # O commit do shard falha depois que a reserva (banco global) já foi confirmada
+    shard_engine = sharded[shard].sync_engine
+    event.listen(shard_engine, "before_cursor_execute", mark_order_insert)
+    event.listen(shard_engine, "commit", lock_timeout)
+    try:
+        with pytest.raises(OperationalError):
+            client.portal.call(place, 2)
+    finally:
+        event.remove(shard_engine, "before_cursor_execute", mark_order_insert)
+    assert client.get(f"/products/{product['id']}").json()["stock"] == 5
+    assert client.portal.call(stored_orders) == []
+    assert list(kitchen_queue._queue(establishment["id"]).orders) == []
+
+    # Sem estoque: 409 antes de qualquer pedido no shard
+    with pytest.raises(HTTPException) as error:
+        client.portal.call(place, 6)
+    assert error.value.status_code == 409
+    assert client.portal.call(stored_orders) == []
+
+    client.portal.call(place, 5)
+    assert client.get(f"/products/{product['id']}").json()["stock"] == 0
+    assert len(client.portal.call(stored_orders)) == 1
@@ -0,0 +1,53 @@
+# lanchonete_backend/tests/test_stats.py
+
+# Contadores do painel: mudanças de status concorrentes no mesmo pedido precisam aplicar a
+# diferença da transição que cada UPDATE de fato fez, sem divergir do recálculo.
+import asyncio
+
+from fastapi import HTTPException
+
+from app import crud, schemas, stats
+from app.database import AsyncSessionLocal
+
+def _place_order(client, customer, establishment, owner):
+    product = client.post("/products/", json={"name": "Pastel", "price": 9.5, "establishment_id": establishment["id"]}, headers=owner).json()
+    response = client.post(
+        "/orders/", json={"establishment_id": establishment["id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 2}]},
+        headers=customer
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+async def _set_status(order_id: int, establishment_id: int, new_status: str):
+    async with AsyncSessionLocal() as db:
+        try:
+            order = await crud.update_order(db, order_id, schemas.OrderUpdate(status=new_status), establishment_id=establishment_id)
+        except HTTPException as exc:
+            return exc.status_code
+        return order.status
+
+async def _reconcile() -> int:
+    async with AsyncSessionLocal() as db:
+        return await stats.reconcile(db)
+
+def test_concurrent_status_changes_keep_counters_exact(client, owner, customer, establishment):
+    order = _place_order(client, customer, establishment, owner)
+    url = f"/establishments/{establishment['id']}/stats"
+    assert client.get(url, headers=owner).json() == {
+        "establishment_id": establishment["id"], "open_orders": 1, "orders_today": 1, "revenue_today": 19.0
+    }
+
+    async def race():
+        return await asyncio.gather(*(
+            _set_status(order["id"], establishment["id"], new_status)
+            for new_status in ("cancelled", "cancelled", "delivered", "cancelled", "delivered")
+        ))
+
+    results = client.portal.call(race)
+    assert set(results) <= {"cancelled", "delivered", 409}
+    final_status = client.get(f"/orders/{order['id']}", headers=owner).json()["status"]
+    counted = 0 if final_status == "cancelled" else 1
+    assert client.get(url, headers=owner).json() == {
+        "establishment_id": establishment["id"], "open_orders": 0, "orders_today": counted, "revenue_today": 19.0 * counted
+    }
+    assert client.portal.call(_reconcile) == 0
@@ -0,0 +1,114 @@
+# lanchonete_backend/tests/test_stock.py
+
+# Estoque por produto: pedidos concorrentes nunca vendem mais do que há, e cancelamentos
+# concorrentes do mesmo pedido devolvem as unidades uma única vez.
+import asyncio
+
+from fastapi import HTTPException
+
+from app import crud, models, schemas
+from app.database import AsyncSessionLocal
+
+def _product(client, owner, establishment, **fields):
+    body = {"name": "Coxinha", "price": 6.0, "establishment_id": establishment["id"], **fields}
+    response = client.post("/products/", json=body, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+async def _place(establishment_id: int, customer_id: int, items):
+    order = schemas.OrderCreate(establishment_id=establishment_id, payment_method="pix", items=items)
+    async with AsyncSessionLocal() as db:
+        try:
+            return await crud.create_order(db, order, customer_id)
+        except HTTPException as exc:
+            assert exc.status_code == 409, exc.detail
+            return None
+
+async def _set_status(order_id: int, new_status: str):
+    async with AsyncSessionLocal() as db:
+        try:
+            return (await crud.update_order(db, order_id, schemas.OrderUpdate(status=new_status))).status
+        except HTTPException as exc:
+            return exc.status_code
+
+async def _stock(product_id: int):
+    async with AsyncSessionLocal() as db:
+        product = await db.get(models.Product, product_id)
+        return product.stock, product.is_available
+
+def test_concurrent_orders_never_oversell(client, owner, customer, establishment):
+    limited = _product(client, owner, establishment, stock=40)
+    scarce = _product(client, owner, establishment, name="Quibe", stock=15)
+    untracked = _product(client, owner, establishment, name="Refrigerante")
+    customer_id = client.get("/users/me/", headers=customer).json()["id"]
+
+    def cart(k):
+        items = [{"product_id": limited["id"], "quantity": 1 + k % 2}, {"product_id": untracked["id"], "quantity": 1}]
+        if k % 3 == 0:
+            items.append({"product_id": scarce["id"], "quantity": 1})
+        if k % 5 == 0:
+            items.append({"product_id": limited["id"], "quantity": 1}) # Mesmo produto em duas linhas
+        return items
+
+    async def rush():
+        return await asyncio.gather(*(_place(establishment["id"], customer_id, cart(k)) for k in range(120)))
+
+    orders = [order for order in client.portal.call(rush) if order is not None]
+    assert orders
+    sold = {limited["id"]: 0, scarce["id"]: 0}
+    for order in orders:
+        for item in order.items:
+            if item.product_id in sold:
+                sold[item.product_id] += item.quantity
+    limited_left, limited_available = client.portal.call(_stock, limited["id"])
+    scarce_left, scarce_available = client.portal.call(_stock, scarce["id"])
+    assert sold[limited["id"]] + limited_left == 40 and limited_left >= 0
+    assert sold[scarce["id"]] + scarce_left == 15 and scarce_left >= 0
+    assert limited_available == (limited_left > 0) and scarce_available == (scarce_left > 0)
+    assert client.portal.call(_stock, untracked["id"]) == (None, True)
+
+def test_concurrent_cancellations_restore_once(client, owner, customer, establishment):
+    product = _product(client, owner, establishment, stock=3)
+    order = client.post(
+        "/orders/", json={"establishment_id": establishment["id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 3}]},
+        headers=customer
+    ).json()
+    assert client.portal.call(_stock, product["id"]) == (0, False)
+
+    async def cancel_all():
+        return await asyncio.gather(*(_set_status(order["id"], "cancelled") for _ in range(6)))
+
+    assert set(client.portal.call(cancel_all)) <= {"cancelled", 409}
+    assert client.portal.call(_stock, product["id"]) == (3, True)
+
+    # Reabrir reserva de novo; sem unidades, 409 e o pedido continua cancelado
+    assert client.portal.call(_set_status, order["id"], "pending") == "pending"
+    assert client.portal.call(_stock, product["id"]) == (0, False)
+    assert client.portal.call(_set_status, order["id"], "cancelled") == "cancelled"
+    client.put(f"/products/{product['id']}", json={"stock": 1}, headers=owner)
+    assert client.portal.call(_set_status, order["id"], "pending") == 409
+    assert client.get(f"/orders/{order['id']}", headers=owner).json()["status"] == "cancelled"
+
+def test_stock_change_revalidates_product(client, owner, customer, establishment):
+    product = _product(client, owner, establishment, stock=10)
+    url = f"/products/{product['id']}"
+    etag = client.get(url).headers["etag"]
+    client.post(
+        "/orders/", json={"establishment_id": establishment["id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 2}]},
+        headers=customer
+    )
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.json()["stock"] == 8
+
+def test_every_stock_change_refreshes_the_storefront(client, owner, customer, establishment):
+    product = _product(client, owner, establishment, stock=10)
+    url = f"/establishments/{establishment['id']}/storefront"
+    stock = lambda: [item["stock"] for item in client.get(url).json()["uncategorized_products"]]
+    assert stock() == [10] # Vitrine montada e guardada em memória
+    order = client.post(
+        "/orders/", json={"establishment_id": establishment["id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 2}]},
+        headers=customer
+    ).json()
+    assert stock() == [8] # Continua disponível, mas o estoque mudou
+    assert client.put(f"/orders/{order['id']}", json={"status": "cancelled"}, headers=owner).status_code == 200
+    assert stock() == [10]
@@ -0,0 +1,96 @@
+# lanchonete_backend/tests/test_storefront.py
+
+# Vitrine (GET /establishments/{id}/storefront, app/storefront.py): produtos disponíveis por
+# categoria, servida da memória já comprimida, com ETag; remontada depois de uma escrita de
+# produto, e com no máximo STOREFRONT_CACHE_MAX_ENTRIES vitrines em memória.
+import gzip
+
+from app import invalidation, storefront
+
+def _product(client, owner, establishment, name: str, **fields):
+    response = client.post("/products/", json={"name": name, "price": 10.0, "establishment_id": establishment["id"], **fields}, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _category(client, owner, name: str):
+    response = client.post("/categories/", json={"name": name}, headers=owner)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _storefront(client, establishment, **headers):
+    response = client.get(f"/establishments/{establishment['id']}/storefront", headers=headers)
+    assert response.status_code == 200, response.text
+    return response
+
+def test_products_are_grouped_by_category(client, owner, establishment):
+    drinks = _category(client, owner, f"Bebidas {establishment['id']}")
+    snacks = _category(client, owner, f"Salgados {establishment['id']}")
+    _product(client, owner, establishment, "Suco", category_id=drinks["id"])
+    _product(client, owner, establishment, "Coxinha", category_id=snacks["id"])
+    _product(client, owner, establishment, "Café", category_id=drinks["id"])
+    _product(client, owner, establishment, "Kibe", category_id=snacks["id"], is_available=False)
+    _product(client, owner, establishment, "Pão de queijo")
+    _product(client, owner, establishment, "Brigadeiro", stock=0) # Sem estoque: indisponível
+
+    body = _storefront(client, establishment).json()
+    assert body["establishment"]["id"] == establishment["id"]
+    # Categorias por nome, produtos disponíveis por nome; sem categoria à parte
+    assert [(category["name"], [product["name"] for product in category["products"]]) for category in body["categories"]] == [
+        (drinks["name"], ["Café", "Suco"]), (snacks["name"], ["Coxinha"])
+    ]
+    assert [product["name"] for product in body["uncategorized_products"]] == ["Pão de queijo"]
+
+def test_storefront_is_served_gzipped_with_etag(client, owner, establishment):
+    _product(client, owner, establishment, "Pastel")
+    zipped = _storefront(client, establishment, **{"Accept-Encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["vary"] == "Accept-Encoding"
+    cached = storefront._storefronts.get(establishment["id"])
+    assert gzip.decompress(cached.gzipped) == zipped.content # O cliente HTTP já descomprimiu
+
+    plain = _storefront(client, establishment, **{"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == zipped.content
+    etag = zipped.headers["etag"]
+    assert plain.headers["etag"] == etag
+
+    not_modified = client.get(f"/establishments/{establishment['id']}/storefront", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not not_modified.content
+    other = client.get(f"/establishments/{establishment['id']}/storefront", headers={"If-None-Match": '"outra"'})
+    assert other.status_code == 200
+
+def test_product_write_rebuilds_the_storefront(client, owner, establishment):
+    product = _product(client, owner, establishment, "Esfiha")
+    before = _storefront(client, establishment)
+    assert [item["price"] for item in before.json()["uncategorized_products"]] == [10.0]
+
+    assert client.put(f"/products/{product['id']}", json={"price": 12.5}, headers=owner).status_code == 200
+    after = _storefront(client, establishment)
+    assert [item["price"] for item in after.json()["uncategorized_products"]] == [12.5]
+    assert after.headers["etag"] != before.headers["etag"]
+    # O ETag antigo não responde mais 304
+    assert client.get(f"/establishments/{establishment['id']}/storefront", headers={"If-None-Match": before.headers["etag"]}).status_code == 200
+
+    assert client.put(f"/products/{product['id']}", json={"is_available": False}, headers=owner).status_code == 200
+    assert _storefront(client, establishment).json()["uncategorized_products"] == []
+    assert storefront._generations == {} # Só existe durante as montagens
+
+def test_unknown_establishment_is_not_found(client):
+    assert client.get("/establishments/999999/storefront").status_code == 404
+    assert storefront._storefronts.get(999999) is None
+
+def test_storefronts_in_memory_are_bounded(client, make_user, monkeypatch):
+    monkeypatch.setattr(storefront, "_storefronts", invalidation.LocalCache(max_entries=2))
+    establishments = []
+    for _ in range(3):
+        owner = make_user(is_owner=True)
+        response = client.post("/establishments/", json={"name": "Lanchonete", "address": "Rua A, 1", "phone": "1"}, headers=owner)
+        establishments.append(response.json())
+        _storefront(client, establishments[-1])
+    assert len(storefront._storefronts) == 2
+    # A usada há mais tempo saiu e é remontada no próximo acesso
+    assert storefront._storefronts.get(establishments[0]["id"]) is None
+    assert storefront._storefronts.get(establishments[2]["id"]) is not None
+    assert _storefront(client, establishments[0]).json()["establishment"]["id"] == establishments[0]["id"]
@@ -0,0 +1,66 @@
+# lanchonete_backend/tests/test_sync.py
+
+# Feed de alterações do catálogo: sincronizando página a página, o app recebe todas as
+# alterações, inclusive as de uma escrita que publica vários canais com a mesma sequência
+# e as baixas de estoque dos pedidos.
+from app import sync
+
+def _sync_all(client, since):
+    """Segue has_more até o fim; devolve (respostas, seq final)."""
+    pages = []
+    while True:
+        response = client.get("/sync/", params={"since": since})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        pages.append(page)
+        assert page["seq"] >= since
+        since = page["seq"]
+        if not page["has_more"]:
+            return pages, since
+
+def test_pages_never_split_a_write(client, owner, establishment, category, monkeypatch):
+    def create(name, category_id=None):
+        body = {"name": name, "price": 7.0, "establishment_id": establishment["id"], "category_id": category_id}
+        response = client.post("/products/", json=body, headers=owner)
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+
+    in_category = [create(f"Suco {index}", category["id"]) for index in range(5)]
+    _, since = _sync_all(client, 0)
+
+    before = [create("Água"), create("Chá")]
+    # Uma escrita, uma sequência: a categoria e os cinco produtos que ficam sem ela
+    assert client.delete(f"/categories/{category['id']}", headers=owner).status_code == 200
+    after = create("Café")
+
+    monkeypatch.setattr(sync, "SYNC_BATCH_SIZE", 3)
+    pages, _ = _sync_all(client, since)
+    assert len(pages) == 2
+    assert [product["id"] for product in pages[0]["products"]] == sorted(before + in_category)
+    assert all(product["category_id"] is None for product in pages[0]["products"] if product["id"] in in_category)
+    assert pages[0]["deleted"]["categories"] == [category["id"]]
+    assert [product["id"] for product in pages[1]["products"]] == [after]
+
+def test_warm_sync_is_empty(client, owner, establishment):
+    _, since = _sync_all(client, 0)
+    pages, seq = _sync_all(client, since)
+    assert seq == since
+    assert pages == [{
+        "seq": since, "full": False, "has_more": False, "products": [], "categories": [], "establishments": [],
+        "deleted": {"products": [], "categories": [], "establishments": []},
+    }]
+
+def test_order_stock_change_is_synced(client, owner, customer, establishment):
+    body = {"name": "Pão de mel", "price": 5.0, "establishment_id": establishment["id"], "stock": 10}
+    product = client.post("/products/", json=body, headers=owner).json()
+    _, since = _sync_all(client, 0)
+
+    response = client.post(
+        "/orders/", json={"establishment_id": establishment["id"], "payment_method": "pix", "items": [{"product_id": product["id"], "quantity": 3}]},
+        headers=customer
+    )
+    assert response.status_code == 201, response.text
+    pages, seq = _sync_all(client, since)
+    assert seq > since
+    changed = [item for page in pages for item in page["products"]]
+    assert [(item["id"], item["stock"], item["is_available"]) for item in changed] == [(product["id"], 7, True)]
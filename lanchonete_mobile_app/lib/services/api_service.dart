@@ -72,4 +72,22 @@ Future<List<dynamic>> getUsers() async{
   else{
     throw Exception('Falha ao carregar usuários: ${response.statusCode} - ${response.body}');
   }
-}
\ No newline at end of file
+}
+// Sincronização do catálogo (produtos, categorias e estabelecimentos).
+// Na primeira abertura, chame com since = 0 e guarde tudo localmente (a resposta vem com
+// 'full': true). Nas seguintes, envie o 'seq' guardado: a resposta traz só os registros
+// alterados e os IDs removidos em 'deleted'. Com 'has_more': true, chame de novo com o novo seq.
+Future<Map<String, dynamic>> syncCatalog(int since) async {
+  final response = await http.get(
+    Uri.parse('$API_BASE_URL/sync/?since=$since'),
+    headers: {
+      'Content-Type': 'application/json',
+    },
+  );
+
+  if (response.statusCode == 200) {
+    return json.decode(response.body);
+  } else {
+    throw Exception('Falha ao sincronizar o catálogo: ${response.statusCode} - ${response.body}');
+  }
+}